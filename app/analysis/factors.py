@@ -0,0 +1,252 @@
+import logging
+import io
+import re
+import numpy as np
+import pandas as pd
+from scipy.linalg import cho_factor, cho_solve, LinAlgError
+from app.config.config import (
+    TRADING_DAYS_PER_YEAR, ROLLING_WINDOW, ROLLING_CORRELATION_STEP, FACTOR_TICKERS, FACTOR_FILES, FACTOR_FILE_UNITS
+)
+from app.data.data_loader import get_historical_prices, get_daily_returns, DataLoadError
+
+logger = logging.getLogger(__name__)
+
+
+# Every ticker is regressed on the same factor matrix X, so one least-squares solve
+# (the normal equations X'X b = X'y, factored once) with all tickers as right-hand
+# side columns replaces a regression per ticker.
+# Tickers with missing returns (late listings) are grouped by their missing-day
+# pattern and each group gets its own solve over the days it has.
+
+DATE_FIELD = re.compile(r'^\d{4}-?\d{2}-?\d{2}$')
+
+
+def load_factor_file(path, units=FACTOR_FILE_UNITS):
+    """
+    Daily factor returns from a CSV file: a date column then one column per factor.
+    Files from the Fama-French data library work as downloaded: the description lines
+    above the header and the annual table below the daily one are skipped, dates in
+    YYYYMMDD form are parsed, and the risk-free rate column (RF) is dropped.
+    """
+    with open(path) as f:
+        lines = f.read().splitlines()
+    is_daily_row = [bool(DATE_FIELD.match(line.split(',')[0].strip())) for line in lines]
+    first_row = is_daily_row.index(True)
+    end = next((i for i in range(first_row, len(lines)) if not is_daily_row[i]), len(lines))
+    factors = pd.read_csv(io.StringIO('\n'.join(lines[first_row - 1:end])), index_col=0)
+    dates = factors.index.astype(str).str.replace('-', '')
+    factors.index = pd.to_datetime(dates, format='%Y%m%d')
+    factors.columns = [str(column).strip() for column in factors.columns]
+    factors = factors.drop(columns=['RF'], errors='ignore').astype(float)
+    return factors / 100 if units == 'percent' else factors
+
+
+def get_factor_returns(start_date, end_date, factor_tickers=FACTOR_TICKERS, factor_files=FACTOR_FILES):
+    """
+    Daily returns of the configured factors: index and sector ETF returns from price
+    data plus the factors in local files, on the days they all have a value
+    """
+    frames = []
+    if factor_tickers:
+        try:
+            frames.append(get_daily_returns(get_historical_prices(factor_tickers, start_date, end_date)))
+        except DataLoadError as error:
+            logger.warning(f"Factor ETF returns unavailable: {error}")
+    for path in factor_files:
+        factors = load_factor_file(path)
+        frames.append(factors.loc[pd.Timestamp(start_date):pd.Timestamp(end_date)])
+    if not frames:
+        return None
+    return pd.concat(frames, axis=1, join='inner').dropna()
+
+
+def _align(returns, factor_returns):
+    """Returns and factors on the days every factor has a return (tickers may still be missing)"""
+    factor_returns = factor_returns.dropna()
+    dates = returns.index.intersection(factor_returns.index)
+    return returns.loc[dates], factor_returns.loc[dates]
+
+
+def _solve(y, x):
+    """
+    Least squares of every column of y on an intercept and the columns of x, through the
+    normal equations of the centred data (one Cholesky factorization for all columns).
+    Returns the coefficients (intercept first), residual and total sums of squares, and
+    the diagonal of the inverse Gram matrix that scales the coefficient variances.
+    """
+    x_mean, y_mean = x.mean(axis=0), y.mean(axis=0)
+    centred_x, centred_y = x - x_mean, y - y_mean
+    gram = centred_x.T @ centred_x
+    cross = centred_x.T @ centred_y
+    gram_inverse = np.linalg.pinv(gram)
+    try:
+        betas = cho_solve(cho_factor(gram), cross)
+    except LinAlgError:
+        # Collinear factors: minimum-norm solution
+        betas = gram_inverse @ cross
+    tss = np.einsum('ij,ij->j', centred_y, centred_y)
+    rss = np.maximum(tss - np.sum(betas * cross, axis=0), 0.0)
+    coefficients = np.vstack([y_mean - x_mean @ betas, betas])
+    unscaled = np.concatenate([[1.0 / len(x) + x_mean @ gram_inverse @ x_mean], np.diag(gram_inverse)])
+    return coefficients, rss, tss, unscaled
+
+
+def factor_regression(returns, factor_returns, periods_per_year=TRADING_DAYS_PER_YEAR, min_observations=None):
+    """
+    Regress every ticker's returns on the factor returns (with an intercept).
+
+    Returns a dict with:
+    - 'betas': DataFrame (tickers x factors)
+    - 't_stats': DataFrame (tickers x alpha and factors)
+    - 'alpha': annualised intercept per ticker
+    - 'r_squared': per ticker
+    - 'residual_volatility': annualised standard deviation of the residuals per ticker
+    - 'observations': number of days used per ticker
+    Tickers with fewer than min_observations days (default: twice the number of
+    coefficients) are NaN.
+    """
+    returns, factor_returns = _align(returns, factor_returns)
+    tickers, factors = list(returns.columns), list(factor_returns.columns)
+    y = returns.to_numpy(dtype=float)
+    x = factor_returns.to_numpy(dtype=float)
+    num_coefficients = x.shape[1] + 1
+    min_observations = max(min_observations or 2 * num_coefficients, num_coefficients + 1)
+
+    coefficients = np.full((num_coefficients, y.shape[1]), np.nan)
+    standard_errors = np.full((num_coefficients, y.shape[1]), np.nan)
+    rss = np.full(y.shape[1], np.nan)
+    tss = np.full(y.shape[1], np.nan)
+    observations = np.zeros(y.shape[1], dtype=int)
+
+    # One solve for the tickers with every day, then one per missing-day pattern of
+    # the others (compared as packed bit strings)
+    valid = np.isfinite(y)
+    complete = valid.all(axis=0)
+    groups = [(np.ones(len(y), dtype=bool), np.flatnonzero(complete))] if complete.any() else []
+    ragged = np.flatnonzero(~complete)
+    if len(ragged):
+        packed = np.ascontiguousarray(np.packbits(valid[:, ragged], axis=0).T)
+        keys = packed.view(np.dtype((np.void, packed.shape[1]))).ravel()
+        _, first, pattern = np.unique(keys, return_index=True, return_inverse=True)
+        groups += [(valid[:, ragged[column]], ragged[pattern.ravel() == number]) for number, column in enumerate(first)]
+
+    for rows, columns in groups:
+        count = int(rows.sum())
+        observations[columns] = count
+        if count < min_observations:
+            continue
+        group_y = y if len(columns) == y.shape[1] else y[:, columns]
+        if count < len(y):
+            group_y = group_y[rows]
+        group_coefficients, group_rss, group_tss, unscaled = _solve(group_y, x[rows])
+        variance = group_rss / (count - num_coefficients)
+        coefficients[:, columns] = group_coefficients
+        standard_errors[:, columns] = np.sqrt(np.outer(unscaled, variance))
+        rss[columns] = group_rss
+        tss[columns] = group_tss
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_stats = coefficients / standard_errors
+        r_squared = 1.0 - rss / tss
+        residual_variance = rss / (observations - num_coefficients)
+    return {
+        'betas': pd.DataFrame(coefficients[1:].T, index=tickers, columns=factors),
+        't_stats': pd.DataFrame(t_stats.T, index=tickers, columns=['alpha'] + factors),
+        'alpha': pd.Series(coefficients[0] * periods_per_year, index=tickers, name='Alpha'),
+        'r_squared': pd.Series(r_squared, index=tickers, name='R squared'),
+        'residual_volatility': pd.Series(np.sqrt(residual_variance * periods_per_year), index=tickers,
+                                         name='Residual volatility'),
+        'observations': pd.Series(observations, index=tickers, name='Observations')
+    }
+
+
+def rolling_factor_regression(returns, factor_returns, window=ROLLING_WINDOW, step=ROLLING_CORRELATION_STEP,
+                              periods_per_year=TRADING_DAYS_PER_YEAR, dtype=np.float32):
+    """
+    Factor regression of every ticker over a trailing window, every `step` days.
+
+    X'X and X'Y are carried from one window to the next by adding the days that enter
+    and subtracting the days that leave, so each window costs O(step * factors *
+    tickers) plus one small solve shared by every ticker. A ticker missing a return
+    inside a window is NaN for that window.
+
+    Returns a dict with 'betas' and 't_stats' arrays of shape (windows, tickers,
+    factors) and (windows, tickers, 1 + factors) in `dtype`, window-end indexed
+    'alpha', 'r_squared' and 'residual_volatility' DataFrames, and 'index',
+    'tickers' and 'factors'.
+    """
+    returns, factor_returns = _align(returns, factor_returns)
+    tickers, factors = list(returns.columns), list(factor_returns.columns)
+    data = returns.to_numpy(dtype=float)
+    x = np.hstack([np.ones((len(data), 1)), factor_returns.to_numpy(dtype=float)])
+    num_rows, num_coefficients = x.shape
+    ends = np.arange(window - 1, num_rows, step)
+
+    betas = np.full((len(ends), len(tickers), len(factors)), np.nan, dtype=dtype)
+    t_stats = np.full((len(ends), len(tickers), num_coefficients), np.nan, dtype=dtype)
+    alpha = np.full((len(ends), len(tickers)), np.nan)
+    r_squared = np.full((len(ends), len(tickers)), np.nan)
+    residual_volatility = np.full((len(ends), len(tickers)), np.nan)
+
+    valid = np.isfinite(data)
+    # Centre each ticker so the sums of squares do not cancel; only the intercept moves
+    y = np.where(valid, data, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        centre = np.nan_to_num(y.sum(axis=0) / valid.sum(axis=0))
+    y -= centre
+    y[~valid] = 0.0
+    missing = (~valid).astype(float)
+
+    previous_end = None
+    for k, end in enumerate(ends):
+        start = end - window + 1
+        if previous_end is None or end - previous_end >= window:
+            block_x, block_y = x[start:end + 1], y[start:end + 1]
+            xtx, xty = block_x.T @ block_x, block_x.T @ block_y
+            sum_y, sum_yy = block_y.sum(axis=0), (block_y * block_y).sum(axis=0)
+            gaps = missing[start:end + 1].sum(axis=0)
+        else:
+            entering, leaving = slice(previous_end + 1, end + 1), slice(previous_end - window + 1, start)
+            xtx += x[entering].T @ x[entering] - x[leaving].T @ x[leaving]
+            xty += x[entering].T @ y[entering] - x[leaving].T @ y[leaving]
+            sum_y += y[entering].sum(axis=0) - y[leaving].sum(axis=0)
+            sum_yy += (y[entering] ** 2).sum(axis=0) - (y[leaving] ** 2).sum(axis=0)
+            gaps += missing[entering].sum(axis=0) - missing[leaving].sum(axis=0)
+        previous_end = end
+
+        inverse = np.linalg.pinv(xtx)
+        coefficients = inverse @ xty
+        rss = np.maximum(sum_yy - np.sum(coefficients * xty, axis=0), 0.0)
+        variance = rss / (window - num_coefficients)
+        coefficients[0] += centre
+        incomplete = gaps > 0.5
+        coefficients[:, incomplete] = np.nan
+        variance[incomplete] = np.nan
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t_stats[k] = (coefficients / np.sqrt(np.diag(inverse))[:, None] / np.sqrt(variance)).T
+            r_squared[k] = np.where(incomplete, np.nan, 1.0 - rss / (sum_yy - sum_y * sum_y / window))
+        betas[k] = coefficients[1:].T
+        alpha[k] = coefficients[0] * periods_per_year
+        residual_volatility[k] = np.sqrt(variance * periods_per_year)
+
+    index = returns.index[ends]
+    return {
+        'betas': betas,
+        't_stats': t_stats,
+        'alpha': pd.DataFrame(alpha, index=index, columns=tickers),
+        'r_squared': pd.DataFrame(r_squared, index=index, columns=tickers),
+        'residual_volatility': pd.DataFrame(residual_volatility, index=index, columns=tickers),
+        'index': index,
+        'tickers': tickers,
+        'factors': factors
+    }
+
+
+def calculate_factor_exposures(returns, factor_returns, window=ROLLING_WINDOW, step=ROLLING_CORRELATION_STEP,
+                               periods_per_year=TRADING_DAYS_PER_YEAR):
+    """Full-period factor regression plus its rolling variant, or None without factor returns"""
+    if returns is None or factor_returns is None or factor_returns.empty:
+        return None
+    exposures = factor_regression(returns, factor_returns, periods_per_year)
+    exposures['rolling'] = rolling_factor_regression(returns, factor_returns, window, step, periods_per_year)
+    return exposures
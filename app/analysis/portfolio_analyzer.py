@@ -1,5 +1,7 @@
 import pandas as pd
 from app.calculations.portfolio_calculations import portfolio_value_evoluvation
+from app.analysis.risk_metrics import calculate_risk_metrics, portfolio_values_to_returns, rank_strategies
+from app.config.config import DEFAULT_RANKING_METRIC
 
 
 class PortfolioAnalyzer:
@@ -8,27 +10,55 @@ class PortfolioAnalyzer:
     def __init__(self, tickers):
         self.tickers = tickers
         self.return_values = {}
+        self.portfolio_values = {}
+        self.strategy_reports = {}
     
-    def analyze_strategy(self, strategy_name, weights, years=3):
+    def analyze_strategy(self, strategy_name, weights, years=3, prices=None):
         """Analyze a specific portfolio strategy"""
-        portfolio_value = portfolio_value_evoluvation(self.tickers, weights, years)
-        
+        portfolio_value = portfolio_value_evoluvation(self.tickers, weights, years, prices)
+        return self.record_strategy(strategy_name, portfolio_value)
+    
+    def record_strategy(self, strategy_name, portfolio_value):
+        """Record an already computed portfolio value evolution for a strategy"""
         if portfolio_value is not None:
-            total_return = (portfolio_value['Profit Close'][-1]/portfolio_value['Profit Close'][0])-1
+            total_return = (portfolio_value['Profit Close'].iloc[-1]/portfolio_value['Profit Close'].iloc[0])-1
             self.return_values[strategy_name] = total_return
+            self.portfolio_values[strategy_name] = portfolio_value['Profit Close']
             return portfolio_value, total_return
         else:
             self.return_values[strategy_name] = 0
             return None, 0
     
-    def get_best_strategy(self):
-        """Get the strategy with the best return"""
+    def add_strategy_report(self, strategy_name, report):
+        """Attach solver diagnostics (solve time, scenario count, ...) to a strategy"""
+        self.strategy_reports[strategy_name] = report
+    
+    def get_strategy_reports(self):
+        """Get solver diagnostics for all strategies as a DataFrame"""
+        return pd.DataFrame.from_dict(self.strategy_reports, orient='index')
+    
+    def calculate_risk_metrics(self, benchmark_returns=None):
+        """Calculate the risk metrics panel for all analyzed strategies"""
+        if not self.portfolio_values:
+            return pd.DataFrame()
+        returns = portfolio_values_to_returns(self.portfolio_values)
+        return calculate_risk_metrics(returns, benchmark_returns)
+    
+    def get_best_strategy(self, metric=DEFAULT_RANKING_METRIC, benchmark_returns=None):
+        """Get the best strategy ranked by total return or any risk metric"""
         if not self.return_values:
             return None, 0
         
-        best_strategy = max(self.return_values, key=lambda k: self.return_values[k])
-        best_return = self.return_values[best_strategy]
-        return best_strategy, best_return
+        if metric == 'total_return':
+            best_strategy = max(self.return_values, key=lambda k: self.return_values[k])
+            best_return = self.return_values[best_strategy]
+            return best_strategy, best_return
+        
+        ranking = rank_strategies(self.calculate_risk_metrics(benchmark_returns), metric)
+        if ranking.empty:
+            return None, 0
+        best_strategy = ranking.index[0]
+        return best_strategy, self.return_values[best_strategy]
     
     def get_all_returns(self):
         """Get all strategy returns"""
@@ -36,4 +66,4 @@ class PortfolioAnalyzer:
     
     def create_recommendation_dataframe(self, strategy_name, weights):
         """Create a DataFrame for weight recommendations"""
-        return pd.DataFrame({'Key': self.tickers, 'Value': weights})
\ No newline at end of file
+        return pd.DataFrame({'Key': self.tickers, 'Value': weights})
@@ -0,0 +1,154 @@
+import numpy as np
+import pandas as pd
+from statistics import NormalDist
+from app.config.config import TRADING_DAYS_PER_YEAR, RISK_FREE_RATE, VAR_CONFIDENCE
+
+
+# Whether a larger value of each metric means a better strategy
+METRIC_HIGHER_IS_BETTER = {
+    'total_return': True,
+    'annual_return': True,
+    'annual_volatility': False,
+    'sharpe_ratio': True,
+    'sortino_ratio': True,
+    'max_drawdown': True,
+    'max_drawdown_duration': False,
+    'var_historical': False,
+    'cvar_historical': False,
+    'var_parametric': False,
+    'cvar_parametric': False,
+    'beta': False,
+    'tracking_error': False,
+}
+
+
+def portfolio_values_to_returns(portfolio_values):
+    """Convert a dict of strategy value series into one DataFrame of period returns"""
+    values = pd.DataFrame(portfolio_values)
+    return values.pct_change().iloc[1:]
+
+
+def calculate_risk_metrics(returns, benchmark_returns=None, periods_per_year=TRADING_DAYS_PER_YEAR,
+                           risk_free_rate=RISK_FREE_RATE, confidence=VAR_CONFIDENCE):
+    """
+    Calculate the risk metrics panel for every return path in a single vectorized pass.
+
+    Parameters:
+    - returns: DataFrame or 2-D array of period returns, one column per strategy path
+    - benchmark_returns: Series or 1-D array of benchmark returns used for beta (optional)
+    - periods_per_year: int, used to annualise return and volatility
+    - risk_free_rate: float, annual risk free rate for Sharpe and Sortino
+    - confidence: float, confidence level for VaR and CVaR
+
+    Returns a DataFrame indexed by strategy with one column per metric. Drawdowns are
+    reported as negative numbers, VaR and CVaR as positive losses per period.
+    """
+    if isinstance(returns, pd.DataFrame):
+        names = list(returns.columns)
+        index = returns.index
+        data = returns.to_numpy(dtype=float)
+    else:
+        data = np.asarray(returns, dtype=float)
+        if data.ndim == 1:
+            data = data[:, None]
+        names = list(range(data.shape[1]))
+        index = None
+
+    # Missing observations are treated as flat periods
+    data = np.where(np.isfinite(data), data, 0.0)
+    num_periods = data.shape[0]
+
+    # Return and volatility
+    growth = np.cumprod(1.0 + data, axis=0)
+    total_return = growth[-1] - 1.0
+    annual_return = np.power(growth[-1], periods_per_year / num_periods) - 1.0
+    mean = data.mean(axis=0)
+    std = data.std(axis=0, ddof=1)
+    annual_volatility = std * np.sqrt(periods_per_year)
+
+    # Sharpe and Sortino on the arithmetic mean excess return
+    period_rf = risk_free_rate / periods_per_year
+    excess = mean - period_rf
+    downside = np.sqrt(np.mean(np.minimum(data - period_rf, 0.0) ** 2, axis=0))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe_ratio = excess / std * np.sqrt(periods_per_year)
+        sortino_ratio = excess / downside * np.sqrt(periods_per_year)
+
+    # Drawdown depth and duration, including the starting value of 1
+    wealth = np.vstack([np.ones((1, data.shape[1])), growth])
+    running_peak = np.maximum.accumulate(wealth, axis=0)
+    max_drawdown = (wealth / running_peak - 1.0).min(axis=0)
+    steps = np.arange(wealth.shape[0])[:, None]
+    last_peak = np.maximum.accumulate(np.where(wealth >= running_peak, steps, 0), axis=0)
+    max_drawdown_duration = (steps - last_peak).max(axis=0)
+
+    # Historical VaR/CVaR from the empirical tail
+    quantile = np.quantile(data, 1.0 - confidence, axis=0)
+    tail = data <= quantile
+    var_historical = -quantile
+    cvar_historical = -(np.where(tail, data, 0.0).sum(axis=0) / tail.sum(axis=0))
+
+    # Parametric (Gaussian) VaR/CVaR
+    z = NormalDist().inv_cdf(1.0 - confidence)
+    var_parametric = -(mean + z * std)
+    cvar_parametric = -(mean - std * NormalDist().pdf(z) / (1.0 - confidence))
+
+    metrics = {
+        'total_return': total_return,
+        'annual_return': annual_return,
+        'annual_volatility': annual_volatility,
+        'sharpe_ratio': sharpe_ratio,
+        'sortino_ratio': sortino_ratio,
+        'max_drawdown': max_drawdown,
+        'max_drawdown_duration': max_drawdown_duration,
+        'var_historical': var_historical,
+        'cvar_historical': cvar_historical,
+        'var_parametric': var_parametric,
+        'cvar_parametric': cvar_parametric,
+    }
+
+    if benchmark_returns is not None:
+        metrics['beta'] = _calculate_path_betas(data, index, benchmark_returns)
+        metrics['tracking_error'] = _calculate_tracking_errors(data, index, benchmark_returns, periods_per_year)
+
+    return pd.DataFrame(metrics, index=names)
+
+
+def _align_benchmark(data, index, benchmark_returns):
+    """Benchmark returns and return paths on the periods the benchmark has a return"""
+    if isinstance(benchmark_returns, pd.Series) and index is not None:
+        benchmark = benchmark_returns.reindex(index).to_numpy(dtype=float)
+    else:
+        benchmark = np.asarray(benchmark_returns, dtype=float)
+    valid = np.isfinite(benchmark)
+    return benchmark[valid], data[valid]
+
+
+def _calculate_tracking_errors(data, index, benchmark_returns, periods_per_year):
+    """Annualised standard deviation of every path's return in excess of the benchmark"""
+    benchmark, paths = _align_benchmark(data, index, benchmark_returns)
+    if len(benchmark) < 2:
+        return np.full(data.shape[1], np.nan)
+    return (paths - benchmark[:, None]).std(axis=0, ddof=1) * np.sqrt(periods_per_year)
+
+
+def _calculate_path_betas(data, index, benchmark_returns):
+    """Calculate beta of every return path to the benchmark with one matrix product"""
+    benchmark, paths = _align_benchmark(data, index, benchmark_returns)
+    if len(benchmark) < 2:
+        return np.full(data.shape[1], np.nan)
+
+    centered_benchmark = benchmark - benchmark.mean()
+    centered_paths = paths - paths.mean(axis=0)
+    covariance = centered_benchmark @ centered_paths / (len(benchmark) - 1)
+    variance = centered_benchmark @ centered_benchmark / (len(benchmark) - 1)
+    return covariance / variance
+
+
+def rank_strategies(metrics, metric):
+    """Order strategies from best to worst on the given metric"""
+    if metric not in METRIC_HIGHER_IS_BETTER:
+        raise ValueError(f"Unknown metric '{metric}'. Choose one of: {', '.join(METRIC_HIGHER_IS_BETTER)}")
+    if metric not in metrics.columns:
+        raise ValueError(f"Metric '{metric}' was not calculated. Benchmark returns are needed for beta and tracking error.")
+    return metrics[metric].dropna().sort_values(ascending=not METRIC_HIGHER_IS_BETTER[metric])
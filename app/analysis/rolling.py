@@ -0,0 +1,171 @@
+import numpy as np
+import pandas as pd
+from app.config.config import (
+    TRADING_DAYS_PER_YEAR, RISK_FREE_RATE, ROLLING_WINDOW, ROLLING_CORRELATION_STEP
+)
+
+
+# Every rolling statistic here is built from trailing-window sums taken as differences
+# of cumulative sums, so each step costs O(1) whatever the window length, and all
+# tickers are updated together in one array pass (no per-window Python callbacks).
+
+
+def _as_array(returns):
+    """(values, index, names) of a DataFrame, Series or 2-D array of returns"""
+    if isinstance(returns, pd.DataFrame):
+        return returns.to_numpy(dtype=float), returns.index, list(returns.columns)
+    if isinstance(returns, pd.Series):
+        return returns.to_numpy(dtype=float)[:, None], returns.index, [returns.name]
+    data = np.asarray(returns, dtype=float)
+    if data.ndim == 1:
+        data = data[:, None]
+    return data, pd.RangeIndex(data.shape[0]), list(range(data.shape[1]))
+
+
+def _window_sums(data, window):
+    """Sum of every trailing window of `window` rows, one row per window end"""
+    cumulative = np.empty((data.shape[0] + 1,) + data.shape[1:])
+    cumulative[0] = 0.0
+    np.cumsum(data, axis=0, out=cumulative[1:])
+    return cumulative[window:] - cumulative[:-window]
+
+
+def _rolling_moments(data, window, min_periods):
+    """Observation count, mean and sample variance of every trailing window, ignoring NaNs"""
+    valid = np.isfinite(data)
+    # Centre each column first so the sums of squares do not cancel catastrophically
+    centre = np.nanmean(np.where(valid, data, np.nan), axis=0) if valid.any() else 0.0
+    centred = np.where(valid, data - centre, 0.0)
+
+    count = _window_sums(valid.astype(float), window)
+    total = _window_sums(centred, window)
+    squares = _window_sums(centred * centred, window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = total / count
+        variance = (squares - total * mean) / (count - 1)
+    variance = np.maximum(variance, 0.0)
+    enough = count >= max(min_periods, 2)
+    return count, np.where(enough, mean + centre, np.nan), np.where(enough, variance, np.nan)
+
+
+def rolling_volatility(returns, window=ROLLING_WINDOW, periods_per_year=TRADING_DAYS_PER_YEAR, min_periods=None):
+    """Annualised volatility of every column over a trailing window, indexed by window end"""
+    data, index, names = _as_array(returns)
+    if data.shape[0] < window:
+        return pd.DataFrame(columns=names, dtype=float)
+    _, _, variance = _rolling_moments(data, window, min_periods or window)
+    return pd.DataFrame(np.sqrt(variance * periods_per_year), index=index[window - 1:], columns=names)
+
+
+def rolling_sharpe(returns, window=ROLLING_WINDOW, periods_per_year=TRADING_DAYS_PER_YEAR,
+                   risk_free_rate=RISK_FREE_RATE, min_periods=None):
+    """Annualised Sharpe ratio of every column over a trailing window, indexed by window end"""
+    data, index, names = _as_array(returns)
+    if data.shape[0] < window:
+        return pd.DataFrame(columns=names, dtype=float)
+    _, mean, variance = _rolling_moments(data, window, min_periods or window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = (mean - risk_free_rate / periods_per_year) / np.sqrt(variance) * np.sqrt(periods_per_year)
+    return pd.DataFrame(sharpe, index=index[window - 1:], columns=names)
+
+
+def rolling_beta(returns, benchmark_returns, window=ROLLING_WINDOW, min_periods=None):
+    """
+    Beta of every column to the benchmark over a trailing window, indexed by window end.
+    Each window uses the days on which both the column and the benchmark have a return.
+    """
+    data, index, names = _as_array(returns)
+    if isinstance(benchmark_returns, pd.Series) and isinstance(returns, (pd.DataFrame, pd.Series)):
+        benchmark = benchmark_returns.reindex(index).to_numpy(dtype=float)
+    else:
+        benchmark = np.asarray(benchmark_returns, dtype=float)
+    if data.shape[0] < window:
+        return pd.DataFrame(columns=names, dtype=float)
+
+    valid = np.isfinite(data) & np.isfinite(benchmark)[:, None]
+    x = np.where(valid, data - np.nanmean(data, axis=0), 0.0)
+    b = np.where(valid, (benchmark - np.nanmean(benchmark))[:, None], 0.0)
+
+    count = _window_sums(valid.astype(float), window)
+    sum_x = _window_sums(x, window)
+    sum_b = _window_sums(b, window)
+    sum_xb = _window_sums(x * b, window)
+    sum_bb = _window_sums(b * b, window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        covariance = sum_xb - sum_x * sum_b / count
+        variance = sum_bb - sum_b * sum_b / count
+        beta = covariance / variance
+    beta[count < max(min_periods or window, 2)] = np.nan
+    return pd.DataFrame(beta, index=index[window - 1:], columns=names)
+
+
+def rolling_correlation(returns, window=ROLLING_WINDOW, step=ROLLING_CORRELATION_STEP, dtype=np.float32):
+    """
+    Correlation matrix of all columns over a trailing window, every `step` rows.
+
+    The cross-product matrix is carried from one window to the next by adding the rows
+    that enter and subtracting the rows that leave, so each output costs O(step * n^2)
+    rather than O(window * n^2). Missing returns count as the column mean.
+
+    Returns a dict with:
+    - 'correlation': array of shape (windows, n, n) in `dtype` (float32 by default:
+      1,000 tickers take 4 MB per window)
+    - 'index': window end labels
+    - 'tickers': column names
+    """
+    data, index, names = _as_array(returns)
+    num_rows, num_columns = data.shape
+    ends = np.arange(window - 1, num_rows, step)
+    correlation = np.empty((len(ends), num_columns, num_columns), dtype=dtype)
+    if len(ends) == 0:
+        return {'correlation': correlation, 'index': index[:0], 'tickers': names}
+
+    valid = np.isfinite(data)
+    centre = np.nanmean(np.where(valid, data, np.nan), axis=0)
+    x = np.where(valid, data - centre, 0.0)
+
+    cross = None
+    sums = None
+    previous_end = None
+    for k, end in enumerate(ends):
+        start = end - window + 1
+        if cross is None or end - previous_end >= window:
+            block = x[start:end + 1]
+            cross = block.T @ block
+            sums = block.sum(axis=0)
+        else:
+            entering = x[previous_end + 1:end + 1]
+            leaving = x[previous_end - window + 1:start]
+            cross += entering.T @ entering - leaving.T @ leaving
+            sums += entering.sum(axis=0) - leaving.sum(axis=0)
+        previous_end = end
+
+        covariance = cross - np.outer(sums, sums) / window
+        scale = np.sqrt(np.maximum(np.diag(covariance), 0.0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            correlation[k] = covariance / np.outer(scale, scale)
+        np.fill_diagonal(correlation[k], 1.0)
+
+    return {'correlation': correlation, 'index': index[ends], 'tickers': names}
+
+
+def calculate_rolling_analytics(returns, benchmark_returns=None, window=ROLLING_WINDOW,
+                                correlation_step=ROLLING_CORRELATION_STEP, periods_per_year=TRADING_DAYS_PER_YEAR,
+                                risk_free_rate=RISK_FREE_RATE):
+    """
+    Rolling volatility, Sharpe ratio, beta (if benchmark returns are given) and
+    correlation of every column of returns. Returns a dict of window-end indexed
+    DataFrames plus the rolling correlation dict, or None if the history is shorter
+    than the window.
+    """
+    if returns is None or len(returns) < window:
+        return None
+    analytics = {
+        'window': window,
+        'volatility': rolling_volatility(returns, window, periods_per_year),
+        'sharpe': rolling_sharpe(returns, window, periods_per_year, risk_free_rate),
+        'correlation': rolling_correlation(returns, window, correlation_step)
+    }
+    if benchmark_returns is not None:
+        analytics['beta'] = rolling_beta(returns, benchmark_returns, window)
+    return analytics
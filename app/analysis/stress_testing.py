@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+from app.config.config import BENCHMARK_TICKER, HISTORICAL_STRESS_SCENARIOS, STRESS_RECOVERY_DAYS, STRESS_FACTOR_SHOCKS
+from app.data.price_cache import get_cached_historical_prices
+
+
+def build_historical_scenarios(tickers, scenarios=HISTORICAL_STRESS_SCENARIOS,
+                               recovery_days=STRESS_RECOVERY_DAYS, price_loader=get_cached_historical_prices):
+    """
+    Build asset growth paths for each historical shock window.
+
+    Prices are loaded once for the span covering every window plus its recovery period.
+    Each path is rebased to 1 on the first day of the window and padded with its last
+    value, giving a (scenario, day, asset) tensor. Tickers without data in a window
+    (e.g. not yet listed) are held flat and flagged in the coverage matrix.
+    """
+    windows = {name: (pd.Timestamp(start), pd.Timestamp(end)) for name, (start, end) in scenarios.items()}
+    span_start = min(start for start, _ in windows.values())
+    span_end = max(end for _, end in windows.values()) + pd.Timedelta(days=recovery_days)
+    prices = price_loader(tickers, span_start, span_end)
+    if prices is None:
+        prices = pd.DataFrame(columns=tickers, dtype=float)
+    prices = prices.reindex(columns=tickers)
+
+    paths = []
+    shock_ends = []
+    coverage = []
+    for name, (start, end) in windows.items():
+        window = prices.loc[(prices.index >= start) & (prices.index <= end + pd.Timedelta(days=recovery_days))]
+        values = window.to_numpy(dtype=float)
+        if len(values) == 0:
+            # No rows at all (e.g. every ticker listed after the window): nothing is covered
+            values = np.full((1, len(tickers)), np.nan)
+        available = np.isfinite(values[0])
+        growth = pd.DataFrame(values / values[0]).ffill().fillna(1.0).to_numpy()
+        paths.append(growth)
+        shock_ends.append(max(int(np.searchsorted(window.index, end, side='right')) - 1, 0))
+        coverage.append(available)
+
+    return _stack_scenarios(list(windows), paths, shock_ends, coverage, tickers)
+
+
+def build_factor_shock_scenarios(tickers, exposures, factor_shocks=STRESS_FACTOR_SHOCKS):
+    """
+    Build instantaneous scenarios from user-defined factor shocks.
+
+    exposures is a DataFrame (tickers x factors), or a Series of betas to the
+    benchmark; each asset moves by exposures @ shocks in a single step.
+    """
+    if isinstance(exposures, pd.Series):
+        exposures = exposures.to_frame(BENCHMARK_TICKER)
+    exposures = exposures.reindex(tickers).fillna(0.0)
+
+    paths = []
+    for name, shocks in factor_shocks.items():
+        shock_vector = pd.Series(shocks).reindex(exposures.columns).fillna(0.0)
+        asset_shock = exposures.to_numpy(dtype=float) @ shock_vector.to_numpy(dtype=float)
+        paths.append(np.vstack([np.ones(len(tickers)), np.maximum(1.0 + asset_shock, 0.0)]))
+
+    num_scenarios = len(factor_shocks)
+    return _stack_scenarios(list(factor_shocks), paths, [1] * num_scenarios,
+                            [np.ones(len(tickers), dtype=bool)] * num_scenarios, tickers)
+
+
+def _stack_scenarios(names, paths, shock_ends, coverage, tickers):
+    """Pad growth paths to a common length with their last value and stack them"""
+    length = max(len(path) for path in paths) if paths else 1
+    growth = np.ones((len(paths), length, len(tickers)))
+    lengths = np.zeros(len(paths), dtype=int)
+    for i, path in enumerate(paths):
+        growth[i, :len(path)] = path
+        growth[i, len(path):] = path[-1]
+        lengths[i] = len(path)
+    return {
+        'names': names,
+        'growth': growth,
+        'shock_end': np.array(shock_ends, dtype=int),
+        'lengths': lengths,
+        'coverage': pd.DataFrame(np.array(coverage).reshape(len(names), len(tickers)), index=names, columns=tickers)
+    }
+
+
+def combine_scenarios(*scenario_sets):
+    """Merge several scenario sets (historical, factor shocks) into one"""
+    tickers = list(scenario_sets[0]['coverage'].columns)
+    paths, shock_ends, coverage, names = [], [], [], []
+    for scenario_set in scenario_sets:
+        for i, name in enumerate(scenario_set['names']):
+            names.append(name)
+            paths.append(scenario_set['growth'][i, :scenario_set['lengths'][i]])
+            shock_ends.append(scenario_set['shock_end'][i])
+            coverage.append(scenario_set['coverage'].iloc[i].to_numpy())
+    return _stack_scenarios(names, paths, shock_ends, coverage, tickers)
+
+
+def run_stress_tests(portfolios, scenarios):
+    """
+    Apply every scenario to every portfolio as one (scenario, portfolio, day) tensor.
+
+    Parameters:
+    - portfolios: {portfolio name: weights} with weights aligned to the scenario tickers
+    - scenarios: output of build_historical_scenarios / build_factor_shock_scenarios
+
+    Returns a DataFrame indexed by (scenario, portfolio) with the loss over the shock
+    window, the max drawdown within it, the trading days from trough back to the
+    prior peak (NaN if the portfolio had not recovered by the end of the data), and the
+    covered weight: the share of the portfolio in tickers with data for the scenario
+    (the rest is held flat). Portfolios with no covered weight get NaN results.
+    """
+    names = list(portfolios)
+    weights = np.array([np.asarray(portfolios[name], dtype=float) for name in names])
+    growth = scenarios['growth']
+    shock_end = scenarios['shock_end']
+    lengths = scenarios['lengths']
+    num_days = growth.shape[1]
+
+    # Buy-and-hold value of each portfolio along each scenario path: (scenario, portfolio, day)
+    value = np.einsum('sda,pa->spd', growth, weights)
+    days = np.arange(num_days)
+    in_shock = days[None, None, :] <= shock_end[:, None, None]
+
+    loss = np.take_along_axis(value, shock_end[:, None, None], axis=2)[:, :, 0] - 1.0
+
+    running_peak = np.maximum.accumulate(value, axis=2)
+    drawdown = np.where(in_shock, value / running_peak - 1.0, 0.0)
+    max_drawdown = drawdown.min(axis=2)
+    trough = drawdown.argmin(axis=2)
+
+    peak_at_trough = np.take_along_axis(running_peak, trough[:, :, None], axis=2)
+    recovered = (value >= peak_at_trough) & (days[None, None, :] > trough[:, :, None]) \
+        & (days[None, None, :] < lengths[:, None, None])
+    first_recovery = recovered.argmax(axis=2)
+    recovery_days = np.where(recovered.any(axis=2), first_recovery - trough, np.nan)
+    recovery_days = np.where(max_drawdown < 0, recovery_days, 0.0)
+
+    # Share of each portfolio the scenario has data for: (scenario, portfolio)
+    coverage = scenarios['coverage'].to_numpy(dtype=float)
+    covered_weight = (coverage @ weights.T) / weights.sum(axis=1)[None, :]
+    uncovered = covered_weight <= 0
+    loss, max_drawdown = np.where(uncovered, np.nan, loss), np.where(uncovered, np.nan, max_drawdown)
+    recovery_days = np.where(uncovered, np.nan, recovery_days)
+
+    index = pd.MultiIndex.from_product([scenarios['names'], names], names=['Scenario', 'Portfolio'])
+    return pd.DataFrame({
+        'loss': loss.ravel(),
+        'max_drawdown': max_drawdown.ravel(),
+        'recovery_days': recovery_days.ravel(),
+        'covered_weight': covered_weight.ravel()
+    }, index=index)
@@ -0,0 +1,189 @@
+import logging
+import time
+import numpy as np
+import pandas as pd
+from scipy.linalg import cho_factor, cho_solve
+from app.config.config import (
+    TRADING_DAYS_PER_YEAR, BL_RISK_AVERSION, BL_TAU, BL_VIEW_CONFIDENCE, BL_NUM_VIEW_SCENARIOS
+)
+from app.calculations.optimization import calculate_markowitz_optimization
+
+logger = logging.getLogger(__name__)
+
+
+# Views are given by users as annual returns in percent; the model works on the daily
+# log returns used everywhere else (meanlog, sigma), so they are converted on the way in.
+
+
+def implied_returns(sigma, prior_weights, risk_aversion=BL_RISK_AVERSION):
+    """Equilibrium returns pi = risk_aversion * sigma @ w implied by the prior (market or benchmark) weights"""
+    weights = np.asarray(prior_weights, dtype=float)
+    return risk_aversion * (np.asarray(sigma, dtype=float) @ (weights / weights.sum()))
+
+
+def build_views(tickers, views, periods_per_year=TRADING_DAYS_PER_YEAR):
+    """
+    Turn a list of views into the pick matrix P (views x tickers), the view returns Q
+    (per period log returns) and the view confidences.
+
+    Each view is a dict with:
+    - 'assets': {ticker: coefficient}, e.g. {'AAPL': 1} (absolute view) or
+      {'AAPL': 1, 'MSFT': -1} (AAPL outperforms MSFT)
+    - 'return': annual return in percent (e.g. 2 for "by 2%")
+    - 'confidence': optional, in (0, 1]
+    Views naming a ticker that is not in the portfolio are skipped.
+    """
+    position = {ticker: i for i, ticker in enumerate(tickers)}
+    rows, returns, confidences = [], [], []
+    for view in views:
+        unknown = [ticker for ticker in view['assets'] if ticker not in position]
+        if unknown:
+            logger.warning(f"Skipping view on {', '.join(unknown)}: not in the portfolio")
+            continue
+        row = np.zeros(len(tickers))
+        for ticker, coefficient in view['assets'].items():
+            row[position[ticker]] = coefficient
+        rows.append(row)
+        returns.append(np.log1p(view['return'] / 100) / periods_per_year)
+        confidences.append(view.get('confidence', BL_VIEW_CONFIDENCE))
+    return np.array(rows).reshape(-1, len(tickers)), np.array(returns), np.array(confidences)
+
+
+class BlackLitterman:
+    """
+    Black-Litterman posterior for one prior, reused across many view sets.
+
+    With tau * sigma = L L' factored once, a view set (P, Q, Omega) needs only
+    A = P L (views x tickers) and the small views x views system
+    M = A A' + Omega:
+
+        posterior mean       = pi + L A' M^-1 (Q - P pi)
+        posterior covariance = sigma + tau sigma - L A' M^-1 A L'
+
+    View sets that share P and Omega (alternative view magnitudes) share one
+    Cholesky factor of M and are solved together as columns of one right-hand
+    side; view sets with different pick matrices are stacked and factored as a
+    batch. View uncertainty Omega follows He-Litterman, diag(P tau sigma P'),
+    scaled by (1 - confidence) / confidence, so confidence 1 makes a view exact.
+    """
+
+    def __init__(self, sigma, prior_weights, risk_aversion=BL_RISK_AVERSION, tau=BL_TAU):
+        self.sigma = np.asarray(sigma, dtype=float)
+        self.risk_aversion = risk_aversion
+        self.tau = tau
+        self.implied = implied_returns(self.sigma, prior_weights, risk_aversion)
+        self.factor = np.linalg.cholesky(tau * self.sigma)
+
+    def _view_system(self, pick, confidence):
+        """A = P L and M = A A' + Omega for one or a stack of pick matrices"""
+        scaled = pick @ self.factor
+        confidence = np.clip(np.asarray(confidence, dtype=float), 1e-6, 1.0)
+        omega = np.sum(scaled * scaled, axis=-1) * (1.0 - confidence) / confidence
+        system = scaled @ np.swapaxes(scaled, -1, -2)
+        system = system + omega[..., :, None] * np.eye(pick.shape[-2])
+        return scaled, system
+
+    def posterior(self, pick, view_returns, confidence=BL_VIEW_CONFIDENCE):
+        """Posterior mean and covariance for one view set"""
+        pick = np.asarray(pick, dtype=float)
+        if pick.shape[0] == 0:
+            return self.implied.copy(), self.sigma * (1.0 + self.tau)
+        means, covariance = self.posterior_batch(pick, np.asarray(view_returns, dtype=float)[None, :], confidence,
+                                                 covariance=True)
+        return means[0], covariance
+
+    def posterior_batch(self, pick, view_returns, confidence=BL_VIEW_CONFIDENCE, covariance=False):
+        """
+        Posterior means of many view sets in one call.
+
+        - pick: (views, tickers) shared by every set, or (sets, views, tickers)
+        - view_returns: (sets, views)
+        - confidence: scalar, (views,) or, with stacked pick matrices, (sets, views)
+        Returns (sets, tickers) means and, if covariance is set, the posterior
+        covariance: one (tickers, tickers) matrix for a shared pick matrix, else
+        one per set.
+        """
+        pick = np.asarray(pick, dtype=float)
+        view_returns = np.atleast_2d(np.asarray(view_returns, dtype=float))
+        scaled, system = self._view_system(pick, confidence)
+        surprise = view_returns - pick @ self.implied if pick.ndim == 2 else \
+            view_returns - np.einsum('skn,n->sk', pick, self.implied)
+
+        if pick.ndim == 2:
+            # One factorization for every set: the surprises are the columns of one right-hand side
+            system_factor = cho_factor(system, lower=True)
+            weights = cho_solve(system_factor, surprise.T)
+            means = self.implied + (self.factor @ (scaled.T @ weights)).T
+            if not covariance:
+                return means
+            shrink = cho_solve(system_factor, scaled @ self.factor.T)
+            return means, self.sigma * (1.0 + self.tau) - self.factor @ scaled.T @ shrink
+
+        # Stacked pick matrices: batched Cholesky, then the two triangular solves per set
+        system_factor = np.linalg.cholesky(system)
+        forward = np.linalg.solve(system_factor, surprise[..., None])
+        weights = np.linalg.solve(np.swapaxes(system_factor, -1, -2), forward)[..., 0]
+        means = self.implied + np.einsum('ij,skj,sk->si', self.factor, scaled, weights)
+        if not covariance:
+            return means
+        cross = self.factor @ np.swapaxes(scaled, -1, -2)  # tau sigma P' per set
+        shrink = np.linalg.solve(system_factor, np.swapaxes(cross, -1, -2))
+        return means, self.sigma * (1.0 + self.tau) - np.swapaxes(shrink, -1, -2) @ shrink
+
+
+def view_scenarios(pick, view_returns, confidence=BL_VIEW_CONFIDENCE, sigma=None, tau=BL_TAU,
+                   num_scenarios=BL_NUM_VIEW_SCENARIOS, seed=None):
+    """
+    Alternative view magnitudes: Q drawn around the stated views with the views'
+    own uncertainty (Omega), one row per scenario
+    """
+    rng = np.random.default_rng(seed)
+    pick = np.asarray(pick, dtype=float)
+    confidence = np.clip(np.asarray(confidence, dtype=float), 1e-6, 1.0)
+    spread = np.sqrt(tau * np.einsum('kn,nm,km->k', pick, np.asarray(sigma, dtype=float), pick)
+                     * (1.0 - confidence) / confidence)
+    return view_returns + rng.standard_normal((num_scenarios, len(view_returns))) * spread
+
+
+def calculate_black_litterman_optimization(sigma, prior_weights, views, constraints=None, num_points=None, tol=None,
+                                           num_scenarios=BL_NUM_VIEW_SCENARIOS, risk_aversion=BL_RISK_AVERSION,
+                                           tau=BL_TAU, seed=None):
+    """
+    Blend views into the returns implied by the prior weights and optimise on the posterior.
+
+    The posterior mean and covariance go through the Markowitz optimiser (max Sharpe
+    ratio under the constraints, plus its frontier). num_scenarios alternative view
+    sets are evaluated in one batched call to report how sensitive the portfolio's
+    expected return is to the view magnitudes.
+    Returns None when no usable view is given.
+    """
+    tickers = list(sigma.index) if isinstance(sigma, pd.DataFrame) else list(range(len(sigma)))
+    pick, view_returns, confidence = build_views(tickers, views)
+    if len(view_returns) == 0:
+        return None
+
+    start = time.perf_counter()
+    model = BlackLitterman(sigma, prior_weights, risk_aversion, tau)
+    posterior_mean, posterior_sigma = model.posterior(pick, view_returns, confidence)
+
+    scenarios = view_scenarios(pick, view_returns, confidence, model.sigma, tau, num_scenarios, seed)
+    scenario_means = model.posterior_batch(pick, scenarios, confidence)
+    solve_time = time.perf_counter() - start
+
+    kwargs = {'num_points': num_points} if num_points else {}
+    markowitz_data = calculate_markowitz_optimization(posterior_mean, posterior_sigma, len(tickers), posterior_mean,
+                                                      constraints, tol=tol, **kwargs)
+    weights = markowitz_data['optimal_weight'].x
+    scenario_returns = (scenario_means @ weights) * TRADING_DAYS_PER_YEAR
+
+    return {
+        'optimal_weight': weights,
+        'implied_returns': pd.Series(model.implied, index=tickers),
+        'posterior_meanlog': pd.Series(posterior_mean, index=tickers),
+        'posterior_sigma': pd.DataFrame(posterior_sigma, index=tickers, columns=tickers),
+        'markowitz_data': markowitz_data,
+        'num_views': len(view_returns),
+        'num_scenarios': num_scenarios,
+        'scenario_returns': scenario_returns,
+        'solve_time': solve_time
+    }
@@ -0,0 +1,135 @@
+import os
+import time
+import threading
+import numpy as np
+import pandas as pd
+from app.config.config import LATENCY_TARGET_SECONDS, COMPUTE_BUDGET_LEVELS
+from app.calculations.optimization import (
+    calculate_sharpe_ratio_optimization, calculate_markowitz_optimization, calculate_frontier_table
+)
+from app.calculations.resampling import calculate_resampled_frontier
+
+
+def run_micro_benchmark(num_tickers=5, num_days=250, seed=0):
+    """
+    Time small instances of the expensive stages on synthetic data and return
+    their unit costs in seconds:
+    - sharpe: per random portfolio
+    - frontier: per frontier point per ticker
+    - frontier_table: per frontier table point (warm-started solves, about flat in the tickers)
+    - resampled: per resample per frontier point per ticker squared
+    """
+    rng = np.random.default_rng(seed)
+    logreturns = rng.normal(0.0005, 0.01, size=(num_days, num_tickers))
+    prices = pd.DataFrame(100 * np.exp(np.cumsum(logreturns, axis=0)))
+
+    num_portfolios = 500
+    start = time.perf_counter()
+    sharpe_data = calculate_sharpe_ratio_optimization(prices, num_tickers, num_portfolios)
+    sharpe_cost = (time.perf_counter() - start) / num_portfolios
+
+    num_points = 5
+    start = time.perf_counter()
+    calculate_markowitz_optimization(sharpe_data['meanlog'], sharpe_data['sigma'], num_tickers,
+                                     sharpe_data['test_return'], num_points=num_points)
+    frontier_cost = (time.perf_counter() - start) / (num_points * num_tickers)
+
+    num_table_points = 20
+    start = time.perf_counter()
+    calculate_frontier_table(sharpe_data['meanlog'], sharpe_data['sigma'], num_tickers, num_points=num_table_points)
+    frontier_table_cost = (time.perf_counter() - start) / num_table_points
+
+    num_resamples = 20
+    start = time.perf_counter()
+    calculate_resampled_frontier(sharpe_data['logreturns'], num_resamples=num_resamples,
+                                 num_points=num_points, max_workers=1, seed=seed)
+    resampled_cost = (time.perf_counter() - start) / (num_resamples * num_points * num_tickers ** 2)
+
+    return {'sharpe': sharpe_cost, 'frontier': frontier_cost, 'frontier_table': frontier_table_cost,
+            'resampled': resampled_cost}
+
+
+class ComputeBudget:
+    """
+    Picks sample counts, frontier resolution and solver tolerances for each request
+    so the estimated run time fits a latency target.
+
+    Stage costs come from a micro-benchmark run once per process. The estimate is
+    scaled by how many analyses are running at once per CPU, so a busy instance
+    degrades to cheaper levels instead of queueing every request.
+    """
+
+    def __init__(self, target_seconds=LATENCY_TARGET_SECONDS, levels=COMPUTE_BUDGET_LEVELS, unit_costs=None):
+        self.target_seconds = target_seconds
+        self.levels = levels
+        self.unit_costs = unit_costs
+        self.active = 0
+        self.lock = threading.Lock()
+
+    def calibrate(self):
+        """Run the micro-benchmark unless unit costs are already known"""
+        with self.lock:
+            if self.unit_costs is None:
+                self.unit_costs = run_micro_benchmark()
+            return self.unit_costs
+
+    def estimate(self, settings, num_tickers, resampled=True):
+        """
+        Estimated seconds on the critical path: Sharpe, then the slower of resampling (in
+        worker processes) and Markowitz plus the frontier table, which run in threads and
+        share the interpreter. A cached frontier table costs less than estimated.
+        """
+        costs = self.calibrate()
+        sharpe = costs['sharpe'] * settings['num_portfolios']
+        frontier = costs['frontier'] * settings['frontier_points'] * num_tickers
+        frontier_table = costs['frontier_table'] * settings['frontier_table_points']
+        resampling = costs['resampled'] * settings['num_resamples'] * settings['frontier_points'] * num_tickers ** 2
+        return sharpe + max(frontier + frontier_table, resampling if resampled else 0.0)
+
+    def choose(self, num_tickers, resampled=True, queue_depth=None):
+        """
+        Return the most expensive level whose estimate, scaled by the current load,
+        fits the target (the cheapest level if none does).
+        """
+        if queue_depth is None:
+            with self.lock:
+                queue_depth = self.active
+        # Requests already running share the CPUs with this one
+        load = max(1.0, (queue_depth + 1) / (os.cpu_count() or 1))
+
+        name = None
+        estimate = None
+        for name, settings in self.levels.items():
+            estimate = self.estimate(settings, num_tickers, resampled) * load
+            if estimate <= self.target_seconds:
+                break
+        return {
+            'level': name,
+            'settings': dict(self.levels[name]),
+            'estimated_seconds': estimate,
+            'target_seconds': self.target_seconds,
+            'queue_depth': queue_depth,
+            'load': load
+        }
+
+    def enter(self):
+        """Count a request as running"""
+        with self.lock:
+            self.active += 1
+
+    def exit(self):
+        with self.lock:
+            self.active -= 1
+
+
+_default_budget = None
+_default_budget_lock = threading.Lock()
+
+
+def get_compute_budget():
+    """Process-wide compute budget shared by every session"""
+    global _default_budget
+    with _default_budget_lock:
+        if _default_budget is None:
+            _default_budget = ComputeBudget()
+        return _default_budget
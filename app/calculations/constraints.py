@@ -0,0 +1,281 @@
+import logging
+import numpy as np
+from scipy.optimize import minimize, linprog
+from app.config.config import DEFAULT_MIN_WEIGHT, DEFAULT_MAX_WEIGHT, CARDINALITY_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+
+class ConstraintError(ValueError):
+    """Raised when the portfolio constraints cannot be applied"""
+
+
+class InfeasibleConstraintsError(ConstraintError):
+    """Raised when the portfolio constraints admit no solution"""
+
+    def __init__(self, constraints):
+        self.constraints = constraints
+        super().__init__(f"Portfolio constraints are infeasible. Conflicting constraints: {', '.join(constraints)}")
+
+
+class UnknownGroupMemberError(ConstraintError):
+    """Raised when a group cap names tickers that are not in the portfolio"""
+
+    def __init__(self, group, members):
+        self.group = group
+        self.members = members
+        super().__init__(f"Group cap '{group}' names tickers not in the portfolio: {', '.join(map(str, members))}")
+
+
+def _member_positions(group, members, position):
+    """Asset index of each group member (a ticker, or an asset number for unnamed assets)"""
+    positions, unknown = [], []
+    for member in members:
+        if member in position:
+            positions.append(position[member])
+        elif isinstance(member, (int, np.integer)) and 0 <= member < len(position):
+            positions.append(int(member))
+        else:
+            unknown.append(member)
+    if unknown:
+        raise UnknownGroupMemberError(group, unknown)
+    return positions
+
+
+def _per_asset(value, tickers, default):
+    """Expand a scalar, sequence or {ticker: value} dict into one value per asset"""
+    if value is None:
+        return np.full(len(tickers), default, dtype=float)
+    if isinstance(value, dict):
+        return np.array([value.get(ticker, default) for ticker in tickers], dtype=float)
+    return np.broadcast_to(np.asarray(value, dtype=float), (len(tickers),)).copy()
+
+
+def build_constraints(tickers, min_weights=None, max_weights=None, group_caps=None,
+                      current_weights=None, max_turnover=None, max_assets=None):
+    """
+    Build the linear constraint matrices for a long-only, fully invested portfolio.
+
+    Parameters:
+    - tickers: list of str, or an int number of assets
+    - min_weights / max_weights: scalar, sequence or {ticker: weight} per-asset bounds
+    - group_caps: {group name: (member tickers, max total weight)}; members not in
+      tickers raise UnknownGroupMemberError
+    - current_weights: weights the turnover limit is measured from
+    - max_turnover: float, cap on sum(|w - current_weights|)
+    - max_assets: int, cardinality hint applied after the continuous solve
+
+    With a turnover limit the variables are [w, t] where t_i >= |w_i - current_i|,
+    so every constraint stays linear: A_eq x = b_eq, A_ub x <= b_ub, lower <= x <= upper.
+    """
+    if isinstance(tickers, int):
+        tickers = [str(i) for i in range(tickers)]
+    tickers = list(tickers)
+    num_assets = len(tickers)
+    position = {ticker: i for i, ticker in enumerate(tickers)}
+
+    lower = _per_asset(min_weights, tickers, DEFAULT_MIN_WEIGHT)
+    upper = _per_asset(max_weights, tickers, DEFAULT_MAX_WEIGHT)
+
+    # Each block is a named group of inequality rows, used to report infeasibility
+    blocks = []
+    rows = []
+    bounds = []
+
+    for name, (members, cap) in (group_caps or {}).items():
+        row = np.zeros(num_assets)
+        row[_member_positions(name, members, position)] = 1.0
+        blocks.append((f"group cap '{name}' <= {cap:.2%}", [len(rows)]))
+        rows.append(row)
+        bounds.append(cap)
+
+    num_variables = num_assets
+    if max_turnover is not None and current_weights is not None:
+        current = np.asarray(current_weights, dtype=float)
+        num_variables = 2 * num_assets
+        identity = np.eye(num_assets)
+        # w - t <= current, -w - t <= -current, sum(t) <= max_turnover
+        turnover_rows = np.vstack([
+            np.hstack([identity, -identity]),
+            np.hstack([-identity, -identity]),
+            np.concatenate([np.zeros(num_assets), np.ones(num_assets)])[None, :]
+        ])
+        rows = [np.concatenate([row, np.zeros(num_assets)]) for row in rows]
+        first = len(rows)
+        rows.extend(turnover_rows)
+        bounds.extend(np.concatenate([current, -current, [max_turnover]]))
+        blocks.append((f"max turnover <= {max_turnover:.2%}", list(range(first, len(rows)))))
+        lower = np.concatenate([lower, np.zeros(num_assets)])
+        upper = np.concatenate([upper, np.full(num_assets, 2.0)])
+
+    A_ub = np.array(rows).reshape(len(rows), num_variables)
+    b_ub = np.array(bounds, dtype=float)
+    A_eq = np.zeros((1, num_variables))
+    A_eq[0, :num_assets] = 1.0
+    b_eq = np.ones(1)
+
+    return {
+        'tickers': tickers,
+        'num_assets': num_assets,
+        'num_variables': num_variables,
+        'lower': lower,
+        'upper': upper,
+        'A_eq': A_eq,
+        'b_eq': b_eq,
+        'A_ub': A_ub,
+        'b_ub': b_ub,
+        'blocks': blocks,
+        'eq_names': ['weights sum to 100%'],
+        'current_weights': current if num_variables > num_assets else None,
+        'max_assets': max_assets
+    }
+
+
+def add_equality(constraints, row, value, name):
+    """Return a copy of the constraints with one extra equality row on the weights"""
+    extended = dict(constraints)
+    full_row = np.zeros(constraints['num_variables'])
+    full_row[:constraints['num_assets']] = row
+    extended['A_eq'] = np.vstack([constraints['A_eq'], full_row])
+    extended['b_eq'] = np.append(constraints['b_eq'], value)
+    extended['eq_names'] = constraints['eq_names'] + [name]
+    return extended
+
+
+def _find_feasible_point(constraints, skip_blocks=(), skip_bounds=False, skip_eq=()):
+    """Solve the phase-one LP, optionally with some constraint blocks removed"""
+    keep_rows = [i for name, block_rows in constraints['blocks'] if name not in skip_blocks for i in block_rows]
+    keep_eq = [i for i in range(len(constraints['b_eq'])) if i not in skip_eq]
+    num_assets = constraints['num_assets']
+    lower = constraints['lower'].copy()
+    upper = constraints['upper'].copy()
+    if skip_bounds:
+        lower[:num_assets] = 0.0
+        upper[:num_assets] = 1.0
+
+    result = linprog(
+        np.zeros(constraints['num_variables']),
+        A_ub=constraints['A_ub'][keep_rows] if keep_rows else None,
+        b_ub=constraints['b_ub'][keep_rows] if keep_rows else None,
+        A_eq=constraints['A_eq'][keep_eq] if keep_eq else None,
+        b_eq=constraints['b_eq'][keep_eq] if keep_eq else None,
+        bounds=np.column_stack([lower, upper]),
+        method='highs'
+    )
+    return result.x if result.status == 0 else None
+
+
+def check_feasibility(constraints, diagnose=True):
+    """
+    Return a feasible starting point, or raise InfeasibleConstraintsError naming a
+    minimal set of conflicting constraints (found with a deletion filter).
+    """
+    point = _find_feasible_point(constraints)
+    if point is not None:
+        return point
+    if not diagnose:
+        raise InfeasibleConstraintsError(['(not diagnosed)'])
+
+    # Deletion filter: drop each candidate in turn, keep it only if the rest becomes feasible
+    candidates = [('block', name) for name, _ in constraints['blocks']]
+    candidates += [('eq', i) for i in range(1, len(constraints['b_eq']))]
+    candidates.append(('bounds', 'per-asset min/max weights'))
+    removed = set()
+    for candidate in candidates:
+        trial = removed | {candidate}
+        point = _find_feasible_point(
+            constraints,
+            skip_blocks={name for kind, name in trial if kind == 'block'},
+            skip_bounds=('bounds', 'per-asset min/max weights') in trial,
+            skip_eq={i for kind, i in trial if kind == 'eq'}
+        )
+        if point is None:
+            removed = trial
+
+    offending = [constraints['eq_names'][0]]
+    for candidate in candidates:
+        if candidate in removed:
+            continue
+        kind, name = candidate
+        offending.append(constraints['eq_names'][name] if kind == 'eq' else name)
+    raise InfeasibleConstraintsError(offending)
+
+
+def _warm_start(constraints, x0):
+    """Starting point from weights x0, with the turnover variables set to |x0 - current|"""
+    x0 = np.asarray(x0, dtype=float)
+    if constraints['num_variables'] == constraints['num_assets']:
+        return x0
+    return np.concatenate([x0, np.abs(x0 - constraints['current_weights'])])
+
+
+def solve_constrained(objective, gradient, constraints, x0=None, tol=None, diagnose=True, quiet=False):
+    """
+    Minimise objective(w) with SLSQP under the linear constraint matrices.
+
+    All equality rows and all inequality rows are passed as one vector-valued
+    constraint each, with constant analytic Jacobians, so the number of group
+    constraints does not add Python callbacks. A warm start x0 goes straight to
+    SLSQP; the phase-one LP only runs without one, or when SLSQP fails, to raise
+    InfeasibleConstraintsError or retry from a feasible point. A dropped cardinality
+    hint or a solve that did not converge is logged as a warning unless quiet
+    (frontier points, which would repeat it for every target return).
+    """
+    num_assets = constraints['num_assets']
+    padding = np.zeros(constraints['num_variables'] - num_assets)
+
+    def full_objective(x):
+        return objective(x[:num_assets])
+
+    def full_gradient(x):
+        return np.concatenate([gradient(x[:num_assets]), padding])
+
+    def slsqp(current, start):
+        slsqp_constraints = [{
+            'type': 'eq',
+            'fun': lambda x: current['A_eq'] @ x - current['b_eq'],
+            'jac': lambda x: current['A_eq']
+        }]
+        if len(current['b_ub']):
+            slsqp_constraints.append({
+                'type': 'ineq',
+                'fun': lambda x: current['b_ub'] - current['A_ub'] @ x,
+                'jac': lambda x: -current['A_ub']
+            })
+        return minimize(full_objective, start, jac=full_gradient, method='SLSQP',
+                        bounds=np.column_stack([current['lower'], current['upper']]),
+                        constraints=slsqp_constraints, tol=tol)
+
+    def solve(current):
+        if x0 is None:
+            return slsqp(current, check_feasibility(current, diagnose))
+        result = slsqp(current, _warm_start(current, x0))
+        if not result.success:
+            # Infeasible constraints raise here; otherwise retry from a feasible point
+            result = slsqp(current, check_feasibility(current, diagnose))
+        return result
+
+    result = solve(constraints)
+
+    # Cardinality hint: keep the largest positions and re-solve with the rest at zero
+    max_assets = constraints.get('max_assets')
+    weights = result.x[:num_assets]
+    if max_assets and np.count_nonzero(weights > CARDINALITY_THRESHOLD) > max_assets:
+        dropped = np.argsort(weights)[:-max_assets]
+        reduced = dict(constraints)
+        reduced['lower'] = constraints['lower'].copy()
+        reduced['upper'] = constraints['upper'].copy()
+        reduced['lower'][dropped] = 0.0
+        reduced['upper'][dropped] = 0.0
+        x0 = None
+        try:
+            result = solve(reduced)
+        except InfeasibleConstraintsError:
+            if not quiet:
+                logger.warning(f"Cardinality hint of {max_assets} assets is incompatible with the other constraints, "
+                               "ignoring it.")
+
+    result.x = result.x[:num_assets]
+    if not result.success and not quiet:
+        logger.warning(f"Constrained optimization did not converge: {result.message}")
+    return result
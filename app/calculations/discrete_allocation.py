@@ -0,0 +1,164 @@
+import logging
+import numpy as np
+import pandas as pd
+from app.config.config import DISCRETE_ALLOCATION_REFINE, DISCRETE_ALLOCATION_MAX_NODES
+
+logger = logging.getLogger(__name__)
+
+
+def _allocation_error(target_values, shares, prices, amount):
+    """Squared tracking error in dollars, counting uninvested cash as an error"""
+    invested = shares * prices
+    leftover = amount - invested.sum()
+    return np.sum((target_values - invested) ** 2) + leftover ** 2
+
+
+def greedy_allocation(target_values, prices, amount):
+    """
+    Round down to whole shares, then keep buying the share with the best error
+    reduction per dollar spent while cash allows.
+    """
+    shares = np.floor(target_values / prices)
+    leftover = amount - np.dot(shares, prices)
+
+    while True:
+        deficit = target_values - shares * prices
+        # Reduction in squared error (assets + cash) per dollar from buying one more share
+        improvement = 2 * (deficit + leftover) - 2 * prices
+        improvement[prices > leftover + 1e-9] = -np.inf
+        best = improvement.argmax()
+        if improvement[best] <= 0:
+            break
+        shares[best] += 1
+        leftover -= prices[best]
+
+    return shares
+
+
+def branch_and_bound_allocation(target_values, prices, amount, incumbent, max_nodes=DISCRETE_ALLOCATION_MAX_NODES):
+    """
+    Refine the rounding decision of every name (floor or floor + 1 share) with a
+    depth-first branch-and-bound, seeded with the greedy solution as the incumbent.
+    The search stops after max_nodes nodes and returns the best allocation found.
+    """
+    floor_shares = np.floor(target_values / prices)
+    budget = amount - np.dot(floor_shares, prices)
+
+    best_error = _allocation_error(target_values, incumbent, prices, amount)
+    best_shares = incumbent.copy()
+
+    # Branch on the most expensive names first, they move the error the most
+    order = np.argsort(-prices)
+    p = prices[order]
+    error_down = (target_values[order] - floor_shares[order] * p) ** 2
+    error_up = (target_values[order] - (floor_shares[order] + 1) * p) ** 2
+    suffix_min_error = np.append(np.cumsum(np.minimum(error_down, error_up)[::-1])[::-1], 0.0)
+    suffix_price = np.append(np.cumsum(p[::-1])[::-1], 0.0)
+    num_names = len(p)
+
+    choice = np.zeros(num_names, dtype=bool)
+    best_choice = None
+    nodes = 0
+    # Stack entries: (depth, extra spend, asset error, round up at this depth)
+    stack = [(0, 0.0, 0.0, None)]
+
+    while stack and nodes < max_nodes:
+        depth, extra, error, up = stack.pop()
+        nodes += 1
+        if up is not None:
+            choice[depth - 1] = up
+
+        if depth == num_names:
+            total = error + (budget - extra) ** 2
+            if total < best_error:
+                best_error = total
+                best_choice = choice.copy()
+            continue
+
+        cash_floor = max(0.0, budget - extra - suffix_price[depth])
+        if error + suffix_min_error[depth] + cash_floor ** 2 >= best_error:
+            continue
+
+        down_node = (depth + 1, extra, error + error_down[depth], False)
+        can_buy = extra + p[depth] <= budget + 1e-9
+        up_node = (depth + 1, extra + p[depth], error + error_up[depth], True)
+        # Push the more promising branch last so it is explored first
+        if can_buy and error_up[depth] < error_down[depth]:
+            stack.extend([down_node, up_node])
+        elif can_buy:
+            stack.extend([up_node, down_node])
+        else:
+            stack.append(down_node)
+
+    if best_choice is not None:
+        best_shares = floor_shares.copy()
+        best_shares[order] += best_choice
+
+    return best_shares, nodes
+
+
+def calculate_discrete_allocation(tickers, weights, latest_prices, amount, current_holdings=None,
+                                  refine=DISCRETE_ALLOCATION_REFINE, max_nodes=DISCRETE_ALLOCATION_MAX_NODES):
+    """
+    Convert target weights into whole-share orders for a dollar amount.
+
+    Parameters:
+    - tickers: list of str
+    - weights: target weights aligned with tickers
+    - latest_prices: Series of prices indexed by ticker, or array aligned with tickers
+    - amount: float, total dollars to allocate
+    - current_holdings: dict or Series of shares currently held per ticker (optional)
+    - refine: bool, run the branch-and-bound refinement after the greedy pass
+
+    Returns a dict with the order table, leftover cash and tracking error. Orders are
+    long-only: weights with short positions (e.g. the Beta strategy) return None.
+    """
+    if isinstance(latest_prices, pd.Series):
+        prices = latest_prices.reindex(tickers).to_numpy(dtype=float)
+    else:
+        prices = np.asarray(latest_prices, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+
+    if amount <= 0 or np.any(~np.isfinite(prices)) or np.any(prices <= 0):
+        logger.warning("Discrete allocation needs a positive amount and a valid latest price for every ticker.")
+        return None
+    shorts = [ticker for ticker, weight in zip(tickers, weights) if weight < -1e-9]
+    if shorts:
+        logger.warning(f"Share orders are long-only; no orders for weights with short positions in {', '.join(shorts)}.")
+        return None
+    weights = np.maximum(weights, 0.0)
+
+    target_values = weights * amount
+    shares = greedy_allocation(target_values, prices, amount)
+    nodes = 0
+    if refine:
+        shares, nodes = branch_and_bound_allocation(target_values, prices, amount, shares, max_nodes)
+
+    if current_holdings is None:
+        current_shares = np.zeros(len(tickers))
+    else:
+        current_shares = pd.Series(current_holdings, dtype=float).reindex(tickers).fillna(0).to_numpy()
+
+    invested = shares * prices
+    leftover = amount - invested.sum()
+    allocated_weights = invested / amount
+    orders = shares - current_shares
+
+    allocation = pd.DataFrame({
+        'Ticker': tickers,
+        'Price': prices,
+        'Target Weight': weights,
+        'Allocated Weight': allocated_weights,
+        'Current Shares': current_shares.astype(int),
+        'Target Shares': shares.astype(int),
+        'Order': orders.astype(int),
+        'Order Value': orders * prices
+    })
+
+    return {
+        'allocation': allocation,
+        'shares': pd.Series(shares.astype(int), index=tickers),
+        'leftover': leftover,
+        'tracking_error': np.sqrt(np.sum((weights - allocated_weights) ** 2)),
+        'nodes': nodes
+    }
@@ -0,0 +1,182 @@
+import os
+import numpy as np
+from app.config.config import USE_JIT_KERNELS, JIT_CACHE_DIR
+
+# Numba is optional. Compiled kernels are cached under JIT_CACHE_DIR (unless
+# NUMBA_CACHE_DIR is already set) so a restarted or new replica loads machine code
+# from disk instead of compiling again.
+os.environ.setdefault('NUMBA_CACHE_DIR', os.path.abspath(JIT_CACHE_DIR))
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+# Each kernel has a loop implementation, compiled with Numba when it is available,
+# and a vectorized NumPy implementation used otherwise. Both compute the same
+# quantities in the same precision and agree to floating-point rounding.
+
+
+def _score_portfolios_loop(weights, meanlog, sigma):
+    num_portfolios, num_tickers = weights.shape
+    returns = np.empty(num_portfolios)
+    volatility = np.empty(num_portfolios)
+    for k in range(num_portfolios):
+        portfolio_return = 0.0
+        variance = 0.0
+        for i in range(num_tickers):
+            portfolio_return += meanlog[i] * weights[k, i]
+            row = 0.0
+            for j in range(num_tickers):
+                row += sigma[i, j] * weights[k, j]
+            variance += weights[k, i] * row
+        returns[k] = portfolio_return
+        volatility[k] = np.sqrt(variance)
+    return returns, volatility, returns / volatility
+
+
+def _score_portfolios_numpy(weights, meanlog, sigma):
+    returns = weights @ meanlog
+    volatility = np.sqrt(np.sum((weights @ sigma) * weights, axis=1))
+    return returns, volatility, returns / volatility
+
+
+def _benchmark_covariances_loop(returns, benchmark):
+    num_periods, num_tickers = returns.shape
+    covariance = np.empty(num_tickers)
+    for i in range(num_tickers):
+        count = 0
+        sum_x = 0.0
+        sum_b = 0.0
+        for t in range(num_periods):
+            if np.isfinite(returns[t, i]) and np.isfinite(benchmark[t]):
+                count += 1
+                sum_x += returns[t, i]
+                sum_b += benchmark[t]
+        if count < 2:
+            covariance[i] = np.nan
+            continue
+        mean_x = sum_x / count
+        mean_b = sum_b / count
+        cross = 0.0
+        for t in range(num_periods):
+            if np.isfinite(returns[t, i]) and np.isfinite(benchmark[t]):
+                cross += (returns[t, i] - mean_x) * (benchmark[t] - mean_b)
+        covariance[i] = cross / (count - 1)
+    return covariance
+
+
+def _benchmark_covariances_numpy(returns, benchmark):
+    valid = np.isfinite(returns) & np.isfinite(benchmark)[:, None]
+    count = valid.sum(axis=0)
+    x = np.where(valid, returns, 0.0)
+    b = np.where(valid, benchmark[:, None], 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_x = x.sum(axis=0) / count
+        mean_b = b.sum(axis=0) / count
+        cross = np.where(valid, (returns - mean_x) * (benchmark[:, None] - mean_b), 0.0).sum(axis=0)
+        covariance = cross / (count - 1)
+    return np.where(count >= 2, covariance, np.nan)
+
+
+def _beta_weights_loop(betas, target_beta):
+    total_beta = 0.0
+    for i in range(len(betas)):
+        if not np.isnan(betas[i]):
+            total_beta += betas[i]
+    weights = np.empty(len(betas))
+    total_weight = 0.0
+    for i in range(len(betas)):
+        weights[i] = (target_beta - betas[i]) / (total_beta - betas[i])
+        if not np.isnan(weights[i]):
+            total_weight += weights[i]
+    return weights / total_weight
+
+
+def _beta_weights_numpy(betas, target_beta):
+    total_beta = np.nansum(betas)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weights = (target_beta - betas) / (total_beta - betas)
+    return weights / np.nansum(weights)
+
+
+_LOOP_KERNELS = {
+    'score_portfolios': _score_portfolios_loop,
+    'benchmark_covariances': _benchmark_covariances_loop,
+    'beta_weights': _beta_weights_loop,
+}
+_NUMPY_KERNELS = {
+    'score_portfolios': _score_portfolios_numpy,
+    'benchmark_covariances': _benchmark_covariances_numpy,
+    'beta_weights': _beta_weights_numpy,
+}
+_compiled = {}
+
+
+def jit_available():
+    """Whether Numba is installed"""
+    return numba is not None
+
+
+def kernel_backend(backend=None):
+    """
+    Resolve the backend to use: 'jit' when enabled and Numba is installed, else 'numpy'.
+    'loop' runs the loop kernels uncompiled (slow), to check them without Numba.
+    """
+    if backend is None:
+        backend = 'jit' if USE_JIT_KERNELS and jit_available() else 'numpy'
+    if backend not in ('jit', 'numpy', 'loop'):
+        raise ValueError(f"Unknown kernel backend '{backend}', expected 'jit', 'numpy' or 'loop'")
+    if backend == 'jit' and not jit_available():
+        raise ImportError("The 'jit' kernel backend needs Numba: pip install numba")
+    return backend
+
+
+def get_kernel(name, backend=None):
+    """A kernel by name; JIT kernels are compiled on first use (or loaded from the disk cache)"""
+    backend = kernel_backend(backend)
+    if backend == 'numpy':
+        return _NUMPY_KERNELS[name]
+    if backend == 'loop':
+        return _LOOP_KERNELS[name]
+    if name not in _compiled:
+        # NumPy error model: division by zero gives inf/nan as in the NumPy kernels instead of raising
+        _compiled[name] = numba.njit(cache=True, error_model='numpy')(_LOOP_KERNELS[name])
+    return _compiled[name]
+
+
+def score_portfolios(weights, meanlog, sigma, backend=None):
+    """
+    Log return, volatility and Sharpe ratio of every row of a (portfolios, tickers)
+    weight matrix, given mean log returns and their covariance matrix.
+    """
+    weights = np.ascontiguousarray(weights, dtype=float)
+    meanlog = np.ascontiguousarray(meanlog, dtype=float)
+    sigma = np.ascontiguousarray(sigma, dtype=float)
+    return get_kernel('score_portfolios', backend)(weights, meanlog, sigma)
+
+
+def benchmark_covariances(returns, benchmark, backend=None):
+    """
+    Sample covariance of every column of a (periods, tickers) return matrix with the
+    benchmark, using the periods where both are present (NaN with fewer than two).
+    """
+    returns = np.ascontiguousarray(returns, dtype=float)
+    benchmark = np.ascontiguousarray(benchmark, dtype=float)
+    return get_kernel('benchmark_covariances', backend)(returns, benchmark)
+
+
+def beta_weights(betas, target_beta, backend=None):
+    """Weights (target - beta) / (sum of betas - beta), normalised to sum to one"""
+    betas = np.ascontiguousarray(betas, dtype=float)
+    return get_kernel('beta_weights', backend)(betas, float(target_beta))
+
+
+def warm_up(backend=None):
+    """Compile (or load from the disk cache) every kernel on tiny inputs, e.g. at process start"""
+    if kernel_backend(backend) != 'jit':
+        return
+    weights = np.full((2, 2), 0.5)
+    score_portfolios(weights, np.zeros(2), np.eye(2), 'jit')
+    benchmark_covariances(np.zeros((3, 2)), np.zeros(3), 'jit')
+    beta_weights(np.ones(2), 1.0, 'jit')
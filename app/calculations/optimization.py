@@ -1,31 +1,52 @@
+import logging
+import time
 import numpy as np
-from scipy.optimize import minimize
-from app.config.config import NUMBER_OF_PORTFOLIOS
-
-
-def calculate_sharpe_ratio_optimization(prices, num_tickers):
-    """Calculate optimal portfolio weights using Sharpe ratio optimization"""
-    returns_marco = prices/(prices.shift(1))
-    returns_marco.dropna(inplace=True)
-    logreturns = np.log(returns_marco)
-    meanlog = logreturns.mean()
-    no_porfolio = NUMBER_OF_PORTFOLIOS
-    test_weight = np.zeros((no_porfolio, num_tickers))
-    sigma = logreturns.cov()
-    test_return = np.zeros(no_porfolio)
-    test_volatility = np.zeros(no_porfolio)
-    sharpratio = np.zeros(no_porfolio)
-    
-    for k in range(no_porfolio):
-        random_weight = np.array(np.random.random(num_tickers))
-        random_weight = random_weight/sum(random_weight)
-        test_weight[k,:] = random_weight
-        #log returns
-        test_return[k] = np.sum(meanlog * random_weight) 
-        #volatility
-        test_volatility[k] = np.sqrt(np.dot(random_weight.T, np.dot(sigma, random_weight)))
-        #sharp ratio
-        sharpratio[k] = test_return[k]/test_volatility[k]
+import pandas as pd
+import scipy.sparse as sp
+from scipy.optimize import linprog
+from app.config.config import (
+    NUMBER_OF_PORTFOLIOS, MARKOWITZ_FRONTIER_POINTS, FRONTIER_TABLE_POINTS, CVAR_CONFIDENCE, CVAR_NUM_SCENARIOS,
+    TRADING_DAYS_PER_YEAR, CARDINALITY_THRESHOLD, INDEX_TRACKING_MAX_ASSETS, INDEX_TRACKING_CONTINUATION_STEPS,
+    INDEX_TRACKING_MAX_ITERATIONS, INDEX_TRACKING_TOLERANCE
+)
+from app.calculations.kernels import score_portfolios
+from app.calculations.resampling import project_to_simplex
+from app.data.alignment import align_prices, pairwise_covariance
+from app.calculations.constraints import (
+    build_constraints, add_equality, solve_constrained, InfeasibleConstraintsError
+)
+
+logger = logging.getLogger(__name__)
+
+
+def log_return_statistics(prices):
+    """
+    Daily log returns on a shared trading calendar (NaN where a ticker has none), their
+    mean and covariance. Mean and covariance use every day each ticker (pair) has a
+    return, so one late IPO does not truncate the whole history.
+    """
+    logreturns = align_prices(prices).returns_frame('log').iloc[1:]
+    sigma = pd.DataFrame(pairwise_covariance(logreturns.to_numpy()), index=logreturns.columns, columns=logreturns.columns)
+    return {'logreturns': logreturns, 'meanlog': logreturns.mean(), 'sigma': sigma}
+
+
+def calculate_sharpe_ratio_optimization(prices, num_tickers, num_portfolios=NUMBER_OF_PORTFOLIOS, statistics=None):
+    """
+    Calculate optimal portfolio weights using Sharpe ratio optimization over num_portfolios random weights.
+    statistics are precomputed log_return_statistics of the prices, if available.
+    """
+    statistics = statistics or log_return_statistics(prices)
+    meanlog = statistics['meanlog']
+    sigma = statistics['sigma']
+    # Days on which every ticker has a return, for the bootstrap and historical scenarios
+    logreturns = statistics['logreturns'].dropna()
+    no_porfolio = num_portfolios
+
+    # Same random draws as one np.random.random(num_tickers) call per portfolio
+    test_weight = np.random.random((no_porfolio, num_tickers))
+    test_weight = test_weight / test_weight.sum(axis=1, keepdims=True)
+    #log returns, volatility and sharp ratio of every portfolio
+    test_return, test_volatility, sharpratio = score_portfolios(test_weight, meanlog.to_numpy(), sigma.to_numpy())
     
     max_sharpratio = sharpratio.argmax()
     sharpratio_weight = test_weight[max_sharpratio,:]
@@ -37,49 +58,329 @@ def calculate_sharpe_ratio_optimization(prices, num_tickers):
         'max_sharpratio': max_sharpratio,
         'sharpratio_weight': sharpratio_weight,
         'meanlog': meanlog,
-        'sigma': sigma
+        'sigma': sigma,
+        'logreturns': logreturns
     }
 
 
-def calculate_markowitz_optimization(meanlog, sigma, num_tickers, test_return):
-    """Calculate Markowitz optimal portfolio"""
+def highest_feasible_return(meanlog, constraints):
+    """Highest return any portfolio meeting the constraints reaches (one LP), or None if there is none"""
+    objective = np.zeros(constraints['num_variables'])
+    objective[:constraints['num_assets']] = -meanlog
+    has_inequalities = len(constraints['b_ub']) > 0
+    highest = linprog(objective, A_ub=constraints['A_ub'] if has_inequalities else None,
+                      b_ub=constraints['b_ub'] if has_inequalities else None,
+                      A_eq=constraints['A_eq'], b_eq=constraints['b_eq'],
+                      bounds=np.column_stack([constraints['lower'], constraints['upper']]), method='highs')
+    return -highest.fun if highest.status == 0 else None
+
+
+def calculate_markowitz_optimization(meanlog, sigma, num_tickers, test_return, constraints=None, x0=None, on_point=None,
+                                     num_points=MARKOWITZ_FRONTIER_POINTS, tol=None):
+    """
+    Calculate Markowitz optimal portfolio, optionally warm-started from weights x0.
+    The frontier has num_points target returns; tol is the solver tolerance (None for SLSQP's default).
+    on_point(target return, volatility) is called as each frontier point is solved.
+    """
+    meanlog = np.asarray(meanlog, dtype=float)
+    sigma = np.asarray(sigma, dtype=float)
+    if constraints is None:
+        constraints = build_constraints(num_tickers)
+
     def negative_sharpratio(random_weight):
-        random_weights = np.array(random_weight)
-        R = np.sum(meanlog*random_weights)
-        V = np.sqrt(np.dot(random_weight.T, np.dot(sigma, random_weights)))
-        SR = R/V
-        return -SR
-    
-    def checksumtoone(random_weight):
-        return np.sum(random_weight)-1
-    
-    w_0 = [1/num_tickers for _ in range(num_tickers)]
-    bounds = [(0,1) for _ in range(num_tickers)]
-    constraints = ({'type':'eq','fun':checksumtoone})
-    optimal_weight = minimize(negative_sharpratio, w_0, method='SLSQP', bounds=bounds, constraints=constraints)
+        R = meanlog @ random_weight
+        V = np.sqrt(random_weight @ sigma @ random_weight)
+        return -R/V
+
+    def negative_sharpratio_gradient(random_weight):
+        R = meanlog @ random_weight
+        sigma_w = sigma @ random_weight
+        V = np.sqrt(random_weight @ sigma_w)
+        return -(meanlog*V - R*sigma_w/V)/V**2
+
+    optimal_weight = solve_constrained(negative_sharpratio, negative_sharpratio_gradient, constraints, x0, tol)
     
     # Calculate efficient frontier
-    returns = np.linspace(0, max(test_return), 50)
+    returns = np.linspace(0, max(test_return), num_points)
     optimal_volatility = []  
     
     def minmizevolatility(random_weight):
-        random_weights = np.array(random_weight)
-        V = np.sqrt(np.dot(random_weight.T, np.dot(sigma, random_weights)))
-        return V
-    
-    def getreturn(w):
-        w = np.array(w)
-        R = np.sum(meanlog*w)
-        return R
+        return np.sqrt(random_weight @ sigma @ random_weight)
+
+    def minmizevolatility_gradient(random_weight):
+        sigma_w = sigma @ random_weight
+        return sigma_w/np.sqrt(random_weight @ sigma_w)
 
+    # Targets above the highest feasible return have no portfolio: skip them instead of
+    # letting each one fail through the solver
+    highest_return = highest_feasible_return(meanlog, constraints)
+    previous = None
     for r in returns:
-        #find best volatility
-        constraints = ({'type':'eq','fun':checksumtoone},{'type':'eq','fun': lambda random_weight: getreturn(random_weight)- r})
-        optimal = minimize(minmizevolatility, w_0, method='SLSQP', bounds=bounds, constraints=constraints)
-        optimal_volatility.append(optimal['fun'])
+        #find best volatility, starting from the neighbouring frontier point
+        target_constraints = add_equality(constraints, meanlog, r, f"target return = {r:.6f}")
+        try:
+            if highest_return is None or r > highest_return + 1e-12:
+                raise InfeasibleConstraintsError([f"target return = {r:.6f}"])
+            optimal = solve_constrained(minmizevolatility, minmizevolatility_gradient, target_constraints, previous, tol,
+                                        diagnose=False, quiet=True)
+            optimal_volatility.append(optimal['fun'])
+            previous = optimal.x if optimal.success else None
+        except InfeasibleConstraintsError:
+            optimal_volatility.append(np.nan)
+        if on_point is not None:
+            on_point(r, optimal_volatility[-1])
     
     return {
         'optimal_weight': optimal_weight,
         'returns': returns,
         'optimal_volatility': optimal_volatility
-    }
\ No newline at end of file
+    }
+
+
+def calculate_frontier_table(meanlog, sigma, num_tickers, constraints=None, x0=None, num_points=FRONTIER_TABLE_POINTS,
+                             tol=None):
+    """
+    Weights, return and volatility of num_points portfolios along the efficient branch of
+    the frontier, from the minimum variance portfolio to the highest return the
+    constraints allow, for answering target risk/return queries without the optimiser.
+
+    Each point minimises volatility at its target return, warm-started from the previous
+    point (the minimum variance portfolio from x0). Weights are stored as float32 (points x tickers); returns
+    and volatility are per-day log values, both non-decreasing along the table.
+    """
+    meanlog = np.asarray(meanlog, dtype=float)
+    sigma = np.asarray(sigma, dtype=float)
+    if constraints is None:
+        constraints = build_constraints(num_tickers)
+
+    def volatility(random_weight):
+        return np.sqrt(random_weight @ sigma @ random_weight)
+
+    def volatility_gradient(random_weight):
+        sigma_w = sigma @ random_weight
+        return sigma_w/np.sqrt(random_weight @ sigma_w)
+
+    start = time.perf_counter()
+    minimum_variance = solve_constrained(volatility, volatility_gradient, constraints, x0, tol)
+
+    # Highest return any feasible portfolio reaches: one LP on the same constraints
+    lowest_return = meanlog @ minimum_variance.x
+    highest_return = highest_feasible_return(meanlog, constraints)
+    highest_return = lowest_return if highest_return is None else highest_return
+
+    def trace(targets):
+        weights, returns, volatilities = [minimum_variance.x], [lowest_return], [minimum_variance.fun]
+        for r in targets[1:]:
+            target_constraints = add_equality(constraints, meanlog, r, f"target return = {r:.6f}")
+            try:
+                optimal = solve_constrained(volatility, volatility_gradient, target_constraints, weights[-1], tol,
+                                            diagnose=False, quiet=True)
+            except InfeasibleConstraintsError:
+                continue
+            if optimal.success:
+                weights.append(optimal.x)
+                returns.append(meanlog @ optimal.x)
+                volatilities.append(optimal.fun)
+        return weights, np.array(returns), np.array(volatilities)
+
+    # Volatility climbs steeply near the highest return, so evenly spaced returns leave
+    # wide volatility gaps there: a coarse pass gives the curve, and the stored points
+    # are spaced evenly along its length (in units of the return and volatility ranges)
+    _, coarse_returns, coarse_volatility = trace(np.linspace(lowest_return, highest_return, max(num_points // 4, 2)))
+    steps = np.hypot(np.diff(coarse_returns) / max(np.ptp(coarse_returns), 1e-12),
+                     np.diff(coarse_volatility) / max(np.ptp(coarse_volatility), 1e-12))
+    length = np.concatenate([[0.0], np.cumsum(steps)])
+    targets = np.interp(np.linspace(0.0, length[-1], num_points), length, coarse_returns) if length[-1] > 0 else \
+        coarse_returns
+    weights, returns, volatilities = trace(targets)
+
+    return {
+        'weights': np.clip(np.array(weights), 0, None).astype(np.float32),
+        'returns': np.maximum.accumulate(returns),
+        'volatility': np.maximum.accumulate(volatilities),
+        # Mixing two neighbours can hold more assets than a cardinality limit allows
+        'interpolate': not constraints.get('max_assets'),
+        'solve_time': time.perf_counter() - start
+    }
+
+
+def frontier_portfolio(frontier, target, by='volatility'):
+    """
+    Portfolio on a frontier table at a target per-day volatility or log return (by is
+    'volatility' or 'returns'), interpolated linearly between the two neighbouring
+    stored portfolios, or the nearest one when the table does not allow mixing.
+    Targets outside the table are clipped to its ends. Returns a dict with the
+    weights, return and volatility.
+    """
+    axis = frontier[by]
+    target = min(max(target, axis[0]), axis[-1])
+    upper = min(max(int(np.searchsorted(axis, target)), 1), len(axis) - 1) if len(axis) > 1 else 0
+    lower = max(upper - 1, 0)
+    span = axis[upper] - axis[lower]
+    share = (target - axis[lower]) / span if span > 0 else 0.0
+    if not frontier['interpolate']:
+        lower = upper = upper if share >= 0.5 else lower
+        share = 0.0
+    weights = (1.0 - share) * frontier['weights'][lower].astype(float) + share * frontier['weights'][upper]
+    return {
+        'weights': weights / weights.sum(),
+        'return': (1.0 - share) * frontier['returns'][lower] + share * frontier['returns'][upper],
+        'volatility': (1.0 - share) * frontier['volatility'][lower] + share * frontier['volatility'][upper]
+    }
+
+
+def historical_return_scenarios(logreturns):
+    """Turn historical log returns into simple return scenarios (one row per day)"""
+    return np.expm1(np.asarray(logreturns, dtype=float))
+
+
+def simulate_return_scenarios(meanlog, sigma, num_scenarios=CVAR_NUM_SCENARIOS, seed=None):
+    """Simulate simple return scenarios from a multivariate normal on log returns"""
+    rng = np.random.default_rng(seed)
+    simulated_logreturns = rng.multivariate_normal(np.asarray(meanlog), np.asarray(sigma), size=num_scenarios)
+    return np.expm1(simulated_logreturns)
+
+
+def calculate_cvar_optimization(scenarios, confidence=CVAR_CONFIDENCE):
+    """
+    Calculate the long-only portfolio that minimises CVaR over return scenarios.
+
+    The Rockafellar-Uryasev LP is solved in its dual form: one variable per scenario
+    (the tail probability weight q_s, 0 <= q_s <= 1/((1-confidence)S), sum to 1) and
+    one row per asset. That keeps the basis at num_assets + 1 rows instead of
+    num_scenarios rows, and the portfolio weights come back as the row duals.
+    """
+    scenarios = np.asarray(scenarios, dtype=float)
+    num_scenarios, num_assets = scenarios.shape
+    tail_cap = 1.0 / ((1.0 - confidence) * num_scenarios)
+
+    start = time.perf_counter()
+
+    # Variables: q (num_scenarios), gamma. Maximise gamma s.t. gamma + (R^T q)_i <= 0
+    c = np.zeros(num_scenarios + 1)
+    c[-1] = -1.0
+    A_ub = sp.hstack([sp.csr_matrix(scenarios.T), sp.csr_matrix(np.ones((num_assets, 1)))], format='csr')
+    b_ub = np.zeros(num_assets)
+    A_eq = sp.csr_matrix(np.concatenate([np.ones(num_scenarios), [0.0]])[None, :])
+    b_eq = np.ones(1)
+    bounds = [(0, tail_cap)] * num_scenarios + [(None, None)]
+
+    result = linprog(c, A_ub=A_ub, b_ub=b_ub, A_eq=A_eq, b_eq=b_eq, bounds=bounds, method='highs-ds')
+    solve_time = time.perf_counter() - start
+
+    if result.status != 0:
+        logger.warning(f"CVaR optimization failed: {result.message}")
+        return None
+
+    weights = np.clip(-result.ineqlin.marginals, 0, None)
+    weights = weights / weights.sum()
+
+    return {
+        'optimal_weight': weights,
+        'cvar': -result.fun,
+        'var': float(-result.eqlin.marginals[0]),
+        'confidence': confidence,
+        'num_scenarios': num_scenarios,
+        'num_assets': num_assets,
+        'solve_time': solve_time,
+        'iterations': result.nit
+    }
+
+
+def project_to_sparse_simplex(weights, max_assets):
+    """
+    Closest long-only, fully invested weights with at most max_assets names: the
+    largest max_assets entries projected onto the simplex, the rest zero (exact for
+    this set, see Kyrillidis et al., "Sparse projections onto the simplex", 2013)
+    """
+    if max_assets >= len(weights):
+        return project_to_simplex(weights)
+    keep = np.argpartition(weights, -max_assets)[-max_assets:]
+    projected = np.zeros_like(weights)
+    projected[keep] = project_to_simplex(weights[keep])
+    return projected
+
+
+def _tracking_descent(covariance, cross, weights, max_assets, step, max_iterations, tolerance):
+    """
+    Accelerated projected gradient on w'Qw - 2c'w over the sparse simplex, restarting
+    the momentum whenever it points uphill. Returns the weights and the iteration count.
+    """
+    current = momentum = weights
+    acceleration = 1.0
+    for iteration in range(1, max_iterations + 1):
+        gradient = 2.0 * (covariance @ momentum - cross)
+        updated = project_to_sparse_simplex(momentum - step * gradient, max_assets)
+        if gradient @ (updated - current) > 0:
+            acceleration = 1.0
+        next_acceleration = (1.0 + np.sqrt(1.0 + 4.0 * acceleration ** 2)) / 2.0
+        momentum = updated + ((acceleration - 1.0) / next_acceleration) * (updated - current)
+        change = np.abs(updated - current).max()
+        current, acceleration = updated, next_acceleration
+        if change < tolerance:
+            break
+    return current, iteration
+
+
+def calculate_index_tracking(returns, index_returns, max_assets=INDEX_TRACKING_MAX_ASSETS,
+                             continuation_steps=INDEX_TRACKING_CONTINUATION_STEPS,
+                             max_iterations=INDEX_TRACKING_MAX_ITERATIONS, tolerance=INDEX_TRACKING_TOLERANCE,
+                             periods_per_year=TRADING_DAYS_PER_YEAR):
+    """
+    Long-only basket of at most max_assets names that minimises tracking error to an index.
+
+    Tracking error variance is w'Qw - 2c'w + var(index), with Q the covariance of the
+    returns and c their covariance with the index, so every iteration costs one
+    (names x names) product however long the history is. The cardinality limit is
+    reached by projected gradient steps onto the sparse simplex, with the basket size
+    stepped down geometrically from every name to max_assets so names leave
+    gradually, and the chosen names are then re-weighted. Steps are accelerated
+    (FISTA with adaptive restart). An L1 penalty would do nothing here: long-only,
+    fully invested weights always sum to 1.
+
+    Returns the weights, the annualised ex-post tracking error over the estimation
+    days, the number of names held, solve time and iteration count.
+    """
+    tickers = list(returns.columns)
+    frame = pd.concat([returns, index_returns.rename('__index__')], axis=1, join='inner').dropna()
+    if len(frame) < 2 or not tickers:
+        logger.warning("Index tracking needs at least two days with returns for every ticker and the index.")
+        return None
+    data = frame[tickers].to_numpy(dtype=float)
+    index = frame['__index__'].to_numpy(dtype=float)
+    num_assets = len(tickers)
+    max_assets = min(max_assets or num_assets, num_assets)
+
+    start = time.perf_counter()
+    centred = data - data.mean(axis=0)
+    covariance = centred.T @ centred / (len(frame) - 1)
+    cross = centred.T @ (index - index.mean()) / (len(frame) - 1)
+    step = 1.0 / (2.0 * np.linalg.eigvalsh(covariance)[-1])
+
+    # Sparse projected gradient, shrinking the basket in steps
+    weights = np.full(num_assets, 1.0 / num_assets)
+    sizes = np.unique(np.geomspace(num_assets, max_assets, continuation_steps + 1).round().astype(int))[::-1]
+    iterations = 0
+    for size in sizes:
+        weights, count = _tracking_descent(covariance, cross, weights, size, step, max_iterations, tolerance)
+        iterations += count
+
+    # Re-weight the chosen names: a convex problem on the support
+    support = np.flatnonzero(weights > 0)
+    support_weights, count = _tracking_descent(covariance[np.ix_(support, support)], cross[support], weights[support],
+                                               len(support), step, max_iterations, tolerance)
+    iterations += count
+    weights = np.zeros(num_assets)
+    weights[support] = support_weights
+    solve_time = time.perf_counter() - start
+
+    active = data @ weights - index
+    return {
+        'optimal_weight': weights,
+        'tracking_error': active.std(ddof=1) * np.sqrt(periods_per_year),
+        'max_assets': max_assets,
+        'num_assets': int(np.count_nonzero(weights > CARDINALITY_THRESHOLD)),
+        'num_observations': len(frame),
+        'solve_time': solve_time,
+        'iterations': iterations
+    }
@@ -0,0 +1,337 @@
+import os
+import json
+import time
+import pickle
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+from collections import OrderedDict, defaultdict
+from app.config.config import (
+    OPTIMIZATION_CACHE_DIR, OPTIMIZATION_CACHE_CAPACITY, OPTIMIZATION_CACHE_DISK_CAPACITY, MARKOWITZ_FRONTIER_POINTS,
+    FRONTIER_TABLE_POINTS
+)
+from app.calculations.optimization import calculate_markowitz_optimization, calculate_frontier_table
+
+
+def constraints_signature(constraints):
+    """Stable hash of a constraint set built by build_constraints (None for the defaults)"""
+    if constraints is None:
+        return 'default'
+    digest = hashlib.sha256()
+    for name in ('lower', 'upper', 'A_eq', 'b_eq', 'A_ub', 'b_ub'):
+        digest.update(np.ascontiguousarray(constraints[name], dtype=float).tobytes())
+    digest.update(str(constraints.get('max_assets')).encode())
+    return digest.hexdigest()[:16]
+
+
+class OptimizationCache:
+    """
+    LRU cache of optimisation results with disk spill and nearest-neighbour warm starts.
+
+    Entries are keyed by a hash of the ticker set, window, estimator and constraints.
+    Every entry is written to disk as {key}.pkl plus a small {key}.json of metadata,
+    each replaced atomically, so processes sharing the directory see each other's
+    entries by scanning it; there is no shared index file to overwrite. The most
+    recently used `capacity` entries are kept in memory and `disk_capacity` on disk.
+    On a miss, the closest cached solution (largest ticker overlap, then nearest
+    window end) with the same estimator and constraints is offered as a starting point.
+    """
+
+    def __init__(self, capacity=OPTIMIZATION_CACHE_CAPACITY, cache_dir=OPTIMIZATION_CACHE_DIR,
+                 disk_capacity=OPTIMIZATION_CACHE_DISK_CAPACITY):
+        self.capacity = capacity
+        self.disk_capacity = disk_capacity
+        self.cache_dir = cache_dir
+        self.memory = OrderedDict()
+        # key -> metadata, and (estimator, constraints) -> ticker -> keys holding it, for nearest()
+        self.index = {}
+        self.groups = defaultdict(lambda: defaultdict(set))
+        self.lock = threading.Lock()
+        self.metrics = {
+            'hits': 0, 'disk_hits': 0, 'misses': 0, 'warm_starts': 0,
+            'cold_solve_time': 0.0, 'cold_solves': 0, 'warm_solve_time': 0.0,
+            'time_saved_by_hits': 0.0
+        }
+        self._scan()
+
+    @staticmethod
+    def make_key(tickers, start_date, end_date, estimator, constraints_hash):
+        """Hash the inputs that determine an optimisation result (ticker order matters for the weights)"""
+        payload = json.dumps([list(tickers), str(start_date), str(end_date), estimator, constraints_hash])
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def _meta_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _write_atomic(self, path, data):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _add_to_index(self, key, meta):
+        """Record an entry's metadata (caller holds the lock)"""
+        self.index[key] = meta
+        group = self.groups[(meta['estimator'], meta['constraints'])]
+        for ticker in meta['tickers']:
+            group[ticker].add(key)
+
+    def _drop_from_index(self, key):
+        """Forget an entry (caller holds the lock)"""
+        meta = self.index.pop(key, None)
+        self.memory.pop(key, None)
+        if meta is None:
+            return
+        group = self.groups[(meta['estimator'], meta['constraints'])]
+        for ticker in meta['tickers']:
+            group[ticker].discard(key)
+
+    def _scan(self):
+        """Sync the index with the directory: add entries written by other processes or earlier runs, drop evicted ones"""
+        try:
+            names = os.listdir(self.cache_dir)
+        except FileNotFoundError:
+            return
+        if 'index.json' in names:
+            self._migrate_index()
+            names = os.listdir(self.cache_dir)
+        on_disk = {name[:-len('.json')] for name in names if name.endswith('.json')}
+        with self.lock:
+            for key in [key for key in self.index if key not in on_disk]:
+                self._drop_from_index(key)  # evicted by another process
+            unseen = [key for key in on_disk if key not in self.index]
+        found = {}
+        for key in unseen:
+            try:
+                with open(self._meta_path(key)) as f:
+                    found[key] = json.load(f)
+            except (FileNotFoundError, ValueError):
+                continue  # evicted meanwhile, or being replaced
+        with self.lock:
+            for key, meta in found.items():
+                self._add_to_index(key, meta)
+
+    def _migrate_index(self):
+        """Split the single index.json of earlier versions into per-entry metadata files"""
+        path = os.path.join(self.cache_dir, 'index.json')
+        try:
+            with open(path) as f:
+                index = json.load(f)
+        except (FileNotFoundError, ValueError):
+            index = {}
+        for key, meta in index.items():
+            if os.path.exists(self._entry_path(key)) and not os.path.exists(self._meta_path(key)):
+                self._write_atomic(self._meta_path(key), json.dumps(meta).encode())
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _fetch(self, key):
+        """Load an entry from memory or disk (caller holds the lock), returning (entry, source)"""
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return self.memory[key], 'memory'
+        try:
+            with open(self._entry_path(key), 'rb') as f:
+                entry = pickle.load(f)
+        except FileNotFoundError:
+            self._drop_from_index(key)
+            return None, None
+        self._remember(key, entry)
+        return entry, 'disk'
+
+    def get(self, key):
+        """Return the cached entry for key, from memory or disk (also if another process wrote it), or None"""
+        with self.lock:
+            entry, source = self._fetch(key)
+            if entry is None:
+                self.metrics['misses'] += 1
+                return None
+            self.metrics['hits'] += 1
+            self.metrics['disk_hits'] += source == 'disk'
+            self.metrics['time_saved_by_hits'] += entry['solve_time']
+            if key in self.index:
+                self.index[key]['used'] = time.time()
+            return entry
+
+    def put(self, key, tickers, end_date, estimator, constraints_hash, weights, result, solve_time):
+        """Store a result in memory and on disk, evicting the least recently used entries beyond disk_capacity"""
+        entry = {
+            'tickers': list(tickers),
+            'weights': np.asarray(weights, dtype=float),
+            'result': result,
+            'solve_time': solve_time
+        }
+        meta = {
+            'tickers': list(tickers),
+            'end_date': str(end_date),
+            'estimator': estimator,
+            'constraints': constraints_hash,
+            'used': time.time()
+        }
+        # The metadata file is written last: an entry is visible to other processes once complete
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._write_atomic(self._entry_path(key), pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL))
+        self._write_atomic(self._meta_path(key), json.dumps(meta).encode())
+        self._scan()
+        with self.lock:
+            self._drop_from_index(key)
+            self._add_to_index(key, meta)
+            self._remember(key, entry)
+            excess = len(self.index) - self.disk_capacity
+            evicted = sorted(self.index, key=lambda k: self.index[k].get('used', 0.0))[:max(excess, 0)]
+            for old_key in evicted:
+                self._drop_from_index(old_key)
+        for old_key in evicted:
+            for path in (self._meta_path(old_key), self._entry_path(old_key)):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass  # evicted by another process
+
+    def _remember(self, key, entry):
+        """Insert into the in-memory LRU, evicting the least recently used entry"""
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.capacity:
+            self.memory.popitem(last=False)
+
+    def nearest(self, tickers, end_date, estimator, constraints_hash):
+        """
+        Find the closest cached solution and map it onto tickers as a warm start.
+        Only entries with the same estimator and constraints that hold one of the tickers
+        are compared. Tickers the cached solution did not hold start at an equal share.
+        """
+        self._scan()
+        requested = set(tickers)
+        end = pd.Timestamp(str(end_date))
+        best_key, best_score = None, None
+        with self.lock:
+            group = self.groups.get((estimator, constraints_hash), {})
+            candidates = set().union(*(group.get(ticker, ()) for ticker in requested))
+            for key in candidates:
+                meta = self.index[key]
+                cached = set(meta['tickers'])
+                overlap = len(requested & cached) / len(requested | cached)
+                score = (overlap, -abs((pd.Timestamp(meta['end_date']) - end).days))
+                if best_score is None or score > best_score:
+                    best_key, best_score = key, score
+            if best_key is None:
+                return None
+            entry, _ = self._fetch(best_key)
+        if entry is None:
+            return None
+
+        cached_weights = dict(zip(entry['tickers'], entry['weights']))
+        x0 = np.array([cached_weights.get(ticker, 1.0 / len(tickers)) for ticker in tickers])
+        return x0 / x0.sum()
+
+    def record_solve(self, solve_time, warm):
+        """Track solve times so warm-start savings can be reported"""
+        with self.lock:
+            if warm:
+                self.metrics['warm_starts'] += 1
+                self.metrics['warm_solve_time'] += solve_time
+            else:
+                self.metrics['cold_solves'] += 1
+                self.metrics['cold_solve_time'] += solve_time
+
+    def get_metrics(self):
+        """Hit rate and solve-time savings"""
+        with self.lock:
+            m = dict(self.metrics)
+        lookups = m['hits'] + m['misses']
+        average_cold = m['cold_solve_time'] / m['cold_solves'] if m['cold_solves'] else np.nan
+        average_warm = m['warm_solve_time'] / m['warm_starts'] if m['warm_starts'] else np.nan
+        return {
+            'lookups': lookups,
+            'hits': m['hits'],
+            'disk_hits': m['disk_hits'],
+            'misses': m['misses'],
+            'hit_rate': m['hits'] / lookups if lookups else 0.0,
+            'warm_starts': m['warm_starts'],
+            'average_cold_solve_time': average_cold,
+            'average_warm_solve_time': average_warm,
+            'time_saved_by_hits': m['time_saved_by_hits'],
+            'time_saved_by_warm_starts': (average_cold - average_warm) * m['warm_starts'] if m['warm_starts'] else 0.0,
+            'memory_entries': len(self.memory),
+            'disk_entries': len(self.index)
+        }
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_optimization_cache():
+    """Process-wide optimisation cache shared by every session"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = OptimizationCache()
+        return _default_cache
+
+
+def cached_markowitz_optimization(tickers, start_date, end_date, meanlog, sigma, num_tickers, test_return,
+                                  constraints=None, estimator='sample', cache=None, on_point=None,
+                                  num_points=MARKOWITZ_FRONTIER_POINTS, tol=None):
+    """
+    Markowitz optimisation through the cache, warm-started from the nearest cached solution on a miss.
+    on_point is passed to the solver to report frontier points as they are solved (not called on a hit).
+    Frontier resolution and tolerance are part of the key; warm starts are shared across them.
+    """
+    cache = cache or get_optimization_cache()
+    constraints_hash = constraints_signature(constraints)
+    key = cache.make_key(tickers, start_date, end_date, estimator, f"{constraints_hash}:{num_points}:{tol}")
+
+    entry = cache.get(key)
+    if entry is not None:
+        result = dict(entry['result'])
+        result['cache_status'] = 'hit'
+        return result
+
+    x0 = cache.nearest(tickers, end_date, estimator, constraints_hash)
+    start = time.perf_counter()
+    result = calculate_markowitz_optimization(meanlog, sigma, num_tickers, test_return, constraints, x0=x0,
+                                              on_point=on_point, num_points=num_points, tol=tol)
+    solve_time = time.perf_counter() - start
+    cache.record_solve(solve_time, warm=x0 is not None)
+    cache.put(key, tickers, end_date, estimator, constraints_hash,
+              result['optimal_weight'].x, result, solve_time)
+
+    result = dict(result)
+    result['cache_status'] = 'warm' if x0 is not None else 'cold'
+    return result
+
+
+def cached_frontier_table(tickers, start_date, end_date, meanlog, sigma, constraints=None, estimator='sample', cache=None,
+                          num_points=FRONTIER_TABLE_POINTS, tol=None):
+    """
+    Frontier table (see calculate_frontier_table) through the cache, so every session
+    asking for the same ticker set, window and constraints reuses one table. On a miss
+    the minimum variance solve is warm-started from the nearest cached table.
+    """
+    cache = cache or get_optimization_cache()
+    constraints_hash = constraints_signature(constraints)
+    estimator = f"{estimator}:frontier"
+    key = cache.make_key(tickers, start_date, end_date, estimator, f"{constraints_hash}:{num_points}:{tol}")
+
+    entry = cache.get(key)
+    if entry is not None:
+        result = dict(entry['result'])
+        result['cache_status'] = 'hit'
+        return result
+
+    x0 = cache.nearest(tickers, end_date, estimator, constraints_hash)
+    result = calculate_frontier_table(meanlog, sigma, len(tickers), constraints, x0=x0, num_points=num_points, tol=tol)
+    cache.record_solve(result['solve_time'], warm=x0 is not None)
+    cache.put(key, tickers, end_date, estimator, constraints_hash, result['weights'][0], result, result['solve_time'])
+
+    result = dict(result)
+    result['cache_status'] = 'warm' if x0 is not None else 'cold'
+    return result
@@ -1,8 +1,12 @@
+import logging
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from app.data.data_loader import get_historical_prices
 from app.config.config import TARGET_MARKET_BETA
+from app.calculations.kernels import benchmark_covariances, beta_weights
+
+logger = logging.getLogger(__name__)
 
 
 def get_portfolio_returns(weights, daily_returns):
@@ -11,10 +15,14 @@ def get_portfolio_returns(weights, daily_returns):
     return portfolio_returns
 
 
-def calculate_risk_parity_weights(returns):
-    """Risk Parity: invest such a way that every asset we have in the portfolio has the same risk contribution"""
+def calculate_risk_parity_weights(returns, asset_volatility=None):
+    """
+    Risk Parity: invest such a way that every asset we have in the portfolio has the same risk contribution.
+    asset_volatility is the precomputed standard deviation of the daily returns, if available.
+    """
     # Calculate asset volatilities
-    asset_volatility = returns.std(axis=0)
+    if asset_volatility is None:
+        asset_volatility = returns.std(axis=0)
 
     # Calculate asset risk contributions
     asset_risk_contribution = asset_volatility / asset_volatility.sum()
@@ -33,25 +41,17 @@ def calculate_risk_parity_weights(returns):
 
 def calculate_beta(daily_returns, benchmark_returns):
     """Calculate Beta coefficient for each ticker to benchmark, SP500"""
-    beta_list = {}
-    
-    # Iterate over each asset in the portfolio
-    for ticker in daily_returns:
-        # Calculate covariance between asset returns and benchmark returns
-        covariance = daily_returns[ticker].cov(benchmark_returns)
-        
-        # Calculate variance of benchmark returns
-        variance = benchmark_returns.var()
-        
-        # Calculate beta coefficient
-        beta = covariance / variance
-        
-        # Store beta value in the dictionary
-        beta_list[ticker] = beta
-    
-    # Create a Series from the dictionary
-    beta_series = pd.Series(beta_list, name='Beta')
-    
+    # Explicit alignment onto the assets' trading days: covariance of every asset with
+    # the benchmark uses the dates where both have returns
+    aligned_benchmark = benchmark_returns.reindex(daily_returns.index)
+    covariance = benchmark_covariances(daily_returns.to_numpy(dtype=float), aligned_benchmark.to_numpy(dtype=float))
+
+    # Calculate variance of benchmark returns
+    variance = benchmark_returns.var()
+
+    # Create a Series of beta coefficients
+    beta_series = pd.Series(covariance / variance, index=daily_returns.columns, name='Beta')
+
     return beta_series
 
 
@@ -64,35 +64,27 @@ def calculate_beta_weights(data):
         # If input is already a DataFrame, use it directly
         df = data
 
-    beta_weights = {}
-    target_market_beta = TARGET_MARKET_BETA
-    sum_of_all_stock_betas = df['Beta'].sum()
-    
-    for index, row in df.iterrows():
-        numerator = target_market_beta - row['Beta']
-        denominator = sum_of_all_stock_betas - row['Beta']
-        stock_weight = numerator / denominator
-        beta_weights[index] = stock_weight
-        
-    beta_weights_df = pd.DataFrame.from_dict(beta_weights, orient='index', columns=['Weight'])
-    beta_weights_df_normalized = beta_weights_df['Weight'] / beta_weights_df['Weight'].sum()
-    
+    # (target - beta) / (sum of betas - beta) for every stock, normalised to sum to 1
+    weights = beta_weights(df['Beta'].to_numpy(dtype=float), TARGET_MARKET_BETA)
+    beta_weights_df_normalized = pd.Series(weights, index=df.index, name='Weight')
+
     return beta_weights_df_normalized
 
 
-def portfolio_value_evoluvation(tickers, value_test_weight, years):
-    """Calculate portfolio value evolution over time"""
+def portfolio_value_evoluvation(tickers, value_test_weight, years, prices=None):
+    """Calculate portfolio value evolution over time, from already loaded prices if given"""
     value_test_weight = np.array(value_test_weight)
     
     if not np.isclose(np.sum(value_test_weight), 1.0, atol=1e-6):
-        print(np.sum(value_test_weight))
-        print("Sum of weights must be 1.")
+        logger.warning(f"Sum of weights must be 1 (got {np.sum(value_test_weight):.6f}).")
         return None
 
-    end_date = datetime.today().date()
-    start_date = end_date - timedelta(days=years * 365)
-
-    stock_data = get_historical_prices(tickers, start_date, end_date)
+    if prices is not None:
+        stock_data = prices.copy()
+    else:
+        end_date = datetime.today().date()
+        start_date = end_date - timedelta(days=years * 365)
+        stock_data = get_historical_prices(tickers, start_date, end_date)
     weighted_stock_price = stock_data * value_test_weight
     stock_data.loc[:, "Profit Close"] = weighted_stock_price.sum(axis=1)
     return stock_data
\ No newline at end of file
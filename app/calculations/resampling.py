@@ -0,0 +1,217 @@
+import os
+import time
+import logging
+import threading
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from app.config.config import (
+    RESAMPLED_NUM_RESAMPLES, RESAMPLED_FRONTIER_POINTS, RESAMPLED_MAX_WORKERS,
+    RESAMPLED_MAX_ITERATIONS, RESAMPLED_TOLERANCE, RESAMPLED_BAND_PERCENTILES,
+    RESAMPLED_START_METHOD
+)
+
+logger = logging.getLogger(__name__)
+
+
+def project_to_simplex(weights):
+    """
+    Euclidean projection of every row onto {w >= 0, sum(w) = 1} (Michelot's algorithm).
+    Each pass drops the entries below the current threshold; warm-started frontier
+    iterates keep a stable support, so this converges in a few vectorized passes.
+    """
+    support = np.ones(weights.shape, dtype=bool)
+    while True:
+        count = support.sum(axis=-1, keepdims=True)
+        threshold = (np.where(support, weights, 0.0).sum(axis=-1, keepdims=True) - 1.0) / count
+        updated = support & (weights > threshold)
+        if np.array_equal(updated, support):
+            return np.maximum(weights - threshold, 0.0)
+        support = updated
+
+
+def solve_frontier_batch(means, covariances, tradeoffs, initial_weights,
+                         max_iterations=RESAMPLED_MAX_ITERATIONS, tolerance=RESAMPLED_TOLERANCE):
+    """
+    Solve min w'Sw - t mu'w over the long-only simplex for a batch of (mu, S) pairs
+    and every risk tradeoff t at once, with accelerated projected gradient (FISTA).
+
+    Parameters:
+    - means: (batch, assets)
+    - covariances: (batch, assets, assets)
+    - tradeoffs: (points,) risk tradeoffs, 0 gives the minimum variance portfolio
+    - initial_weights: (points, assets) or (batch, points, assets) warm start
+
+    The step size of each problem comes from the largest eigenvalue of its covariance,
+    which is computed once and shared by every frontier point of that problem.
+    """
+    batch = means.shape[0]
+    step = (1.0 / (2.0 * np.linalg.eigvalsh(covariances)[:, -1]))[:, None, None]
+    linear = tradeoffs[None, :, None] * means[:, None, :]
+
+    weights = np.broadcast_to(initial_weights, (batch,) + initial_weights.shape[-2:]).copy()
+    momentum = weights.copy()
+    acceleration = np.ones((batch, len(tradeoffs), 1))
+    iterations = 0
+    for iterations in range(1, max_iterations + 1):
+        gradient = 2.0 * (momentum @ covariances) - linear
+        updated = project_to_simplex(momentum - step * gradient)
+        # Adaptive restart: drop the momentum of any problem where it points uphill
+        restart = np.sum(gradient * (updated - weights), axis=-1, keepdims=True) > 0
+        acceleration = np.where(restart, 1.0, acceleration)
+        next_acceleration = (1.0 + np.sqrt(1.0 + 4.0 * acceleration ** 2)) / 2.0
+        momentum = updated + ((acceleration - 1.0) / next_acceleration) * (updated - weights)
+        change = np.abs(updated - weights).max()
+        weights = updated
+        acceleration = next_acceleration
+        if change < tolerance:
+            break
+
+    return weights, iterations
+
+
+def frontier_tradeoffs(meanlog, sigma, num_points=RESAMPLED_FRONTIER_POINTS):
+    """
+    Pick the grid of risk tradeoffs spanning the minimum-variance portfolio (t = 0)
+    to the maximum-return corner of the full-sample frontier.
+    """
+    num_assets = len(meanlog)
+    scale = 2.0 * np.trace(sigma) / num_assets / max(np.abs(meanlog).max(), 1e-12)
+    top = int(np.argmax(meanlog))
+    start = np.full((1, num_assets), 1.0 / num_assets)
+    for _ in range(40):
+        corner, _ = solve_frontier_batch(meanlog[None, :], sigma[None, :, :], np.array([scale]), start)
+        if corner[0, 0, top] > 0.99:
+            break
+        scale *= 2.0
+    # Quadratic spacing puts more points at the low-risk end where the frontier bends most
+    return scale * np.linspace(0.0, 1.0, num_points) ** 2
+
+
+def _solve_resamples(logreturns, num_resamples, seed, tradeoffs, initial_weights):
+    """Bootstrap the return history and solve a frontier for every resample (worker entry point)"""
+    rng = np.random.default_rng(seed)
+    num_days = logreturns.shape[0]
+    rows = rng.integers(0, num_days, size=(num_resamples, num_days))
+    samples = logreturns[rows]
+    means = samples.mean(axis=1)
+    centered = samples - means[:, None, :]
+    covariances = np.einsum('bdn,bdm->bnm', centered, centered) / (num_days - 1)
+    weights, iterations = solve_frontier_batch(means, covariances, tradeoffs, initial_weights)
+    return weights, iterations
+
+
+_pool = None
+_pool_size = 0
+_pool_lock = threading.Lock()
+
+
+_pool_unavailable = False
+
+
+def get_resampling_pool():
+    """
+    Process-wide worker pool shared by every session, created on first use.
+    Workers start from a clean forkserver/spawn process instead of forking the
+    multithreaded server, and the pool never grows past RESAMPLED_MAX_WORKERS.
+    Returns (None, 1) when no pool can be created, so resampling runs in-process.
+    """
+    global _pool, _pool_size, _pool_unavailable
+    with _pool_lock:
+        if _pool is None and not _pool_unavailable:
+            # forkserver does not exist on Windows: use spawn there
+            start_method = RESAMPLED_START_METHOD
+            if start_method not in multiprocessing.get_all_start_methods():
+                start_method = 'spawn'
+            cpus = os.cpu_count() or 1
+            try:
+                _pool_size = min(RESAMPLED_MAX_WORKERS or cpus, cpus)
+                _pool = ProcessPoolExecutor(max_workers=_pool_size,
+                                            mp_context=multiprocessing.get_context(start_method))
+            except (ValueError, OSError) as error:
+                logger.warning(f"Cannot start the resampling pool ({error}), resampling in-process.")
+                _pool_unavailable = True
+        return (_pool, _pool_size) if _pool is not None else (None, 1)
+
+
+def _reset_resampling_pool(pool):
+    """Drop a broken pool so the next request starts a new one"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def calculate_resampled_frontier(logreturns, num_resamples=RESAMPLED_NUM_RESAMPLES,
+                                 num_points=RESAMPLED_FRONTIER_POINTS, max_workers=RESAMPLED_MAX_WORKERS,
+                                 percentiles=RESAMPLED_BAND_PERCENTILES, seed=None):
+    """
+    Calculate the resampled (Michaud) efficient frontier.
+
+    The return history is bootstrapped num_resamples times, a frontier is solved for
+    each resample across the shared process pool, and weights are averaged at matching points
+    of the frontier (same risk tradeoff). All frontiers are warm-started from the
+    full-sample solution. Portfolios are evaluated on the full-sample estimates.
+    """
+    start = time.perf_counter()
+    logreturns = np.asarray(logreturns, dtype=float)
+    meanlog = logreturns.mean(axis=0)
+    sigma = np.cov(logreturns, rowvar=False).reshape(logreturns.shape[1], logreturns.shape[1])
+
+    tradeoffs = frontier_tradeoffs(meanlog, sigma, num_points)
+    equal_weights = np.full((num_points, len(meanlog)), 1.0 / len(meanlog))
+    full_sample, _ = solve_frontier_batch(meanlog[None, :], sigma[None, :, :], tradeoffs, equal_weights)
+    full_sample = full_sample[0]
+
+    # max_workers=1 keeps the solve in-process; anything else uses the shared pool
+    pool, pool_size = (None, 1) if max_workers == 1 else get_resampling_pool()
+    num_chunks = min(max_workers or pool_size, pool_size, num_resamples)
+    chunk_sizes = [len(chunk) for chunk in np.array_split(np.arange(num_resamples), num_chunks)]
+    seeds = np.random.SeedSequence(seed).spawn(num_chunks)
+
+    results = None
+    if num_chunks > 1:
+        try:
+            results = list(pool.map(
+                _solve_resamples,
+                [logreturns] * num_chunks, chunk_sizes, seeds,
+                [tradeoffs] * num_chunks, [full_sample] * num_chunks
+            ))
+        except (BrokenProcessPool, RuntimeError) as error:
+            # RuntimeError: another request dropped the broken pool while this one was submitting
+            logger.warning(f"Resampling pool failed ({error}), solving in-process.")
+            _reset_resampling_pool(pool)
+    if results is None:
+        results = [_solve_resamples(logreturns, size, chunk_seed, tradeoffs, full_sample)
+                   for size, chunk_seed in zip(chunk_sizes, seeds)]
+
+    resampled_weights = np.concatenate([weights for weights, _ in results])
+    iterations = max(count for _, count in results)
+
+    # Average at matching frontier points, and evaluate everything on the full sample
+    weights = resampled_weights.mean(axis=0)
+    returns = weights @ meanlog
+    volatility = np.sqrt(np.einsum('pn,nm,pm->p', weights, sigma, weights))
+    resample_returns = resampled_weights @ meanlog
+    resample_volatility = np.sqrt(np.einsum('bpn,nm,bpm->bp', resampled_weights, sigma, resampled_weights))
+    low, high = percentiles
+    max_sharpratio = int(np.argmax(returns / volatility))
+
+    return {
+        'weights': weights,
+        'returns': returns,
+        'volatility': volatility,
+        'weights_lower': np.percentile(resampled_weights, low, axis=0),
+        'weights_upper': np.percentile(resampled_weights, high, axis=0),
+        'returns_lower': np.percentile(resample_returns, low, axis=0),
+        'returns_upper': np.percentile(resample_returns, high, axis=0),
+        'volatility_lower': np.percentile(resample_volatility, low, axis=0),
+        'volatility_upper': np.percentile(resample_volatility, high, axis=0),
+        'max_sharpratio': max_sharpratio,
+        'max_sharpratio_weight': weights[max_sharpratio],
+        'num_resamples': num_resamples,
+        'iterations': iterations,
+        'solve_time': time.perf_counter() - start
+    }
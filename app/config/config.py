@@ -13,9 +13,169 @@ DEFAULT_TICKERS = 1
 # Benchmark settings
 BENCHMARK_TICKER = "^GSPC"
 
+# Download settings
+DOWNLOAD_CHUNK_SIZE = 50
+DOWNLOAD_MAX_WORKERS = 4
+DOWNLOAD_MAX_RETRIES = 3
+DOWNLOAD_BACKOFF_SECONDS = 0.5
+DOWNLOAD_RATE_LIMIT = 2.0  # requests per second across all workers
+DOWNLOAD_RATE_BURST = 4
+DOWNLOAD_TIMEOUT_SECONDS = 30
+
+# Data cache settings
+PRICE_CACHE_DIR = 'data_cache/prices'
+OPTIMIZATION_CACHE_DIR = 'data_cache/optimization'
+OPTIMIZATION_CACHE_CAPACITY = 256
+OPTIMIZATION_CACHE_DISK_CAPACITY = 4096  # entries kept on disk, least recently used deleted first
+SNAPSHOT_DIR = 'data_cache/snapshots'
+SNAPSHOT_AUTOSAVE = True  # save every analysis so it can be restored without recomputing
+SNAPSHOT_MAX_SNAPSHOTS = 50  # autosaved analyses kept, oldest deleted first
+JIT_CACHE_DIR = 'data_cache/numba'
+
+# Precompute settings: universes warmed by the precompute worker (python -m app.pipeline.precompute).
+# A universe is a list of tickers or the path of a CSV file with a 'ticker' column.
+PRECOMPUTE_DIR = 'data_cache/precomputed'
+PRECOMPUTE_UNIVERSES = {
+    'popular_etfs': ['SPY', 'QQQ', 'IWM', 'DIA', 'VTI', 'VOO', 'EFA', 'EEM', 'AGG', 'BND', 'TLT', 'GLD', 'VNQ',
+                     'XLK', 'XLF', 'XLE', 'XLV', 'XLY', 'XLP', 'XLI', 'XLU', 'XLB', 'ARKK', 'SCHD'],
+    'mega_caps': ['AAPL', 'MSFT', 'NVDA', 'GOOGL', 'AMZN', 'META', 'TSLA', 'BRK-B', 'AVGO', 'JPM', 'LLY', 'V',
+                  'UNH', 'XOM', 'MA', 'JNJ', 'PG', 'HD', 'COST', 'WMT', 'NFLX', 'KO', 'PEP', 'BAC', 'AMD'],
+}
+PRECOMPUTE_SCHEDULE = '02:00'  # local time of the nightly run
+
 # Optimization settings
 NUMBER_OF_PORTFOLIOS = 10000
+MARKOWITZ_FRONTIER_POINTS = 50
+FRONTIER_TABLE_POINTS = 200  # efficient portfolios stored for the target risk/return slider
 TARGET_MARKET_BETA = 1
+USE_JIT_KERNELS = True  # compile the numerical kernels with Numba when it is installed
+
+# Compute budget settings: the most expensive level whose estimated run time fits
+# LATENCY_TARGET_SECONDS is used. Levels are ordered from most to least expensive.
+ADAPTIVE_COMPUTE_BUDGET = True
+LATENCY_TARGET_SECONDS = 5.0
+COMPUTE_BUDGET_LEVELS = {
+    'full': {'num_portfolios': 10000, 'frontier_points': 50, 'frontier_table_points': 200,
+             'optimizer_tolerance': 1e-6, 'num_resamples': 500},
+    'standard': {'num_portfolios': 5000, 'frontier_points': 30, 'frontier_table_points': 120,
+                 'optimizer_tolerance': 1e-6, 'num_resamples': 250},
+    'reduced': {'num_portfolios': 2000, 'frontier_points': 20, 'frontier_table_points': 60,
+                'optimizer_tolerance': 1e-5, 'num_resamples': 100},
+    'minimal': {'num_portfolios': 500, 'frontier_points': 10, 'frontier_table_points': 30,
+                'optimizer_tolerance': 1e-4, 'num_resamples': 50},
+}
+
+# Risk metric settings
+TRADING_DAYS_PER_YEAR = 252
+RISK_FREE_RATE = 0.0
+VAR_CONFIDENCE = 0.95
+DEFAULT_RANKING_METRIC = 'total_return'
+
+# Trading calendar alignment settings (see app/data/alignment.py)
+ALIGNMENT_CALENDAR = 'majority'  # 'union', 'intersection' or 'majority'
+ALIGNMENT_CALENDAR_COVERAGE = 0.5  # share of listed tickers that must trade for a 'majority' calendar day
+ALIGNMENT_FILL_POLICY = 'ffill'  # 'ffill' or 'none'
+ALIGNMENT_MAX_FILL_DAYS = 5
+ALIGNMENT_MAX_GAP_DAYS = 10  # returns spanning more trading days than this are treated as missing
+ALIGNMENT_DROP_POLICY = 'none'  # 'none', 'any' or 'all'
+
+# Intraday settings: raw bars are streamed in chunks and resampled to INTRADAY_FREQUENCY
+INTRADAY_BAR_INTERVAL = '1m'
+INTRADAY_FREQUENCY = '1h'
+INTRADAY_FREQUENCIES = ['5min', '15min', '30min', '1h', '1D']
+INTRADAY_LOOKBACK_DAYS = 30
+INTRADAY_CHUNK_ROWS = 100000
+INTRADAY_REQUEST_DAYS = 7  # longest window per intraday request to the bar source
+
+# Rolling analytics settings
+ROLLING_WINDOW = 63  # trading days
+ROLLING_WINDOWS = {'1 month': 21, '3 months': 63, '6 months': 126, '1 year': 252}
+ROLLING_CORRELATION_STEP = 5  # trading days between stored correlation matrices
+ROLLING_PLOT_MAX_POINTS = 500  # longer series are downsampled before plotting
+
+# Factor exposure settings (see app/analysis/factors.py)
+FACTOR_TICKERS = [BENCHMARK_TICKER, 'IWM', 'XLK', 'XLF', 'XLE', 'XLV']  # index and sector ETF factors
+FACTOR_FILES = []  # CSV files of daily factor returns, e.g. Fama-French factors from the data library
+FACTOR_FILE_UNITS = 'percent'  # 'percent' (as in the Fama-French files) or 'decimal'
+
+# CVaR optimization settings
+CVAR_CONFIDENCE = 0.95
+CVAR_NUM_SCENARIOS = 10000
+CVAR_SCENARIO_SOURCE = 'historical'  # 'historical' or 'simulated'
+
+# Index tracking settings
+INDEX_TRACKING_INDEX = BENCHMARK_TICKER  # index replicated by the tracking basket
+INDEX_TRACKING_MAX_ASSETS = 5  # names in the basket (the cardinality limit from the constraints wins when set)
+INDEX_TRACKING_CONTINUATION_STEPS = 10  # basket sizes stepped down from every name to the target
+INDEX_TRACKING_MAX_ITERATIONS = 2000  # per basket size
+INDEX_TRACKING_TOLERANCE = 1e-9
+
+# Black-Litterman settings
+BL_PRIOR_WEIGHTS = 'market_cap'  # 'market_cap' (user weights when caps are unavailable) or 'user'
+BL_RISK_AVERSION = 2.5  # delta in the implied returns pi = delta * sigma @ w
+BL_TAU = 0.05  # uncertainty of the implied returns relative to the return covariance
+BL_VIEW_CONFIDENCE = 0.5  # default view confidence in (0, 1]; 1 makes a view exact
+BL_NUM_VIEW_SCENARIOS = 1000  # alternative view magnitudes evaluated in one batch
+
+# Discrete allocation settings
+DISCRETE_ALLOCATION_REFINE = True
+DISCRETE_ALLOCATION_MAX_NODES = 100000
+
+# Constrained optimization settings
+DEFAULT_MIN_WEIGHT = 0.0
+DEFAULT_MAX_WEIGHT = 1.0
+CARDINALITY_THRESHOLD = 1e-4
+
+# Resampled (Michaud) frontier settings
+RESAMPLED_FRONTIER = True
+RESAMPLED_NUM_RESAMPLES = 500
+RESAMPLED_FRONTIER_POINTS = 50
+RESAMPLED_MAX_WORKERS = None  # Size of the shared pool, None uses every CPU
+RESAMPLED_START_METHOD = 'forkserver'  # Never fork the multithreaded server; 'spawn' where forkserver is unavailable (Windows)
+RESAMPLED_MAX_ITERATIONS = 500
+RESAMPLED_TOLERANCE = 1e-6
+RESAMPLED_BAND_PERCENTILES = (5, 95)
+
+# Pipeline settings
+PIPELINE_MAX_WORKERS = 8
+PIPELINE_CACHE_CAPACITY = 128
+PROGRESSIVE_RESULTS = True  # draw each result as soon as its stage finishes
+PROGRESSIVE_POLL_SECONDS = 0.25
+
+# Profiling settings (see app/utils/profiler.py): open the app with ?profile=1 or tick
+# "Profile this request" under Debug to sample the Python stacks of a request
+PROFILE_QUERY_PARAM = 'profile'
+PROFILE_INTERVAL_SECONDS = 0.005
+PROFILE_DIR = 'data_cache/profiles'
+PROFILE_MAX_PROFILES = 20  # oldest profiles are deleted beyond this many
+PROFILE_MIN_FRACTION = 0.001  # flame graph frames below this share of samples are not drawn
+
+# Load test settings (app/tests/load_test.py)
+LOAD_TEST_SESSIONS = 4
+LOAD_TEST_REQUESTS_PER_SESSION = 3
+LOAD_TEST_UNIVERSE_SIZE = 40
+SOAK_ROUNDS = 10
+SOAK_RSS_GROWTH_THRESHOLD_MB = 5.0
+
+# Stress test settings: historical shock windows (start, end of the sell-off)
+HISTORICAL_STRESS_SCENARIOS = {
+    '2008 Financial Crisis': ('2008-09-01', '2009-03-09'),
+    'COVID-19 Crash (Mar 2020)': ('2020-02-19', '2020-03-23'),
+    '2022 Rate Shock': ('2022-01-03', '2022-10-12'),
+}
+STRESS_RECOVERY_DAYS = 730
+# User-defined factor shocks: {scenario name: {factor: shock}}, applied through asset betas
+STRESS_FACTOR_SHOCKS = {
+    'Market -20%': {BENCHMARK_TICKER: -0.20},
+    'Market -35%': {BENCHMARK_TICKER: -0.35},
+}
+
+# Batch report settings
+REPORT_OUTPUT_DIR = 'reports'
+REPORT_FORMAT = 'html'  # 'html' or 'pdf'
+REPORT_MAX_WORKERS = None  # None uses every CPU
+REPORT_BATCH_SIZE = 16  # clients analysed before their reports are written
+REPORT_DPI = 80
 
 # Plot settings
 PLOT_FIGURE_SIZE = (40, 12)
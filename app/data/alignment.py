@@ -0,0 +1,231 @@
+import numpy as np
+import pandas as pd
+from app.config.config import (
+    ALIGNMENT_CALENDAR, ALIGNMENT_CALENDAR_COVERAGE, ALIGNMENT_FILL_POLICY, ALIGNMENT_MAX_FILL_DAYS,
+    ALIGNMENT_MAX_GAP_DAYS, ALIGNMENT_DROP_POLICY
+)
+
+
+FILL_POLICIES = ('none', 'ffill')
+DROP_POLICIES = ('none', 'any', 'all')
+
+
+def build_calendar(observed, dates, calendar=ALIGNMENT_CALENDAR, coverage=ALIGNMENT_CALENDAR_COVERAGE):
+    """
+    Pick the trading days of the shared index from a (dates x tickers) observed mask:
+    - 'union': every day on which any ticker traded
+    - 'intersection': days on which every ticker traded
+    - 'majority': days on which at least `coverage` of the listed tickers traded, so
+      weekend crypto prints or one foreign holiday schedule do not add days to everyone
+    - a DatetimeIndex: an explicit exchange calendar
+    Returns a boolean mask over dates.
+    """
+    if isinstance(calendar, pd.DatetimeIndex):
+        return dates.isin(calendar)
+    if calendar == 'union':
+        return observed.any(axis=1)
+    if calendar == 'intersection':
+        return observed.all(axis=1)
+    if calendar == 'majority':
+        # Only tickers already listed (and not yet delisted) count towards the coverage
+        steps = np.arange(len(dates))[:, None]
+        first = np.where(observed.any(axis=0), observed.argmax(axis=0), len(dates))
+        last = len(dates) - 1 - observed[::-1].argmax(axis=0)
+        listed = (steps >= first) & (steps <= last)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            share = observed.sum(axis=1) / listed.sum(axis=1)
+        return observed.any(axis=1) & (share >= coverage)
+    raise ValueError(f"Unknown calendar '{calendar}', expected 'union', 'intersection', 'majority' or a DatetimeIndex")
+
+
+class AlignedPrices:
+    """
+    Prices of many tickers mapped onto one integer trading-day index.
+
+    Row t of `values` is trading day `calendar[t]` for every ticker; `observed` marks
+    real prices, and `values` also holds forward-filled prices where the fill policy
+    allows. `first` and `last` are each ticker's first and last observed row (its
+    listing span, -1 if never observed), and nothing is filled outside that span.
+
+    Policies:
+    - fill_policy 'ffill' carries a price over at most max_fill_days missing days
+      (exchange holidays); 'none' leaves them missing
+    - drop_policy 'any' drops days where any ticker is missing after filling, 'all'
+      days where every ticker is missing, 'none' keeps the calendar as is
+    """
+
+    def __init__(self, prices, calendar=ALIGNMENT_CALENDAR, fill_policy=ALIGNMENT_FILL_POLICY,
+                 max_fill_days=ALIGNMENT_MAX_FILL_DAYS, drop_policy=ALIGNMENT_DROP_POLICY,
+                 coverage=ALIGNMENT_CALENDAR_COVERAGE):
+        if fill_policy not in FILL_POLICIES:
+            raise ValueError(f"Unknown fill policy '{fill_policy}', expected one of {', '.join(FILL_POLICIES)}")
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy '{drop_policy}', expected one of {', '.join(DROP_POLICIES)}")
+        if isinstance(prices, pd.Series):
+            prices = prices.to_frame()
+        prices = prices.sort_index()
+        prices = prices[~prices.index.duplicated(keep='last')]
+
+        values = prices.to_numpy(dtype=float)
+        observed = np.isfinite(values)
+        keep = build_calendar(observed, prices.index, calendar, coverage)
+        self.tickers = list(prices.columns)
+        self.calendar = prices.index[keep]
+        self.fill_policy = fill_policy
+        self.max_fill_days = max_fill_days
+
+        # A price on a day dropped from the calendar (e.g. a Sunday crypto print) is the
+        # latest price of the next calendar day
+        if not keep.all():
+            rows = np.flatnonzero(keep)
+            steps = np.arange(len(values))[:, None]
+            latest = np.maximum.accumulate(np.where(observed, steps, -1), axis=0)[rows]
+            previous_row = np.concatenate([[-1], rows[:-1]])[:, None]
+            observed = latest > previous_row
+            values = np.where(observed, values[np.maximum(latest, 0), np.arange(values.shape[1])], np.nan)
+        else:
+            values = values.copy()
+
+        self.observed = observed
+        steps = np.arange(len(self.calendar))
+        self.first = np.where(observed.any(axis=0), observed.argmax(axis=0), -1)
+        self.last = np.where(observed.any(axis=0), len(self.calendar) - 1 - observed[::-1].argmax(axis=0), -1)
+        listed = (steps[:, None] >= self.first) & (steps[:, None] <= self.last) & (self.first >= 0)
+
+        if fill_policy == 'ffill':
+            values = _forward_fill(values, observed, max_fill_days)
+            values[~listed] = np.nan
+        else:
+            values[~observed] = np.nan
+        self.values = values
+
+        if drop_policy != 'none':
+            present = np.isfinite(values)
+            rows = present.all(axis=1) if drop_policy == 'any' else present.any(axis=1)
+            self._select_rows(rows)
+
+    def _select_rows(self, rows):
+        positions = np.flatnonzero(rows)
+        self.calendar = self.calendar[positions]
+        self.values = self.values[positions]
+        self.observed = self.observed[positions]
+        valid = self.observed.any(axis=0)
+        self.first = np.where(valid, self.observed.argmax(axis=0), -1)
+        self.last = np.where(valid, len(self.calendar) - 1 - self.observed[::-1].argmax(axis=0), -1)
+
+    def to_frame(self):
+        """Aligned prices as a DataFrame indexed by calendar date"""
+        return pd.DataFrame(self.values, index=self.calendar, columns=self.tickers)
+
+    def returns(self, kind='simple', max_gap_days=ALIGNMENT_MAX_GAP_DAYS):
+        """
+        Returns on the trading-day index as a (days x tickers) array plus its validity
+        mask. Each return runs from the latest available price (observed or filled)
+        to the current one, so a missing day's move lands on the next day with a
+        price rather than being lost. Returns spanning more than max_gap_days trading
+        days (suspensions) and the first day of each ticker are missing.
+        """
+        present = np.isfinite(self.values)
+        steps = np.arange(len(self.calendar))[:, None]
+        latest = np.maximum.accumulate(np.where(present, steps, -1), axis=0)
+        previous = np.vstack([np.full((1, latest.shape[1]), -1), latest[:-1]])
+        valid = present & (previous >= 0) & (steps - previous <= max_gap_days)
+
+        columns = np.arange(self.values.shape[1])
+        previous_price = self.values[np.maximum(previous, 0), columns]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = self.values / previous_price
+        if kind == 'log':
+            returns = np.log(ratio)
+        elif kind == 'simple':
+            returns = ratio - 1.0
+        else:
+            raise ValueError(f"Unknown return kind '{kind}', expected 'simple' or 'log'")
+        valid &= np.isfinite(returns)
+        returns[~valid] = np.nan
+        return returns, valid
+
+    def returns_frame(self, kind='simple', max_gap_days=ALIGNMENT_MAX_GAP_DAYS):
+        """Returns as a DataFrame indexed by calendar date (NaN where missing)"""
+        returns, _ = self.returns(kind, max_gap_days)
+        return pd.DataFrame(returns, index=self.calendar, columns=self.tickers)
+
+
+def _forward_fill(values, observed, limit):
+    """Carry each column's latest observed value forward over at most `limit` rows"""
+    steps = np.arange(values.shape[0])[:, None]
+    latest = np.maximum.accumulate(np.where(observed, steps, -1), axis=0)
+    fillable = ~observed & (latest >= 0) & (steps - latest <= limit)
+    filled = values.copy()
+    columns = np.broadcast_to(np.arange(values.shape[1]), values.shape)
+    filled[fillable] = values[latest[fillable], columns[fillable]]
+    return filled
+
+
+def align_prices(prices, **policy):
+    """Map prices onto a shared trading-day index (see AlignedPrices for the policies)"""
+    return AlignedPrices(prices, **policy)
+
+
+def nearest_psd(covariance):
+    """
+    Nearest positive semi-definite matrix (in Frobenius norm) to a symmetric one,
+    by clipping negative eigenvalues to zero. Rows and columns holding NaN are left
+    as they are and the rest is projected.
+    """
+    covariance = np.array(covariance, dtype=float)
+    finite = np.isfinite(covariance).all(axis=0)
+    block = covariance[np.ix_(finite, finite)]
+    if block.size == 0:
+        return covariance
+    eigenvalues, eigenvectors = np.linalg.eigh((block + block.T) / 2.0)
+    if eigenvalues[0] >= 0:
+        return covariance
+    covariance[np.ix_(finite, finite)] = (eigenvectors * np.maximum(eigenvalues, 0.0)) @ eigenvectors.T
+    return covariance
+
+
+def pairwise_covariance(returns, valid=None, min_periods=2, ddof=1, psd=True):
+    """
+    Covariance of every pair of columns over the rows where both are present, from
+    masked matrix products: with X the returns (0 where missing) and M the mask,
+    pair counts are M'M, pairwise sums X'M and co-moments X'X. Equivalent to
+    pandas DataFrame.cov (pairwise-complete), without dropping rows.
+
+    Pairs measured over different overlap windows need not form a positive
+    semi-definite matrix (negative portfolio variances); with psd, a matrix built
+    from incomplete data is projected with nearest_psd. Complete data is PSD as is.
+    """
+    returns = np.asarray(returns, dtype=float)
+    valid = np.isfinite(returns) if valid is None else valid & np.isfinite(returns)
+    mask = valid.astype(float)
+    x = np.where(valid, returns, 0.0)
+
+    counts = mask.T @ mask
+    sums = x.T @ mask  # sums[i, j]: sum of column i over rows where i and j are both present
+    products = x.T @ x
+    with np.errstate(divide='ignore', invalid='ignore'):
+        covariance = (products - sums * sums.T / counts) / (counts - ddof)
+    covariance[counts < max(min_periods, ddof + 1)] = np.nan
+    if psd and not valid.all():
+        covariance = nearest_psd(covariance)
+    return covariance
+
+
+def pairwise_correlation(returns, valid=None, min_periods=2):
+    """Correlation of every pair of columns over the rows where both are present (like pandas DataFrame.corr)"""
+    returns = np.asarray(returns, dtype=float)
+    valid = np.isfinite(returns) if valid is None else valid & np.isfinite(returns)
+    mask = valid.astype(float)
+    x = np.where(valid, returns, 0.0)
+
+    counts = mask.T @ mask
+    sums = x.T @ mask
+    squares = (x * x).T @ mask  # squares[i, j]: sum of column i squared where both are present
+    products = x.T @ x
+    with np.errstate(divide='ignore', invalid='ignore'):
+        covariance = products - sums * sums.T / counts
+        variance = squares - sums * sums / counts
+        correlation = covariance / np.sqrt(variance * variance.T)
+    correlation[counts < max(min_periods, 2)] = np.nan
+    return np.clip(correlation, -1.0, 1.0)
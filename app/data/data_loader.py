@@ -1,53 +1,104 @@
+import logging
 import pandas as pd
-import yfinance as yf
-from app.config.config import BENCHMARK_TICKER
-import streamlit as st
+from app.config.config import BENCHMARK_TICKER, BL_PRIOR_WEIGHTS
+from app.data.downloader import download_prices, get_default_price_source
+from app.data.alignment import align_prices
 
 
-def get_historical_prices(tickers, start_date, end_date):
-    data = yf.download(tickers, start=start_date, end=end_date, group_by='ticker', auto_adjust=False)
+# Failures raise DataLoadError subclasses; partial results (some tickers missing) are
+# returned and reported through this module's logger. Nothing here imports a UI
+# toolkit: the Streamlit app shows both through app/ui/messages.py.
+logger = logging.getLogger(__name__)
+
+
+class DataLoadError(Exception):
+    """Prices or returns could not be loaded"""
+
+
+class EmptyPriceDataError(DataLoadError):
+    """No price came back for any of the tickers; status is the per-ticker download status"""
+
+    def __init__(self, tickers, status=None):
+        self.tickers = list(tickers)
+        self.status = status
+        super().__init__("Yahoo Finance returned empty data. Please check ticker symbols and try again.")
 
-    if data.empty:
-        st.error("Yahoo Finance returned empty data. Please check ticker symbols and try again.")
-        return None
 
-    # Handle MultiIndex data (whether single or multiple tickers)
-    if isinstance(data.columns, pd.MultiIndex):
-        try:
-            adj_close = data.xs('Adj Close', level=1, axis=1)
-            return adj_close
-        except KeyError:
-            st.error("No 'Adj Close' data found in MultiIndex columns.")
-            return None
+class BenchmarkDataError(DataLoadError):
+    """Benchmark prices or returns could not be loaded"""
 
-    # Handle flat DataFrame (only happens for some single tickers)
-    if 'Adj Close' in data.columns:
-        return pd.DataFrame(data['Adj Close'])
 
-    st.error("Unexpected data format from Yahoo Finance.")
-    return None
+def get_historical_prices(tickers, start_date, end_date):
+    """
+    Adjusted close prices of the tickers that returned data. Raises EmptyPriceDataError
+    when none did; tickers that failed are logged as a warning.
+    """
+    prices, status = download_prices(tickers, start_date, end_date)
+
+    if prices.empty:
+        raise EmptyPriceDataError([tickers] if isinstance(tickers, str) else tickers, status)
+
+    # Partial results: keep the tickers that came back and report the rest
+    failed = status[status['status'] != 'ok']
+    if not failed.empty:
+        logger.warning("No price data for: " + ", ".join(f"{ticker} ({row.status})" for ticker, row in failed.iterrows()))
 
+    return prices
 
 
+def drop_missing_tickers(tickers, weights, prices):
+    """
+    The portfolio restricted to the tickers with prices: tickers, weights rescaled to
+    the original total, and their count. Dropped tickers are logged as a warning;
+    raises EmptyPriceDataError if no ticker has prices.
+    """
+    weights = [float(weight) for weight in weights]
+    kept = [i for i, ticker in enumerate(tickers) if ticker in prices.columns and prices[ticker].notna().any()]
+    dropped = [ticker for i, ticker in enumerate(tickers) if i not in kept]
+    if not kept:
+        raise EmptyPriceDataError(tickers)
+    if dropped:
+        kept_total = sum(weights[i] for i in kept)
+        scale = sum(weights) / kept_total if kept_total > 0 else None
+        weights = [weights[i] * scale if scale else sum(weights) / len(kept) for i in kept]
+        tickers = [tickers[i] for i in kept]
+        logger.warning(f"Analysing the portfolio without {', '.join(dropped)} (no price data); "
+                       f"the weights of {', '.join(tickers)} were scaled up to keep the total.")
+    return {'tickers': list(tickers), 'weights': weights, 'num_tickers': len(tickers), 'dropped_tickers': dropped}
+
 
 def get_daily_returns(price):
-    """Use the `pct_change` function to calculate daily returns of closing prices for each column"""
-    returns = price.pct_change()
+    """
+    Daily returns of closing prices for each column on a shared trading calendar, with
+    the fill and drop policies from config (see app/data/alignment.py)
+    """
+    returns = align_prices(price).returns_frame()
     return returns
 
 
+def get_prior_weights(tickers, weights, prior=BL_PRIOR_WEIGHTS):
+    """
+    Black-Litterman prior weights: market-cap weights when prior is 'market_cap' and the
+    price source has caps for every ticker, else the user's weights
+    """
+    market_caps = getattr(get_default_price_source(), 'market_caps', None)
+    if prior == 'market_cap' and market_caps is not None:
+        caps = market_caps(tickers)
+        if caps.notna().all() and (caps > 0).all():
+            return caps / caps.sum()
+    return pd.Series(weights, index=tickers, dtype=float)
+
+
 def get_benchmark_data(start_date, end_date):
-    """Get benchmark data for beta calculations"""
-    benchmark_prices = get_historical_prices(BENCHMARK_TICKER, start_date, end_date)
-    
-    if benchmark_prices is None:
-        st.error("Benchmark prices could not be retrieved.")
-        return None
+    """Get benchmark data for beta calculations; raises BenchmarkDataError if it cannot be loaded"""
+    try:
+        benchmark_prices = get_historical_prices(BENCHMARK_TICKER, start_date, end_date)
+    except EmptyPriceDataError as error:
+        raise BenchmarkDataError("Benchmark prices could not be retrieved.") from error
 
     benchmark_daily_returns = get_daily_returns(benchmark_prices)
 
-    if benchmark_daily_returns is None or benchmark_daily_returns.empty:
-        st.error("Benchmark daily returns could not be computed.")
-        return None
+    if benchmark_daily_returns.empty:
+        raise BenchmarkDataError("Benchmark daily returns could not be computed.")
 
     return benchmark_daily_returns.iloc[:, 0]
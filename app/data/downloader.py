@@ -0,0 +1,233 @@
+import logging
+import io
+import time
+import random
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from app.config.config import (
+    DOWNLOAD_CHUNK_SIZE, DOWNLOAD_MAX_WORKERS, DOWNLOAD_MAX_RETRIES,
+    DOWNLOAD_BACKOFF_SECONDS, DOWNLOAD_RATE_LIMIT, DOWNLOAD_RATE_BURST, DOWNLOAD_TIMEOUT_SECONDS
+)
+
+logger = logging.getLogger(__name__)
+
+
+class TickerFetchError(Exception):
+    """
+    Raised by a price source when some tickers of a request failed while the source
+    itself works, so the downloader can retry the other tickers without them. Any other
+    exception is treated as a source-wide failure of the whole request.
+    """
+
+    def __init__(self, tickers, message):
+        self.tickers = list(tickers)
+        super().__init__(message)
+
+
+class RateLimiter:
+    """Thread-safe token bucket shared by every download worker"""
+
+    def __init__(self, rate=DOWNLOAD_RATE_LIMIT, burst=DOWNLOAD_RATE_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be made"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class YahooPriceSource:
+    """Adjusted close prices from Yahoo Finance (yfinance is imported on first use)"""
+
+    def fetch(self, tickers, start_date, end_date):
+        import yfinance as yf
+        data = yf.download(tickers, start=start_date, end=end_date, group_by='ticker',
+                           auto_adjust=False, threads=False, progress=False)
+        if data.empty:
+            return pd.DataFrame()
+        if isinstance(data.columns, pd.MultiIndex):
+            return data.xs('Adj Close', level=1, axis=1)
+        return pd.DataFrame({tickers[0]: data['Adj Close']})
+
+    def market_caps(self, tickers):
+        """Latest market capitalisation of each ticker (NaN where Yahoo has none)"""
+        import yfinance as yf
+        caps = {}
+        for ticker in tickers:
+            try:
+                caps[ticker] = yf.Ticker(ticker).fast_info['marketCap']
+            except Exception as error:
+                logger.warning(f"No market cap for {ticker}: {error}")
+                caps[ticker] = float('nan')
+        return pd.Series(caps, dtype=float)
+
+
+class HttpCsvPriceSource:
+    """
+    Adjusted close prices from an HTTP endpoint serving one CSV per ticker at
+    {base_url}/{ticker}.csv?start=YYYY-MM-DD&end=YYYY-MM-DD with Date and Adj Close columns.
+    Used to run the downloader against a local stand-in server.
+    """
+
+    def __init__(self, base_url, timeout=DOWNLOAD_TIMEOUT_SECONDS):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def fetch(self, tickers, start_date, end_date):
+        columns = {}
+        for ticker in tickers:
+            query = urllib.parse.urlencode({'start': str(start_date), 'end': str(end_date)})
+            url = f"{self.base_url}/{urllib.parse.quote(ticker)}.csv?{query}"
+            try:
+                with urllib.request.urlopen(url, timeout=self.timeout) as response:
+                    frame = pd.read_csv(io.BytesIO(response.read()), index_col='Date', parse_dates=True)
+            except urllib.error.HTTPError as error:
+                if error.code == 404:
+                    continue
+                if error.code == 429 or error.code >= 500:
+                    raise
+                raise TickerFetchError([ticker], f"{ticker}: HTTP {error.code} {error.reason}") from error
+            columns[ticker] = frame['Adj Close']
+        return pd.DataFrame(columns)
+
+
+class FixturePriceSource:
+    """
+    Prices served from an in-memory DataFrame (one column per ticker), for tests and
+    offline runs. fail_times maps a ticker to how many calls touching it should raise
+    TickerFetchError before succeeding, to exercise the retry path; the key '*' fails
+    every call, as in a source-wide outage.
+    """
+
+    def __init__(self, prices, fail_times=None, latency=0.0):
+        self.prices = prices
+        self.fail_times = dict(fail_times or {})
+        self.latency = latency
+        self.lock = threading.Lock()
+
+    def fetch(self, tickers, start_date, end_date):
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            if self.fail_times.get('*', 0) > 0:
+                self.fail_times['*'] -= 1
+                raise ConnectionError("Simulated outage")
+            failing = [t for t in tickers if self.fail_times.get(t, 0) > 0]
+            for ticker in failing:
+                self.fail_times[ticker] -= 1
+        if failing:
+            raise TickerFetchError(failing, f"Simulated failure for {', '.join(failing)}")
+        available = [t for t in tickers if t in self.prices.columns]
+        window = self.prices.loc[pd.Timestamp(start_date):pd.Timestamp(end_date), available]
+        return window.dropna(how='all', axis=1)
+
+
+_default_source = YahooPriceSource()
+_default_rate_limiter = RateLimiter()
+
+
+def set_default_price_source(source):
+    """Replace the price source used by get_historical_prices (e.g. with a fixture provider)"""
+    global _default_source
+    _default_source = source
+
+
+def get_default_price_source():
+    return _default_source
+
+
+def _fetch_chunk(source, tickers, start_date, end_date, rate_limiter, max_retries, backoff_seconds):
+    """
+    Fetch one chunk with exponential backoff. When it keeps failing on particular
+    tickers (TickerFetchError), those are reported failed and the rest fetched again
+    (or the chunk split in half if the error names none of them), so one bad ticker does
+    not fail its neighbours. Any other error fails the whole chunk without splitting,
+    so a source-wide outage costs one round of retries per chunk.
+    Returns a list of (tickers, prices, attempts, error).
+    """
+    error = None
+    for attempt in range(1, max_retries + 2):
+        rate_limiter.acquire()
+        try:
+            return [(tickers, source.fetch(tickers, start_date, end_date), attempt, None)]
+        except Exception as exc:
+            error = exc
+            if attempt <= max_retries:
+                time.sleep(backoff_seconds * 2 ** (attempt - 1) * (1 + random.random()))
+
+    if not isinstance(error, TickerFetchError) or len(tickers) == 1:
+        return [(tickers, None, max_retries + 1, error)]
+    failed = [ticker for ticker in tickers if ticker in error.tickers]
+    if failed:
+        rest = [ticker for ticker in tickers if ticker not in failed]
+        parts = [(failed, None, max_retries + 1, error)]
+        if rest:
+            parts += _fetch_chunk(source, rest, start_date, end_date, rate_limiter, max_retries, backoff_seconds)
+        return parts
+    middle = len(tickers) // 2
+    return (_fetch_chunk(source, tickers[:middle], start_date, end_date, rate_limiter, max_retries, backoff_seconds)
+            + _fetch_chunk(source, tickers[middle:], start_date, end_date, rate_limiter, max_retries, backoff_seconds))
+
+
+def download_prices(tickers, start_date, end_date, source=None, chunk_size=DOWNLOAD_CHUNK_SIZE,
+                    max_workers=DOWNLOAD_MAX_WORKERS, max_retries=DOWNLOAD_MAX_RETRIES,
+                    backoff_seconds=DOWNLOAD_BACKOFF_SECONDS, rate_limiter=None):
+    """
+    Download adjusted close prices for a large universe.
+
+    The universe is split into chunks fetched concurrently under a global rate limiter.
+    Each chunk is retried with exponential backoff and the tickers that keep failing are
+    set aside, so a bad ticker does not fail the rest. Returns (prices, status) where prices has one column per ticker
+    that came back and status has one row per requested ticker with its outcome
+    ('ok', 'missing' when the source had no data, 'failed'), attempts and error.
+    """
+    if isinstance(tickers, str):
+        tickers = [tickers]
+    tickers = list(dict.fromkeys(tickers))
+    source = source or _default_source
+    rate_limiter = rate_limiter or _default_rate_limiter
+    chunks = [tickers[i:i + chunk_size] for i in range(0, len(tickers), chunk_size)]
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as executor:
+        results = list(executor.map(
+            lambda chunk: _fetch_chunk(source, chunk, start_date, end_date, rate_limiter, max_retries, backoff_seconds),
+            chunks
+        ))
+
+    frames = []
+    status = {}
+    for chunk, prices, attempts, error in (part for parts in results for part in parts):
+        for ticker in chunk:
+            if prices is None:
+                status[ticker] = ('failed', attempts, str(error))
+            elif ticker in prices.columns and prices[ticker].notna().any():
+                status[ticker] = ('ok', attempts, None)
+            else:
+                status[ticker] = ('missing', attempts, None)
+        if prices is not None and not prices.empty:
+            frames.append(prices)
+
+    status = pd.DataFrame.from_dict(status, orient='index', columns=['status', 'attempts', 'error'])
+    if not frames:
+        return pd.DataFrame(), status
+
+    prices = pd.concat(frames, axis=1).sort_index()
+    prices = prices.loc[:, ~prices.columns.duplicated()]
+    ok = [ticker for ticker in tickers if status.loc[ticker, 'status'] == 'ok']
+    return prices[ok], status
@@ -0,0 +1,309 @@
+import os
+import numpy as np
+import pandas as pd
+from datetime import timedelta
+from app.config.config import (
+    TRADING_DAYS_PER_YEAR, INTRADAY_BAR_INTERVAL, INTRADAY_FREQUENCY, INTRADAY_CHUNK_ROWS, INTRADAY_REQUEST_DAYS
+)
+
+
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+# Bar sources yield raw bars for one ticker as a stream of DataFrames (DatetimeIndex,
+# OHLCV columns, in time order), so no source ever materialises a full minute history.
+
+
+class YahooBarSource:
+    """Intraday bars from Yahoo Finance, requested INTRADAY_REQUEST_DAYS at a time"""
+
+    def __init__(self, interval=INTRADAY_BAR_INTERVAL, request_days=INTRADAY_REQUEST_DAYS):
+        self.interval = interval
+        self.request_days = request_days
+
+    def iter_bars(self, ticker, start, end, chunk_rows=INTRADAY_CHUNK_ROWS):
+        import yfinance as yf
+        window_start = pd.Timestamp(start)
+        end = pd.Timestamp(end)
+        while window_start < end:
+            window_end = min(window_start + timedelta(days=self.request_days), end)
+            bars = yf.download(ticker, start=window_start, end=window_end, interval=self.interval,
+                               auto_adjust=False, threads=False, progress=False)
+            if not bars.empty:
+                if isinstance(bars.columns, pd.MultiIndex):
+                    bars = bars.xs(ticker, level=1, axis=1)
+                bars = bars[OHLCV_COLUMNS]
+                bars.index = bars.index.tz_localize(None) if bars.index.tz is not None else bars.index
+                for offset in range(0, len(bars), chunk_rows):
+                    yield bars.iloc[offset:offset + chunk_rows]
+            window_start = window_end
+
+
+class CsvBarSource:
+    """
+    Bars from one CSV per ticker ({directory}/{ticker}.csv with Datetime and OHLCV
+    columns, sorted by time), read chunk_rows rows at a time.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def iter_bars(self, ticker, start, end, chunk_rows=INTRADAY_CHUNK_ROWS):
+        path = os.path.join(self.directory, f"{ticker.replace('^', '_').replace('/', '_')}.csv")
+        if not os.path.exists(path):
+            return
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        for chunk in pd.read_csv(path, chunksize=chunk_rows, index_col='Datetime', parse_dates=['Datetime']):
+            chunk = chunk.loc[(chunk.index >= start) & (chunk.index < end), OHLCV_COLUMNS]
+            if not chunk.empty:
+                yield chunk
+            if len(chunk.index) and chunk.index[-1] >= end:
+                break
+
+
+class FixtureBarSource:
+    """
+    Synthetic minute bars for regular US sessions (09:30-16:00), generated chunk by
+    chunk from a per-ticker seed, for tests and load runs over arbitrarily long histories.
+    """
+
+    def __init__(self, seed=0, volatility=0.0006, start_prices=None):
+        self.seed = seed
+        self.volatility = volatility
+        self.start_prices = start_prices or {}
+
+    def iter_bars(self, ticker, start, end, chunk_rows=INTRADAY_CHUNK_ROWS):
+        # Separate generators for prices and volumes, so the bars do not depend on chunk_rows
+        price_rng, volume_rng = (np.random.default_rng([self.seed, sum(map(ord, ticker)), stream]) for stream in (0, 1))
+        price = float(self.start_prices.get(ticker, 100.0))
+        days = pd.bdate_range(pd.Timestamp(start).normalize(), pd.Timestamp(end))
+        days = days[days < pd.Timestamp(end)]
+        minutes = pd.timedelta_range('09:30:00', periods=390, freq='1min')
+        days_per_chunk = max(1, chunk_rows // len(minutes))
+        for offset in range(0, len(days), days_per_chunk):
+            index = (days[offset:offset + days_per_chunk].values[:, None] + minutes.values[None, :]).ravel()
+            steps = price_rng.normal(0.0, self.volatility, size=(len(index), 3))
+            close = price * np.exp(np.cumsum(steps[:, 0]))
+            open_ = np.concatenate([[price], close[:-1]])
+            bars = pd.DataFrame({
+                'Open': open_,
+                'High': np.maximum(open_, close) * np.exp(np.abs(steps[:, 1])),
+                'Low': np.minimum(open_, close) * np.exp(-np.abs(steps[:, 2])),
+                'Close': close,
+                'Volume': volume_rng.integers(100, 10000, size=len(index))
+            }, index=pd.DatetimeIndex(index, name='Datetime'))
+            price = close[-1]
+            # Only the yielded chunk stays alive while the consumer works on it
+            del index, steps, close, open_
+            yield bars
+            del bars
+
+
+_default_bar_source = YahooBarSource()
+
+
+def set_default_bar_source(source):
+    """Replace the bar source used by stream_intraday (e.g. with a CSV or fixture source)"""
+    global _default_bar_source
+    _default_bar_source = source
+
+
+def get_default_bar_source():
+    return _default_bar_source
+
+
+def resample_ohlc(bars, frequency):
+    """
+    Aggregate time-ordered OHLCV bars into bars of a fixed frequency ('5min', '1h', '1D', ...)
+    with one vectorized pass: bucket boundaries are found once and every column is reduced
+    with ufunc.reduceat. Buckets are labelled by their start; empty buckets are not emitted.
+    """
+    if bars.empty:
+        return pd.DataFrame(columns=OHLCV_COLUMNS, index=pd.DatetimeIndex([], name='Datetime'), dtype=float)
+    buckets = bars.index.floor(frequency)
+    keys = buckets.asi8
+    starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+    ends = np.append(starts[1:], len(keys)) - 1
+    return pd.DataFrame({
+        'Open': bars['Open'].to_numpy(dtype=float)[starts],
+        'High': np.maximum.reduceat(bars['High'].to_numpy(dtype=float), starts),
+        'Low': np.minimum.reduceat(bars['Low'].to_numpy(dtype=float), starts),
+        'Close': bars['Close'].to_numpy(dtype=float)[ends],
+        'Volume': np.add.reduceat(bars['Volume'].to_numpy(dtype=float), starts),
+    }, index=pd.DatetimeIndex(buckets[starts], name='Datetime'))
+
+
+class StreamingResampler:
+    """
+    Resample a stream of raw bar chunks. The last bucket of each chunk may continue in
+    the next chunk, so it is held back as a partial bar and merged; everything before
+    it is complete and returned. Memory is one chunk plus one bar.
+    """
+
+    def __init__(self, frequency):
+        self.frequency = frequency
+        self.partial = None
+
+    def push(self, bars):
+        """Add a chunk of raw bars; returns the bars completed by it"""
+        resampled = resample_ohlc(bars, self.frequency)
+        if resampled.empty:
+            return resampled
+        if self.partial is not None:
+            if resampled.index[0] == self.partial.index[0]:
+                first = resampled.iloc[0]
+                resampled.iloc[0] = [self.partial['Open'].iloc[0], max(self.partial['High'].iloc[0], first['High']),
+                                     min(self.partial['Low'].iloc[0], first['Low']), first['Close'],
+                                     self.partial['Volume'].iloc[0] + first['Volume']]
+            else:
+                resampled = pd.concat([self.partial, resampled])
+        self.partial = resampled.iloc[-1:]
+        return resampled.iloc[:-1]
+
+    def flush(self):
+        """Return the held-back bar at the end of the stream"""
+        partial, self.partial = self.partial, None
+        return partial if partial is not None else resample_ohlc(pd.DataFrame(columns=OHLCV_COLUMNS), self.frequency)
+
+    @property
+    def watermark(self):
+        """Start of the first bucket that may still change (every earlier bar is final)"""
+        return self.partial.index[0] if self.partial is not None else None
+
+
+class IncrementalReturnStats:
+    """
+    Mean and covariance of log returns, updated batch by batch with the parallel
+    (Chan et al.) combination of counts, means and co-moments. Close prices are
+    carried forward within each ticker across batches, and only periods where every
+    ticker has a return enter the covariance.
+    """
+
+    def __init__(self, tickers):
+        self.tickers = list(tickers)
+        num_tickers = len(self.tickers)
+        self.last_close = np.full(num_tickers, np.nan)
+        self.count = 0
+        self.mean = np.zeros(num_tickers)
+        self.comoment = np.zeros((num_tickers, num_tickers))
+        self.num_periods = 0
+        self.num_days = 0
+        self.last_day = None
+
+    def update(self, closes):
+        """closes: DataFrame of bar closes (bucket x ticker) with NaN where a ticker had no bar"""
+        if closes.empty:
+            return
+        prices = closes.reindex(columns=self.tickers).to_numpy(dtype=float)
+        prices = pd.DataFrame(np.vstack([self.last_close, prices])).ffill().to_numpy()
+        self.last_close = prices[-1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            logreturns = np.log(prices[1:] / prices[:-1])
+        complete = logreturns[np.isfinite(logreturns).all(axis=1)]
+
+        days = closes.index.normalize().unique()
+        self.num_days += len(days) - (1 if self.last_day is not None and days[0] == self.last_day else 0)
+        self.last_day = days[-1]
+        self.num_periods += len(closes)
+
+        if len(complete) == 0:
+            return
+        batch_count = len(complete)
+        batch_mean = complete.mean(axis=0)
+        centred = complete - batch_mean
+        batch_comoment = centred.T @ centred
+        total = self.count + batch_count
+        delta = batch_mean - self.mean
+        self.comoment += batch_comoment + np.outer(delta, delta) * self.count * batch_count / total
+        self.mean += delta * batch_count / total
+        self.count = total
+
+    def periods_per_year(self):
+        """Bars per year implied by the observed bars per trading day"""
+        return self.num_periods / max(self.num_days, 1) * TRADING_DAYS_PER_YEAR
+
+    def result(self):
+        """meanlog (Series) and sigma (DataFrame) in the same form as the daily Sharpe data"""
+        sigma = self.comoment / (self.count - 1) if self.count > 1 else np.full_like(self.comoment, np.nan)
+        return pd.Series(self.mean, index=self.tickers), pd.DataFrame(sigma, index=self.tickers, columns=self.tickers)
+
+
+def stream_intraday(tickers, start, end, frequency=INTRADAY_FREQUENCY, source=None, chunk_rows=INTRADAY_CHUNK_ROWS,
+                    keep_prices=True):
+    """
+    Stream raw bars for every ticker, resample them to `frequency` and update the
+    return statistics as bars complete.
+
+    Tickers are read round-robin one chunk at a time and each raw chunk is dropped as
+    soon as it is resampled. A resampled bar is released to the statistics once every
+    ticker's stream has moved past its bucket, so memory holds at most one raw chunk
+    per ticker (inside its source) plus the few resampled bars waiting for the
+    slowest ticker, however long the history.
+
+    Returns a dict with 'prices' (resampled closes, one column per ticker; None if
+    keep_prices is False), 'meanlog' and 'sigma' of log returns per bar,
+    'periods_per_year', 'num_bars', 'num_raw_bars' and 'peak_chunk_rows'.
+    """
+    source = source or _default_bar_source
+    tickers = list(dict.fromkeys(tickers))
+    streams = {ticker: iter(source.iter_bars(ticker, start, end, chunk_rows)) for ticker in tickers}
+    resamplers = {ticker: StreamingResampler(frequency) for ticker in tickers}
+    pending = {ticker: [] for ticker in tickers}
+    stats = IncrementalReturnStats(tickers)
+    kept = []
+    num_raw_bars = 0
+    peak_chunk_rows = 0
+
+    def release(until=None):
+        """Align and hand over every pending bar before `until` (all of them if None)"""
+        closes = {}
+        for ticker, frames in pending.items():
+            if not frames:
+                continue
+            series = pd.concat(frames) if len(frames) > 1 else frames[0]
+            if until is not None:
+                pending[ticker] = [series[series.index >= until]]
+                series = series[series.index < until]
+            else:
+                pending[ticker] = []
+            if not series.empty:
+                closes[ticker] = series
+        if closes:
+            aligned = pd.concat(closes, axis=1).sort_index()
+            stats.update(aligned)
+            if keep_prices:
+                kept.append(aligned)
+
+    while streams:
+        for ticker in list(streams):
+            bars = next(streams[ticker], None)
+            if bars is None:
+                completed = resamplers[ticker].flush()
+                del streams[ticker]
+            else:
+                num_raw_bars += len(bars)
+                peak_chunk_rows = max(peak_chunk_rows, len(bars))
+                completed = resamplers[ticker].push(bars)
+            if not completed.empty:
+                pending[ticker].append(completed['Close'])
+
+        # Bars before every live stream's partial bucket can no longer change
+        watermarks = [resamplers[ticker].watermark for ticker in streams]
+        if streams and all(watermark is not None for watermark in watermarks):
+            release(min(watermarks))
+    release()
+
+    meanlog, sigma = stats.result()
+    prices = None
+    if keep_prices:
+        prices = pd.concat(kept).reindex(columns=tickers) if kept else pd.DataFrame(columns=tickers)
+    return {
+        'prices': prices,
+        'meanlog': meanlog,
+        'sigma': sigma,
+        'frequency': frequency,
+        'periods_per_year': stats.periods_per_year(),
+        'num_bars': stats.num_periods,
+        'num_raw_bars': num_raw_bars,
+        'peak_chunk_rows': peak_chunk_rows
+    }
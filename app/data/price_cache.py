@@ -0,0 +1,77 @@
+import os
+import pickle
+import pandas as pd
+from datetime import datetime
+from app.config.config import PRICE_CACHE_DIR
+from app.data.data_loader import get_historical_prices, EmptyPriceDataError
+
+
+def _cache_path(ticker, cache_dir):
+    """File holding the cached price history of one ticker"""
+    safe_name = ticker.replace('^', '_').replace('/', '_')
+    return os.path.join(cache_dir, f"{safe_name}.pkl")
+
+
+def _load_cached(ticker, cache_dir):
+    """Load a ticker's cached history as {'start', 'end', 'prices'} or None"""
+    path = _cache_path(ticker, cache_dir)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def _save_cached(ticker, entry, cache_dir):
+    """Write a ticker's history atomically so concurrent readers never see half a file"""
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _cache_path(ticker, cache_dir)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def get_cached_historical_prices(tickers, start_date, end_date, cache_dir=PRICE_CACHE_DIR):
+    """
+    Get adjusted close prices, downloading only the tickers whose cached history
+    does not cover the requested window. Returns a DataFrame with one column per ticker.
+    """
+    if isinstance(tickers, str):
+        tickers = [tickers]
+    start = pd.Timestamp(start_date)
+    end = pd.Timestamp(end_date)
+    available_end = min(end, pd.Timestamp(datetime.today().date()))
+
+    cached = {}
+    missing = []
+    for ticker in tickers:
+        entry = _load_cached(ticker, cache_dir)
+        if entry is not None and entry['start'] <= start and entry['end'] >= available_end:
+            cached[ticker] = entry
+        else:
+            missing.append(ticker)
+
+    if missing:
+        # Download the union of the requested and the cached window so the cache only grows
+        download_start = min([start] + [e['start'] for e in (_load_cached(t, cache_dir) for t in missing) if e])
+        try:
+            downloaded = get_historical_prices(missing, download_start.date(), end.date())
+        except EmptyPriceDataError:
+            downloaded = None
+        if downloaded is not None:
+            for ticker in missing:
+                if ticker not in downloaded.columns:
+                    continue
+                entry = {
+                    'start': download_start,
+                    'end': available_end,
+                    'prices': downloaded[ticker].dropna()
+                }
+                _save_cached(ticker, entry, cache_dir)
+                cached[ticker] = entry
+
+    if not cached:
+        return None
+
+    prices = pd.DataFrame({ticker: cached[ticker]['prices'] for ticker in tickers if ticker in cached})
+    return prices.loc[(prices.index >= start) & (prices.index <= end)]
@@ -0,0 +1,345 @@
+import os
+import json
+import struct
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+from collections.abc import Mapping
+from datetime import date, datetime
+from scipy.optimize import OptimizeResult
+from app.config.config import SNAPSHOT_DIR, SNAPSHOT_MAX_SNAPSHOTS
+from app.analysis.portfolio_analyzer import PortfolioAnalyzer
+
+
+# File layout: MAGIC, header length (uint64), JSON header, then every array as raw
+# contiguous bytes aligned to ALIGNMENT. The header describes each value and points
+# at its arrays by offset, so a snapshot opens by reading the header only and arrays
+# are memory-mapped views created when a value is first accessed.
+MAGIC = b'RPSNAP1\n'
+ALIGNMENT = 64
+
+# Analysis inputs stored alongside the computed values
+SNAPSHOT_INPUTS = ('tickers', 'weights', 'amount', 'start_date', 'end_date', 'ranking_metric', 'compute_budget',
+                   'rolling_window', 'bl_views', 'tracking_index')
+
+# Stage outputs that only feed other stages; an autosaved analysis leaves them out
+SNAPSHOT_INTERMEDIATES = ('precomputed', 'evolution_prices', 'benchmark_daily_returns', 'evolution_benchmark_returns',
+                          'factor_returns')
+
+
+class _Encoder:
+    """Turn nested analysis values into JSON descriptors plus a list of arrays"""
+
+    def __init__(self):
+        self.arrays = []
+
+    def array(self, values):
+        values = np.ascontiguousarray(values)
+        if values.dtype == object or values.dtype.kind in 'USO':
+            return {'type': 'list', 'value': [self.encode(item) for item in values.tolist()]}
+        self.arrays.append(values)
+        return {'type': 'array', 'array': len(self.arrays) - 1}
+
+    def index(self, index):
+        if isinstance(index, pd.MultiIndex):
+            return {'type': 'multiindex', 'names': list(index.names),
+                    'levels': [self.index(index.get_level_values(i)) for i in range(index.nlevels)]}
+        return {'type': 'index', 'name': index.name, 'values': self.array(index.to_numpy())}
+
+    def encode(self, value):
+        """Descriptor of a value, or None if the value cannot be stored (e.g. callables)"""
+        if value is None or isinstance(value, (bool, str)):
+            return {'type': 'scalar', 'value': value}
+        if isinstance(value, (int, float, np.integer, np.floating, np.bool_)):
+            value = value.item() if isinstance(value, np.generic) else value
+            if isinstance(value, float) and not np.isfinite(value):
+                return {'type': 'float', 'value': repr(value)}
+            return {'type': 'scalar', 'value': value}
+        if isinstance(value, (pd.Timestamp, datetime)):
+            return {'type': 'datetime', 'value': value.isoformat()}
+        if isinstance(value, date):
+            return {'type': 'date', 'value': value.isoformat()}
+        if isinstance(value, np.ndarray):
+            return self.array(value)
+        if isinstance(value, pd.Index):
+            return self.index(value)
+        if isinstance(value, pd.Series):
+            return {'type': 'series', 'name': self.encode(value.name), 'index': self.index(value.index),
+                    'values': self.array(value.to_numpy())}
+        if isinstance(value, pd.DataFrame):
+            numeric = all(dtype.kind in 'fiub' for dtype in value.dtypes) and len(value.columns) > 0
+            frame = {'type': 'frame', 'index': self.index(value.index), 'columns': self.index(value.columns)}
+            if numeric:
+                # One contiguous (rows, columns) block, e.g. the price matrix
+                frame['block'] = self.array(value.to_numpy(dtype=float))
+            else:
+                frame['column_values'] = [self.encode(value.iloc[:, i].to_numpy()) for i in range(value.shape[1])]
+            return frame
+        if isinstance(value, PortfolioAnalyzer):
+            return {'type': 'analyzer', 'tickers': self.encode(list(value.tickers)),
+                    'return_values': self.encode(value.return_values),
+                    'portfolio_values': self.encode(value.portfolio_values),
+                    'strategy_reports': self.encode(value.strategy_reports)}
+        if isinstance(value, dict):
+            items = {str(key): self.encode(item) for key, item in value.items()}
+            kind = 'optimize_result' if isinstance(value, OptimizeResult) else 'dict'
+            return {'type': kind, 'items': {key: item for key, item in items.items() if item is not None}}
+        if isinstance(value, (list, tuple)):
+            if value and all(isinstance(item, (int, float, np.integer, np.floating)) and not isinstance(item, bool)
+                             for item in value):
+                return {'type': 'list', 'value': [float(item) for item in value]}
+            items = [self.encode(item) for item in value]
+            return None if any(item is None for item in items) else {'type': 'list', 'value': items}
+        return None
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def save_snapshot(values, path=None, snapshot_dir=SNAPSHOT_DIR, name=None):
+    """
+    Save the inputs and computed values of an analysis run (the pipeline 'values').
+    Values that cannot be stored (callables) are left out. Returns the snapshot path.
+    """
+    encoder = _Encoder()
+    entries = {}
+    for key, value in values.items():
+        descriptor = encoder.encode(value)
+        if descriptor is not None:
+            entries[key] = descriptor
+
+    inputs = {key: entries[key] for key in SNAPSHOT_INPUTS if key in entries}
+    created = datetime.now().isoformat(timespec='seconds')
+    arrays = []
+    offset = 0
+    for array in encoder.arrays:
+        offset = _align(offset)
+        arrays.append({'offset': offset, 'dtype': array.dtype.str, 'shape': list(array.shape)})
+        offset += array.nbytes
+    header = json.dumps({'created': created, 'inputs': list(inputs), 'values': entries, 'arrays': arrays}).encode()
+
+    if path is None:
+        tickers = '-'.join(values.get('tickers', []))[:60] or 'portfolio'
+        digest = hashlib.sha256(header).hexdigest()[:8]
+        name = name or f"{tickers}_{values.get('end_date', date.today())}_{digest}"
+        os.makedirs(snapshot_dir, exist_ok=True)
+        path = os.path.join(snapshot_dir, f"{name}.rps")
+
+    data_start = _align(len(MAGIC) + 8 + len(header))
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<Q', len(header)))
+        f.write(header)
+        for array, meta in zip(encoder.arrays, arrays):
+            f.write(b'\0' * (data_start + meta['offset'] - f.tell()))
+            f.write(array.tobytes())
+    os.replace(tmp_path, path)
+    return path
+
+
+def save_analysis(result, snapshot_dir=SNAPSHOT_DIR, max_snapshots=SNAPSHOT_MAX_SNAPSHOTS):
+    """
+    Autosave an analysis run (a pipeline result): its result artefacts and the inputs in
+    SNAPSHOT_INPUTS, without intermediates or the other pipeline inputs. Deletes the
+    oldest snapshots beyond max_snapshots. Returns the snapshot path.
+    """
+    inputs = set(result.get('inputs', ()))
+    values = {key: value for key, value in result['values'].items()
+              if key in SNAPSHOT_INPUTS or (key not in inputs and key not in SNAPSHOT_INTERMEDIATES)}
+    path = save_snapshot(values, snapshot_dir=snapshot_dir)
+    prune_snapshots(snapshot_dir, max_snapshots)
+    return path
+
+
+def prune_snapshots(snapshot_dir=SNAPSHOT_DIR, max_snapshots=SNAPSHOT_MAX_SNAPSHOTS):
+    """Delete the oldest snapshots so at most max_snapshots remain"""
+    for path in list_snapshots(snapshot_dir)[max_snapshots:]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass  # removed by a concurrent request
+
+
+class Snapshot(Mapping):
+    """
+    A saved analysis opened lazily. Behaves like the read-only pipeline 'values' dict:
+    only the header is read on open, and each value is rebuilt from memory-mapped
+    arrays the first time it is accessed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a RoboPort snapshot")
+            (header_length,) = struct.unpack('<Q', f.read(8))
+            header = json.loads(f.read(header_length))
+        self.created = header['created']
+        self.input_names = header['inputs']
+        self.entries = header['values']
+        self.arrays = header['arrays']
+        self.data_start = _align(len(MAGIC) + 8 + header_length)
+        self._buffer = None
+        self._decoded = {}
+
+    def __getitem__(self, key):
+        if key not in self._decoded:
+            self._decoded[key] = self._decode(self.entries[key])
+        return self._decoded[key]
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def inputs(self):
+        return {name: self[name] for name in self.input_names}
+
+    def _array(self, number):
+        if self._buffer is None:
+            # Copy-on-write mapping: pages are read on demand and callers may modify their views
+            self._buffer = np.memmap(self.path, dtype=np.uint8, mode='c')
+        meta = self.arrays[number]
+        dtype = np.dtype(meta['dtype'])
+        count = int(np.prod(meta['shape'])) if meta['shape'] else 1
+        start = self.data_start + meta['offset']
+        return self._buffer[start:start + count * dtype.itemsize].view(dtype).reshape(meta['shape'])
+
+    def _index(self, descriptor):
+        kind = descriptor['type']
+        if kind == 'multiindex':
+            return pd.MultiIndex.from_arrays([self._index(level) for level in descriptor['levels']],
+                                             names=descriptor['names'])
+        # Dates come back from their datetime64 array as a DatetimeIndex
+        return pd.Index(self._decode(descriptor['values']), name=descriptor['name'])
+
+    def _decode(self, descriptor):
+        kind = descriptor['type']
+        if kind == 'scalar':
+            return descriptor['value']
+        if kind == 'float':
+            return float(descriptor['value'])
+        if kind == 'date':
+            return date.fromisoformat(descriptor['value'])
+        if kind == 'datetime':
+            return pd.Timestamp(descriptor['value'])
+        if kind == 'array':
+            return self._array(descriptor['array'])
+        if kind in ('index', 'multiindex'):
+            return self._index(descriptor)
+        if kind == 'list':
+            return [item if not isinstance(item, dict) else self._decode(item) for item in descriptor['value']]
+        if kind == 'series':
+            return pd.Series(self._decode(descriptor['values']), index=self._index(descriptor['index']),
+                             name=self._decode(descriptor['name']), copy=False)
+        if kind == 'frame':
+            index = self._index(descriptor['index'])
+            columns = self._index(descriptor['columns'])
+            if 'block' in descriptor:
+                return pd.DataFrame(self._decode(descriptor['block']), index=index, columns=columns, copy=False)
+            return pd.DataFrame({i: self._decode(column) for i, column in enumerate(descriptor['column_values'])},
+                                index=index).set_axis(columns, axis=1)
+        if kind == 'analyzer':
+            analyzer = PortfolioAnalyzer(self._decode(descriptor['tickers']))
+            analyzer.return_values = self._decode(descriptor['return_values'])
+            analyzer.portfolio_values = self._decode(descriptor['portfolio_values'])
+            analyzer.strategy_reports = self._decode(descriptor['strategy_reports'])
+            return analyzer
+        if kind in ('dict', 'optimize_result'):
+            items = {key: self._decode(item) for key, item in descriptor['items'].items()}
+            return OptimizeResult(items) if kind == 'optimize_result' else items
+        raise ValueError(f"Unknown snapshot value type '{kind}'")
+
+
+def load_snapshot(path):
+    """Open a snapshot lazily"""
+    return Snapshot(path)
+
+
+def list_snapshots(snapshot_dir=SNAPSHOT_DIR):
+    """Snapshot files in snapshot_dir, newest first"""
+    if not os.path.isdir(snapshot_dir):
+        return []
+    paths = [os.path.join(snapshot_dir, name) for name in os.listdir(snapshot_dir) if name.endswith('.rps')]
+    return sorted(paths, key=os.path.getmtime, reverse=True)
+
+
+def _recommended_weights(snapshot):
+    best = snapshot.get('best_strategy')
+    weights = snapshot.get('strategy_weights', {}).get(best)
+    if weights is None:
+        return pd.Series(dtype=float)
+    return pd.Series(np.asarray(weights, dtype=float), index=snapshot['tickers'])
+
+
+def diff_snapshots(before, after):
+    """
+    Compare two snapshots (e.g. one client's analysis on two dates). Returns a dict with
+    changed 'inputs', the 'recommendation' (best strategy and its return in each), and
+    DataFrames of 'strategy_returns', 'recommended_weights' and 'risk_metrics'
+    with before, after and change columns.
+    """
+    def side_by_side(a, b):
+        frame = pd.concat([a.rename('before'), b.rename('after')], axis=1)
+        frame['change'] = frame['after'] - frame['before']
+        return frame
+
+    inputs = {}
+    for name in sorted(set(before.input_names) | set(after.input_names)):
+        a, b = before.get(name), after.get(name)
+        if isinstance(a, list) or isinstance(b, list):
+            changed = list(a or []) != list(b or [])
+        else:
+            changed = a != b
+        if changed:
+            inputs[name] = (a, b)
+
+    result = {
+        'inputs': inputs,
+        'recommendation': {
+            'before': (before.get('best_strategy'), before.get('best_return')),
+            'after': (after.get('best_strategy'), after.get('best_return')),
+            'changed': before.get('best_strategy') != after.get('best_strategy')
+        },
+        'strategy_returns': side_by_side(pd.Series(before['analyzer'].return_values if 'analyzer' in before else {}, dtype=float),
+                                         pd.Series(after['analyzer'].return_values if 'analyzer' in after else {}, dtype=float)),
+        'recommended_weights': side_by_side(_recommended_weights(before), _recommended_weights(after)).fillna(
+            {'before': 0.0, 'after': 0.0}),
+    }
+    result['recommended_weights']['change'] = result['recommended_weights']['after'] - result['recommended_weights']['before']
+
+    if 'risk_metrics' in before and 'risk_metrics' in after:
+        metrics_before = before['risk_metrics'].stack()
+        metrics_after = after['risk_metrics'].stack()
+        result['risk_metrics'] = side_by_side(metrics_before, metrics_after)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect and compare RoboPort analysis snapshots')
+    parser.add_argument('snapshots', nargs='+', help='one snapshot to summarise, or two to compare')
+    args = parser.parse_args()
+
+    if len(args.snapshots) == 1:
+        snapshot = load_snapshot(args.snapshots[0])
+        print(f"Created {snapshot.created}")
+        for name, value in snapshot.inputs.items():
+            print(f"{name}: {value}")
+        print(f"best strategy: {snapshot.get('best_strategy')} ({snapshot.get('best_return')})")
+        return
+
+    diff = diff_snapshots(load_snapshot(args.snapshots[0]), load_snapshot(args.snapshots[1]))
+    for name, (a, b) in diff['inputs'].items():
+        print(f"{name}: {a} -> {b}")
+    print(f"recommendation: {diff['recommendation']['before']} -> {diff['recommendation']['after']}")
+    print(diff['strategy_returns'].to_string())
+    print(diff['recommended_weights'].to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,466 @@
+import numpy as np
+import pandas as pd
+from datetime import timedelta
+from app.config.config import (
+    PORTFOLIO_EVOLUTION_YEARS, CVAR_CONFIDENCE, CVAR_SCENARIO_SOURCE,
+    RESAMPLED_FRONTIER, RESAMPLED_NUM_RESAMPLES, PIPELINE_MAX_WORKERS, NUMBER_OF_PORTFOLIOS,
+    MARKOWITZ_FRONTIER_POINTS, FRONTIER_TABLE_POINTS, ADAPTIVE_COMPUTE_BUDGET, ROLLING_WINDOW,
+    INTRADAY_FREQUENCY, INTRADAY_LOOKBACK_DAYS,
+    BENCHMARK_TICKER, INDEX_TRACKING_INDEX, INDEX_TRACKING_MAX_ASSETS
+)
+from app.data.data_loader import (
+    get_historical_prices, get_daily_returns, get_benchmark_data, get_prior_weights, drop_missing_tickers
+)
+from app.calculations.portfolio_calculations import (
+    get_portfolio_returns, calculate_risk_parity_weights,
+    calculate_beta, calculate_beta_weights, portfolio_value_evoluvation
+)
+from app.data.intraday import stream_intraday
+from app.calculations.kernels import score_portfolios
+from app.calculations.optimization import (
+    calculate_sharpe_ratio_optimization, calculate_cvar_optimization, calculate_index_tracking,
+    historical_return_scenarios, simulate_return_scenarios
+)
+from app.calculations.black_litterman import calculate_black_litterman_optimization
+from app.calculations.constraints import build_constraints, ConstraintError
+from app.calculations.optimization_cache import get_optimization_cache, cached_markowitz_optimization, cached_frontier_table
+from app.calculations.resampling import calculate_resampled_frontier
+from app.calculations.compute_budget import get_compute_budget
+from app.calculations.discrete_allocation import calculate_discrete_allocation
+from app.analysis.portfolio_analyzer import PortfolioAnalyzer
+from app.analysis.risk_metrics import portfolio_values_to_returns
+from app.analysis.rolling import calculate_rolling_analytics
+from app.analysis.factors import get_factor_returns, calculate_factor_exposures
+from app.analysis.stress_testing import (
+    build_historical_scenarios, build_factor_shock_scenarios, combine_scenarios, run_stress_tests
+)
+from app.pipeline.dag import Stage, StageCache, Pipeline
+from app.pipeline.precompute import analysis_windows, get_precomputed
+
+
+# Strategy name -> value holding its weights, in display order
+STRATEGY_WEIGHT_VALUES = {
+    'User': 'weights',
+    'Risk Parity': 'risk_parity_weights',
+    'Beta': 'beta_weight',
+    'Sharp Ratio': 'sharpe_weights',
+    'Markowitz': 'markowitz_weights',
+    'Resampled Markowitz': 'resampled_weights',
+    'CVaR': 'cvar_weights',
+    'Black-Litterman': 'black_litterman_weights',
+    'Index Tracking': 'index_tracking_weights',
+}
+
+
+def evolution_value_name(strategy_name):
+    """Name of the pipeline value holding a strategy's portfolio value evolution"""
+    return 'evolution_' + strategy_name.lower().replace(' ', '_').replace('-', '_')
+
+
+def load_prices(tickers, start_date, end_date, precomputed):
+    """Prices for the window, sliced from a warmed universe when one covers the request"""
+    if precomputed is None:
+        return get_historical_prices(tickers, start_date, end_date)
+    return precomputed['prices'].loc[pd.Timestamp(start_date):pd.Timestamp(end_date)].dropna(how='all')
+
+
+def load_benchmark(start_date, end_date, precomputed):
+    """Benchmark daily returns for the window, from a warmed universe's benchmark prices when available"""
+    if precomputed is None:
+        return get_benchmark_data(start_date, end_date)
+    benchmark_prices = precomputed['benchmark_prices'].loc[pd.Timestamp(start_date):pd.Timestamp(end_date)]
+    return get_daily_returns(benchmark_prices).iloc[:, 0]
+
+
+def run_betas(daily_returns, benchmark_daily_returns, precomputed):
+    """Betas to the benchmark, precomputed when available"""
+    if precomputed is not None:
+        return precomputed['betas']
+    return calculate_beta(daily_returns, benchmark_daily_returns)
+
+
+def run_risk_parity(daily_returns, precomputed):
+    """Risk parity weights, from the precomputed volatilities when available"""
+    volatility = precomputed['volatility'] if precomputed is not None else None
+    return calculate_risk_parity_weights(daily_returns, volatility)
+
+
+def run_sharpe(prices, num_tickers, num_portfolios, precomputed=None):
+    """Random-portfolio Sharpe sampling, on the precomputed log return statistics when available"""
+    statistics = precomputed['statistics'] if precomputed is not None else None
+    sharpe_data = calculate_sharpe_ratio_optimization(prices, num_tickers, num_portfolios, statistics)
+    return {'sharpe_data': sharpe_data, 'sharpe_weights': sharpe_data['sharpratio_weight']}
+
+
+def run_markowitz(tickers, start_date, end_date, sharpe_data, num_tickers, weights, constraint_inputs,
+                  frontier_points, optimizer_tolerance, on_frontier_point=None):
+    """Cached Markowitz optimisation, falling back to the unconstrained problem if the constraints conflict or name unknown tickers"""
+    warning = None
+    try:
+        constraints = build_constraints(tickers, current_weights=weights, **constraint_inputs)
+        markowitz_data = cached_markowitz_optimization(
+            tickers, start_date, end_date, sharpe_data['meanlog'], sharpe_data['sigma'],
+            num_tickers, sharpe_data['test_return'], constraints, on_point=on_frontier_point,
+            num_points=frontier_points, tol=optimizer_tolerance
+        )
+    except ConstraintError as error:
+        warning = f"{error}. Falling back to the unconstrained Markowitz portfolio."
+        markowitz_data = cached_markowitz_optimization(
+            tickers, start_date, end_date, sharpe_data['meanlog'], sharpe_data['sigma'],
+            num_tickers, sharpe_data['test_return'], on_point=on_frontier_point,
+            num_points=frontier_points, tol=optimizer_tolerance
+        )
+    return {
+        'markowitz_data': markowitz_data,
+        'markowitz_weights': markowitz_data['optimal_weight'].x,
+        'markowitz_warning': warning,
+        'optimization_cache_metrics': get_optimization_cache().get_metrics()
+    }
+
+
+def run_frontier_table(tickers, start_date, end_date, sharpe_data, weights, constraint_inputs, frontier_table_points,
+                       optimizer_tolerance):
+    """Efficient portfolios for the target risk/return slider, shared across sessions through the optimisation cache"""
+    try:
+        constraints = build_constraints(tickers, current_weights=weights, **constraint_inputs)
+    except ConstraintError:
+        constraints = None
+    return cached_frontier_table(tickers, start_date, end_date, sharpe_data['meanlog'], sharpe_data['sigma'], constraints,
+                                 num_points=frontier_table_points, tol=optimizer_tolerance)
+
+
+def run_resampled(sharpe_data, resampled_enabled, num_resamples, frontier_points):
+    """Resampled (Michaud) frontier, if enabled"""
+    if not resampled_enabled:
+        return {'resampled_data': None, 'resampled_weights': None}
+    resampled_data = calculate_resampled_frontier(sharpe_data['logreturns'], num_resamples, frontier_points)
+    return {'resampled_data': resampled_data, 'resampled_weights': resampled_data['max_sharpratio_weight']}
+
+
+def run_cvar(sharpe_data, cvar_confidence, cvar_scenario_source):
+    """Minimum CVaR portfolio on historical or simulated scenarios"""
+    if cvar_scenario_source == 'simulated':
+        scenarios = simulate_return_scenarios(sharpe_data['meanlog'], sharpe_data['sigma'])
+    else:
+        scenarios = historical_return_scenarios(sharpe_data['logreturns'])
+    cvar_data = calculate_cvar_optimization(scenarios, cvar_confidence)
+    return {'cvar_data': cvar_data, 'cvar_weights': cvar_data['optimal_weight'] if cvar_data is not None else None}
+
+
+def run_index_tracking(daily_returns, benchmark_daily_returns, start_date, end_date, tracking_index, constraint_inputs):
+    """Basket of the tickers tracking the index, as many names as the cardinality limit allows"""
+    if tracking_index == BENCHMARK_TICKER:
+        index_returns = benchmark_daily_returns
+    else:
+        index_returns = get_daily_returns(get_historical_prices(tracking_index, start_date, end_date)).iloc[:, 0]
+    max_assets = constraint_inputs.get('max_assets') or INDEX_TRACKING_MAX_ASSETS
+    index_tracking_data = calculate_index_tracking(daily_returns, index_returns, max_assets)
+    if index_tracking_data is not None:
+        index_tracking_data['index'] = tracking_index
+    return {
+        'index_tracking_data': index_tracking_data,
+        'index_tracking_weights': index_tracking_data['optimal_weight'] if index_tracking_data is not None else None
+    }
+
+
+def run_black_litterman(tickers, weights, sharpe_data, bl_views, constraint_inputs, frontier_points, optimizer_tolerance):
+    """Black-Litterman portfolio from the user's views, if any were given"""
+    if not bl_views:
+        return {'black_litterman_data': None, 'black_litterman_weights': None}
+    sigma = sharpe_data['sigma']
+    prior_weights = get_prior_weights(tickers, weights).reindex(sigma.index).fillna(0)
+    try:
+        constraints = build_constraints(tickers, current_weights=weights, **constraint_inputs)
+    except ConstraintError:
+        constraints = None
+    black_litterman_data = calculate_black_litterman_optimization(
+        sigma, prior_weights, bl_views, constraints, num_points=frontier_points, tol=optimizer_tolerance
+    )
+    return {
+        'black_litterman_data': black_litterman_data,
+        'black_litterman_weights': black_litterman_data['optimal_weight'] if black_litterman_data is not None else None
+    }
+
+
+def evaluate_strategy(tickers, weights, evolution_prices, evolution_years):
+    """Portfolio value evolution of one strategy over the shared evolution prices"""
+    if weights is None or evolution_prices is None:
+        return None
+    return portfolio_value_evoluvation(tickers, weights, evolution_years, evolution_prices)
+
+
+def collect_strategy_weights(**strategy_weights):
+    """Gather the weights of every strategy that produced a portfolio"""
+    by_value = {value: name for name, value in STRATEGY_WEIGHT_VALUES.items()}
+    return {by_value[value]: weights for value, weights in strategy_weights.items() if weights is not None}
+
+
+def run_stress_tests_stage(tickers, strategy_weights, betas):
+    """
+    Historical shock windows and factor shocks applied to every strategy, with the
+    (scenario x ticker) coverage: which tickers have data in each window
+    """
+    scenarios = combine_scenarios(build_historical_scenarios(tickers), build_factor_shock_scenarios(tickers, betas))
+    return {'stress_results': run_stress_tests(strategy_weights, scenarios), 'stress_coverage': scenarios['coverage']}
+
+
+def compare_strategies(tickers, strategy_weights, evolution_benchmark_returns, ranking_metric, resampled_data,
+                       cvar_data, cvar_scenario_source, black_litterman_data, index_tracking_data, **strategy_values):
+    """Build the analyzer from every strategy's value evolution and pick the best strategy"""
+    analyzer = PortfolioAnalyzer(tickers)
+    for name in STRATEGY_WEIGHT_VALUES:
+        if name in strategy_weights:
+            analyzer.record_strategy(name, strategy_values[evolution_value_name(name)])
+
+    if resampled_data is not None:
+        analyzer.add_strategy_report('Resampled Markowitz', {
+            'num_scenarios': resampled_data['num_resamples'],
+            'solve_time': resampled_data['solve_time']
+        })
+    if cvar_data is not None:
+        analyzer.add_strategy_report('CVaR', {
+            'scenario_source': cvar_scenario_source,
+            'num_scenarios': cvar_data['num_scenarios'],
+            'solve_time': cvar_data['solve_time'],
+            'cvar': cvar_data['cvar'],
+            'var': cvar_data['var']
+        })
+    if black_litterman_data is not None:
+        analyzer.add_strategy_report('Black-Litterman', {
+            'num_views': black_litterman_data['num_views'],
+            'num_scenarios': black_litterman_data['num_scenarios'],
+            'solve_time': black_litterman_data['solve_time']
+        })
+    if index_tracking_data is not None:
+        analyzer.add_strategy_report('Index Tracking', {
+            'index': index_tracking_data['index'],
+            'num_assets': index_tracking_data['num_assets'],
+            'tracking_error': index_tracking_data['tracking_error'],
+            'solve_time': index_tracking_data['solve_time'],
+            'iterations': index_tracking_data['iterations']
+        })
+
+    risk_metrics = analyzer.calculate_risk_metrics(evolution_benchmark_returns)
+    best_strategy, best_return = analyzer.get_best_strategy(ranking_metric, evolution_benchmark_returns)
+    return {
+        'analyzer': analyzer,
+        'risk_metrics': risk_metrics,
+        'best_strategy': best_strategy,
+        'best_return': best_return
+    }
+
+
+def run_rolling_tickers(evolution_prices, evolution_benchmark_returns, rolling_window):
+    """Rolling volatility, Sharpe, beta and correlation of every ticker over the evolution period"""
+    if evolution_prices is None:
+        return None
+    return calculate_rolling_analytics(evolution_prices.pct_change().iloc[1:], evolution_benchmark_returns, rolling_window)
+
+
+def run_rolling_strategies(analyzer, evolution_benchmark_returns, rolling_window):
+    """Rolling volatility, Sharpe, beta and correlation of every strategy's value evolution"""
+    if not analyzer.portfolio_values:
+        return None
+    returns = portfolio_values_to_returns(analyzer.portfolio_values)
+    return calculate_rolling_analytics(returns, evolution_benchmark_returns, rolling_window)
+
+
+def allocate_shares(tickers, weights, strategy_weights, best_strategy, prices, amount):
+    """Whole-share orders for the best strategy, starting from the user's allocation"""
+    if best_strategy not in strategy_weights or prices is None:
+        return None
+    latest_prices = prices.iloc[-1]
+    current_allocation = calculate_discrete_allocation(tickers, weights, latest_prices, amount, refine=False)
+    if current_allocation is None:
+        return None
+    return calculate_discrete_allocation(
+        tickers, strategy_weights[best_strategy], latest_prices, amount, current_allocation['shares']
+    )
+
+
+def precomputed_version(outputs):
+    """Cache token of a precomputed slice: the store it came from, instead of its matrices"""
+    precomputed = outputs['precomputed']
+    return None if precomputed is None else precomputed['version']
+
+
+def build_analysis_pipeline(cache=None):
+    """Declare the analysis stage graph"""
+    stages = [
+        Stage('precomputed', get_precomputed,
+              {'tickers': 'requested_tickers', 'start_date': 'start_date', 'end_date': 'end_date',
+               'evolution_start_date': 'evolution_start_date'}, ['precomputed'], cacheable=False,
+              version=precomputed_version),
+        Stage('prices', load_prices,
+              {'tickers': 'requested_tickers', 'start_date': 'start_date', 'end_date': 'end_date', 'precomputed': 'precomputed'},
+              ['prices']),
+        # Every later stage sees only the tickers that returned prices
+        Stage('portfolio', drop_missing_tickers,
+              {'tickers': 'requested_tickers', 'weights': 'requested_weights', 'prices': 'prices'},
+              ['tickers', 'weights', 'num_tickers', 'dropped_tickers']),
+        Stage('daily_returns', get_daily_returns, {'price': 'prices'}, ['daily_returns']),
+        Stage('portfolio_daily_returns', get_portfolio_returns, ['weights', 'daily_returns'], ['port_daily_return']),
+        Stage('benchmark', load_benchmark, ['start_date', 'end_date', 'precomputed'], ['benchmark_daily_returns']),
+        Stage('betas', run_betas, ['daily_returns', 'benchmark_daily_returns', 'precomputed'], ['betas']),
+        Stage('factor_returns', get_factor_returns, ['start_date', 'end_date'], ['factor_returns']),
+        Stage('factor_exposures', calculate_factor_exposures,
+              {'returns': 'daily_returns', 'factor_returns': 'factor_returns', 'window': 'rolling_window'},
+              ['factor_exposures']),
+        Stage('beta_weights', calculate_beta_weights, {'data': 'betas'}, ['beta_weight']),
+        Stage('risk_parity', run_risk_parity, ['daily_returns', 'precomputed'], ['risk_parity_weights']),
+        Stage('sharpe', run_sharpe, ['prices', 'num_tickers', 'num_portfolios', 'precomputed'], ['sharpe_data', 'sharpe_weights']),
+        Stage('markowitz', run_markowitz,
+              ['tickers', 'start_date', 'end_date', 'sharpe_data', 'num_tickers', 'weights', 'constraint_inputs',
+               'frontier_points', 'optimizer_tolerance', 'on_frontier_point'],
+              ['markowitz_data', 'markowitz_weights', 'markowitz_warning', 'optimization_cache_metrics'],
+              cacheable=False),
+        Stage('frontier_table', run_frontier_table,
+              ['tickers', 'start_date', 'end_date', 'sharpe_data', 'weights', 'constraint_inputs',
+               'frontier_table_points', 'optimizer_tolerance'], ['frontier_table'],
+              cacheable=False),
+        Stage('resampled', run_resampled, ['sharpe_data', 'resampled_enabled', 'num_resamples', 'frontier_points'],
+              ['resampled_data', 'resampled_weights']),
+        Stage('cvar', run_cvar, ['sharpe_data', 'cvar_confidence', 'cvar_scenario_source'], ['cvar_data', 'cvar_weights']),
+        Stage('black_litterman', run_black_litterman,
+              ['tickers', 'weights', 'sharpe_data', 'bl_views', 'constraint_inputs', 'frontier_points', 'optimizer_tolerance'],
+              ['black_litterman_data', 'black_litterman_weights']),
+        Stage('index_tracking', run_index_tracking,
+              ['daily_returns', 'benchmark_daily_returns', 'start_date', 'end_date', 'tracking_index', 'constraint_inputs'],
+              ['index_tracking_data', 'index_tracking_weights']),
+        Stage('evolution_prices', load_prices,
+              {'tickers': 'tickers', 'start_date': 'evolution_start_date', 'end_date': 'end_date', 'precomputed': 'precomputed'},
+              ['evolution_prices']),
+        Stage('evolution_benchmark', load_benchmark,
+              {'start_date': 'evolution_start_date', 'end_date': 'end_date', 'precomputed': 'precomputed'},
+              ['evolution_benchmark_returns']),
+        Stage('strategy_weights', collect_strategy_weights,
+              {value: value for value in STRATEGY_WEIGHT_VALUES.values()}, ['strategy_weights']),
+        Stage('stress_tests', run_stress_tests_stage, ['tickers', 'strategy_weights', 'betas'],
+              ['stress_results', 'stress_coverage']),
+    ]
+
+    comparison_inputs = {
+        'tickers': 'tickers', 'strategy_weights': 'strategy_weights', 'evolution_benchmark_returns': 'evolution_benchmark_returns',
+        'ranking_metric': 'ranking_metric', 'resampled_data': 'resampled_data', 'cvar_data': 'cvar_data',
+        'cvar_scenario_source': 'cvar_scenario_source', 'black_litterman_data': 'black_litterman_data',
+        'index_tracking_data': 'index_tracking_data'
+    }
+    for name, weights_value in STRATEGY_WEIGHT_VALUES.items():
+        evolution = evolution_value_name(name)
+        stages.append(Stage(evolution, evaluate_strategy, {
+            'tickers': 'tickers', 'weights': weights_value,
+            'evolution_prices': 'evolution_prices', 'evolution_years': 'evolution_years'
+        }, [evolution]))
+        comparison_inputs[evolution] = evolution
+
+    stages.append(Stage('comparison', compare_strategies, comparison_inputs,
+                        ['analyzer', 'risk_metrics', 'best_strategy', 'best_return']))
+    stages.append(Stage('rolling_tickers', run_rolling_tickers,
+                        ['evolution_prices', 'evolution_benchmark_returns', 'rolling_window'], ['rolling_tickers']))
+    stages.append(Stage('rolling_strategies', run_rolling_strategies,
+                        ['analyzer', 'evolution_benchmark_returns', 'rolling_window'], ['rolling_strategies']))
+    stages.append(Stage('discrete_allocation', allocate_shares,
+                        ['tickers', 'weights', 'strategy_weights', 'best_strategy', 'prices', 'amount'],
+                        ['discrete_allocation']))
+    return Pipeline(stages, cache)
+
+
+_stage_cache = StageCache()
+
+
+def run_analysis(tickers, weights, num_tickers, amount, end_date, ranking_metric, constraint_inputs,
+                 max_workers=PIPELINE_MAX_WORKERS, initializer=None, on_stage_complete=None,
+                 on_frontier_point=None, on_idle=None, poll_interval=None, compute_budget=None,
+                 rolling_window=ROLLING_WINDOW, bl_views=None):
+    """
+    Run the full analysis graph for one request and return the pipeline result.
+    on_frontier_point(target return, volatility) is called from a worker thread as each
+    Markowitz frontier point is solved; on_idle runs in the calling thread while waiting.
+    Sample counts, frontier resolution and tolerances come from compute_budget (the
+    process-wide budget by default); the applied level is returned as the
+    'compute_budget' value. Rolling analytics use a trailing window of rolling_window
+    trading days. bl_views are the Black-Litterman views (see build_views); without
+    views the Black-Litterman strategy is skipped. Tickers without prices are left out
+    and the other weights rescaled: the 'tickers', 'weights' and 'num_tickers' values
+    are the portfolio actually analysed.
+    """
+    start_date, evolution_start_date = analysis_windows(end_date)
+    if ADAPTIVE_COMPUTE_BUDGET:
+        compute_budget = compute_budget or get_compute_budget()
+        budget = compute_budget.choose(num_tickers, RESAMPLED_FRONTIER)
+    else:
+        compute_budget = None
+        budget = {
+            'level': 'fixed',
+            'settings': {
+                'num_portfolios': NUMBER_OF_PORTFOLIOS, 'frontier_points': MARKOWITZ_FRONTIER_POINTS,
+                'frontier_table_points': FRONTIER_TABLE_POINTS, 'optimizer_tolerance': None,
+                'num_resamples': RESAMPLED_NUM_RESAMPLES
+            }
+        }
+    inputs = {
+        'requested_tickers': tickers,
+        'requested_weights': weights,
+        'amount': amount,
+        'start_date': start_date,
+        'end_date': end_date,
+        'evolution_start_date': evolution_start_date,
+        'evolution_years': PORTFOLIO_EVOLUTION_YEARS,
+        'ranking_metric': ranking_metric,
+        'constraint_inputs': constraint_inputs,
+        'resampled_enabled': RESAMPLED_FRONTIER,
+        'cvar_confidence': CVAR_CONFIDENCE,
+        'cvar_scenario_source': CVAR_SCENARIO_SOURCE,
+        'on_frontier_point': on_frontier_point,
+        'compute_budget': budget,
+        'rolling_window': rolling_window,
+        'bl_views': bl_views or [],
+        'tracking_index': INDEX_TRACKING_INDEX,
+    }
+    inputs.update(budget['settings'])
+    pipeline = build_analysis_pipeline(_stage_cache)
+
+    if compute_budget is not None:
+        compute_budget.enter()
+    try:
+        return pipeline.run(inputs, max_workers=max_workers, initializer=initializer, on_stage_complete=on_stage_complete,
+                            on_idle=on_idle, poll_interval=poll_interval)
+    finally:
+        if compute_budget is not None:
+            compute_budget.exit()
+
+
+def run_intraday_analysis(tickers, end_date, frequency=INTRADAY_FREQUENCY, lookback_days=INTRADAY_LOOKBACK_DAYS,
+                          num_portfolios=NUMBER_OF_PORTFOLIOS, source=None):
+    """
+    Intraday mode: stream bars for the lookback window, resample them to `frequency`
+    and score random portfolios on the per-bar log return statistics. Volatility and
+    return are annualised with the observed number of bars per year.
+    """
+    end = pd.Timestamp(end_date) + timedelta(days=1)
+    intraday = stream_intraday(tickers, end - timedelta(days=lookback_days), end, frequency, source)
+    meanlog, sigma = intraday['meanlog'], intraday['sigma']
+    periods_per_year = intraday['periods_per_year']
+
+    statistics = pd.DataFrame({
+        'annual_log_return': meanlog * periods_per_year,
+        'annual_volatility': np.sqrt(np.diag(sigma) * periods_per_year)
+    }, index=meanlog.index)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scale = np.sqrt(np.diag(sigma))
+        correlation = sigma / np.outer(scale, scale)
+
+    sharpe_data = None
+    if intraday['num_bars'] > 1 and np.isfinite(sigma.to_numpy()).all():
+        test_weight = np.random.random((num_portfolios, len(tickers)))
+        test_weight = test_weight / test_weight.sum(axis=1, keepdims=True)
+        test_return, test_volatility, sharpratio = score_portfolios(test_weight, meanlog.to_numpy(), sigma.to_numpy())
+        max_sharpratio = sharpratio.argmax()
+        sharpe_data = {
+            'test_volatility': test_volatility,
+            'test_return': test_return,
+            'sharpratio': sharpratio,
+            'max_sharpratio': max_sharpratio,
+            'sharpratio_weight': test_weight[max_sharpratio]
+        }
+    return {'intraday': intraday, 'statistics': statistics, 'correlation': correlation, 'sharpe_data': sharpe_data}
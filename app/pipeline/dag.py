@@ -0,0 +1,284 @@
+import time
+import pickle
+import hashlib
+import datetime
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from app.config.config import PIPELINE_MAX_WORKERS, PIPELINE_CACHE_CAPACITY
+
+# Values hashed by content even when an upstream token is available: cheap to
+# serialise, and often unchanged when the stage producing them reruns (e.g. tickers)
+SMALL_VALUE_TYPES = (type(None), bool, int, float, str, datetime.date)
+SMALL_VALUE_ITEMS = 1000
+
+
+def _is_small(value):
+    if isinstance(value, (list, tuple)):
+        return len(value) <= SMALL_VALUE_ITEMS and all(isinstance(item, SMALL_VALUE_TYPES) for item in value)
+    return isinstance(value, SMALL_VALUE_TYPES)
+
+
+class Stage:
+    """
+    A node of the analysis graph: a function from named inputs to named outputs.
+    inputs is a list of value names passed as keyword arguments of the same name, or a
+    {argument name: value name} dict when the function's argument is named differently.
+    version(outputs) optionally returns a small token standing in for the content of
+    the outputs of a stage that is not cached (e.g. the file and modification time
+    they were read from), so later cache keys need not hash the outputs themselves.
+    """
+
+    def __init__(self, name, func, inputs, outputs, cacheable=True, version=None):
+        self.name = name
+        self.func = func
+        self.arguments = dict(inputs) if isinstance(inputs, dict) else {value: value for value in inputs}
+        self.inputs = list(self.arguments.values())
+        self.outputs = list(outputs)
+        self.cacheable = cacheable
+        self.version = version
+
+    def __repr__(self):
+        return f"Stage({self.name}: {', '.join(self.inputs)} -> {', '.join(self.outputs)})"
+
+
+class StageCache:
+    """
+    Thread-safe LRU of stage outputs keyed by the stage name and the tokens of its
+    inputs. A value's token is computed once per run: pipeline inputs and small
+    values are hashed; larger outputs of a cached stage derive their token from its
+    key, and those of other stages use the stage's version token or, failing that,
+    a hash of their content. Large frames are never re-serialised per stage.
+    """
+
+    def __init__(self, capacity=PIPELINE_CACHE_CAPACITY):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def content_token(value):
+        return hashlib.sha256(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)).hexdigest()
+
+    @staticmethod
+    def make_key(stage, tokens):
+        digest = hashlib.sha256(stage.name.encode())
+        for name in stage.inputs:
+            digest.update(name.encode())
+            digest.update(tokens[name].encode())
+        return digest.hexdigest()
+
+    @staticmethod
+    def output_token(key, name):
+        return hashlib.sha256(f"{key}:{name}".encode()).hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+    def put(self, key, outputs):
+        with self.lock:
+            self.entries[key] = outputs
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+
+
+def _run_stage(func, kwargs, outputs):
+    """Call a stage function and normalise its return value to {output name: value}"""
+    start = time.perf_counter()
+    result = func(**kwargs)
+    if len(outputs) == 1 and not (isinstance(result, dict) and set(result) == set(outputs)):
+        result = {outputs[0]: result}
+    return result, time.perf_counter() - start
+
+
+class Pipeline:
+    """
+    A declared stage graph executed by a scheduler that submits every stage as soon as
+    its inputs are available, so independent stages run concurrently and end-to-end
+    latency approaches the critical path rather than the sum of all stages.
+    """
+
+    def __init__(self, stages, cache=None):
+        self.stages = {stage.name: stage for stage in stages}
+        self.cache = cache
+        self.producers = {}
+        for stage in stages:
+            for output in stage.outputs:
+                if output in self.producers:
+                    raise ValueError(f"Output '{output}' is produced by both {self.producers[output]} and {stage.name}")
+                self.producers[output] = stage.name
+        self._check_acyclic()
+
+    def _check_acyclic(self):
+        """Raise if the stage graph has a cycle"""
+        state = {}
+
+        def visit(name, path):
+            if state.get(name) == 'done':
+                return
+            if state.get(name) == 'visiting':
+                raise ValueError(f"Pipeline has a cycle: {' -> '.join(path + [name])}")
+            state[name] = 'visiting'
+            for value in self.stages[name].inputs:
+                if value in self.producers:
+                    visit(self.producers[value], path + [name])
+            state[name] = 'done'
+
+        for name in self.stages:
+            visit(name, [])
+
+    def dependencies(self, name):
+        """Stages whose outputs the given stage consumes"""
+        return {self.producers[value] for value in self.stages[name].inputs if value in self.producers}
+
+    def run(self, inputs, max_workers=PIPELINE_MAX_WORKERS, use_processes=False, initializer=None,
+            on_stage_complete=None, on_idle=None, poll_interval=None):
+        """
+        Execute the graph.
+
+        Parameters:
+        - inputs: {name: value} for every value no stage produces
+        - max_workers: size of the worker pool
+        - use_processes: run stages in a process pool (stage functions and values must pickle)
+        - initializer: called in each worker thread/process when it starts
+        - on_stage_complete: callback(stage name, outputs) invoked in the calling thread
+        - on_idle: callback() invoked in the calling thread at least every poll_interval
+          seconds while stages are running, e.g. to draw progress reported by workers
+
+        Returns a dict with 'values' (inputs and outputs), the names of the 'inputs',
+        'timings' {stage: {start, end, duration, cached}}, 'errors' {stage: exception},
+        'skipped' stages and the 'critical_path'.
+        """
+        missing = {value for stage in self.stages.values() for value in stage.inputs
+                   if value not in self.producers and value not in inputs}
+        if missing:
+            raise ValueError(f"Pipeline inputs missing: {', '.join(sorted(missing))}")
+
+        values = dict(inputs)
+        tokens = {}
+        outputs_of = {}
+        timings = {}
+        errors = {}
+        skipped = set()
+        done = set()
+        running = {}
+        completed = []
+        pending = set(self.stages)
+        origin = time.perf_counter()
+
+        def token(value):
+            """Token of a value for cache keys, computed once per run"""
+            if value not in tokens:
+                key = None
+                if value in self.producers and not _is_small(values[value]):
+                    stage = self.stages[self.producers[value]]
+                    key, outputs = outputs_of[stage.name]
+                    if key is None and stage.version is not None:
+                        version = self.cache.content_token(stage.version(outputs))
+                        key = self.cache.make_key(stage, {name: token(name) for name in stage.inputs}) + version
+                if key is None:
+                    tokens[value] = self.cache.content_token(values[value])
+                else:
+                    tokens[value] = self.cache.output_token(key, value)
+            return tokens[value]
+
+        def stage_key(stage):
+            if self.cache is None or not stage.cacheable:
+                return None
+            return self.cache.make_key(stage, {name: token(name) for name in stage.inputs})
+
+        pool_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        with pool_class(max_workers=max_workers, initializer=initializer) as executor:
+            while pending or running:
+                for name in sorted(pending):
+                    dependencies = self.dependencies(name)
+                    if dependencies & (skipped | set(errors)):
+                        pending.discard(name)
+                        skipped.add(name)
+                        continue
+                    if not dependencies <= done:
+                        continue
+                    pending.discard(name)
+                    stage = self.stages[name]
+                    kwargs = {argument: values[value] for argument, value in stage.arguments.items()}
+                    key = stage_key(stage)
+                    cached = self.cache.get(key) if key is not None else None
+                    if cached is not None:
+                        now = time.perf_counter() - origin
+                        timings[name] = {'start': now, 'end': now, 'duration': 0.0, 'cached': True}
+                        values.update(cached)
+                        outputs_of[name] = (key, cached)
+                        done.add(name)
+                        completed.append((name, cached))
+                        continue
+                    future = executor.submit(_run_stage, stage.func, kwargs, stage.outputs)
+                    running[future] = (name, key, time.perf_counter() - origin)
+
+                # Callbacks run only after newly unlocked stages are submitted, so slow
+                # callbacks (e.g. drawing results) overlap with the work they wait on
+                if on_stage_complete is not None:
+                    for name, outputs in completed:
+                        on_stage_complete(name, outputs)
+                completed.clear()
+
+                # A cache hit may have unlocked more stages, schedule them before waiting
+                if not running:
+                    if pending and not any(self.dependencies(name) <= done for name in pending):
+                        skipped |= pending
+                        pending.clear()
+                    continue
+
+                finished, _ = wait(running, timeout=poll_interval if on_idle is not None else None,
+                                   return_when=FIRST_COMPLETED)
+                if on_idle is not None:
+                    on_idle()
+                for future in finished:
+                    name, key, start = running.pop(future)
+                    end = time.perf_counter() - origin
+                    try:
+                        outputs, duration = future.result()
+                    except Exception as exc:
+                        errors[name] = exc
+                        timings[name] = {'start': start, 'end': end, 'duration': end - start, 'cached': False}
+                        continue
+                    timings[name] = {'start': start, 'end': end, 'duration': duration, 'cached': False}
+                    values.update(outputs)
+                    outputs_of[name] = (key, outputs)
+                    done.add(name)
+                    if key is not None:
+                        self.cache.put(key, outputs)
+                    completed.append((name, outputs))
+
+        if on_stage_complete is not None:
+            for name, outputs in completed:
+                on_stage_complete(name, outputs)
+
+        return {
+            'values': values,
+            'inputs': list(inputs),
+            'timings': timings,
+            'errors': errors,
+            'skipped': sorted(skipped),
+            'total_time': time.perf_counter() - origin,
+            'critical_path': self.critical_path(timings)
+        }
+
+    def critical_path(self, timings):
+        """Longest chain of dependent stages by measured duration"""
+        longest = {}
+
+        def length(name):
+            if name not in longest:
+                before = [length(dep) for dep in self.dependencies(name) if dep in timings]
+                best = max(before, key=lambda item: item[0], default=(0.0, []))
+                longest[name] = (best[0] + timings[name]['duration'], best[1] + [name])
+            return longest[name]
+
+        paths = [length(name) for name in timings]
+        duration, path = max(paths, key=lambda item: item[0], default=(0.0, []))
+        return {'duration': duration, 'stages': path}
@@ -0,0 +1,182 @@
+"""
+Precompute worker: refreshes prices for popular universes and stores their log
+returns, covariance, benchmark betas and volatilities, so interactive requests on
+tickers inside a warmed universe slice the stored matrices instead of downloading
+and recomputing.
+
+    python -m app.pipeline.precompute --once
+    python -m app.pipeline.precompute --at 02:00
+"""
+import os
+import time
+import argparse
+import threading
+import pandas as pd
+from datetime import date, datetime, timedelta
+from app.config.config import (
+    HISTORICAL_PERIOD_DAYS, PORTFOLIO_EVOLUTION_YEARS, BENCHMARK_TICKER,
+    PRECOMPUTE_DIR, PRECOMPUTE_UNIVERSES, PRECOMPUTE_SCHEDULE
+)
+from app.data.data_loader import get_historical_prices, get_daily_returns
+from app.data.snapshots import save_snapshot, load_snapshot
+from app.calculations.optimization import log_return_statistics
+from app.calculations.portfolio_calculations import calculate_beta
+
+
+def analysis_windows(end_date):
+    """Start of the statistics window and of the value evolution window for an analysis ending on end_date"""
+    return end_date - timedelta(days=HISTORICAL_PERIOD_DAYS), end_date - timedelta(days=PORTFOLIO_EVOLUTION_YEARS * 365)
+
+
+def load_universe(universe):
+    """Tickers of a universe given as a list or as the path of a CSV file with a 'ticker' column"""
+    if isinstance(universe, str):
+        return [ticker.strip().upper() for ticker in pd.read_csv(universe)['ticker'].dropna()]
+    return list(universe)
+
+
+def _store_path(name, store_dir):
+    return os.path.join(store_dir, f"{name}.rps")
+
+
+def build_universe_store(name, tickers, end_date=None, store_dir=PRECOMPUTE_DIR):
+    """
+    Download prices for one universe and store, for the analysis windows ending on
+    end_date (today by default): prices and benchmark prices over the longer window,
+    and the aligned log returns, their mean and covariance, the betas and the daily
+    volatility over the statistics window. Returns the store path; raises
+    DataLoadError if no prices came back.
+    """
+    end_date = end_date or date.today()
+    start_date, evolution_start_date = analysis_windows(end_date)
+    first_date = min(start_date, evolution_start_date)
+
+    prices = get_historical_prices(tickers, first_date, end_date)
+    benchmark_prices = get_historical_prices(BENCHMARK_TICKER, first_date, end_date)
+    window_prices = prices.loc[pd.Timestamp(start_date):pd.Timestamp(end_date)].dropna(how='all')
+    daily_returns = get_daily_returns(window_prices)
+    benchmark_returns = get_daily_returns(benchmark_prices.loc[pd.Timestamp(start_date):pd.Timestamp(end_date)]).iloc[:, 0]
+    statistics = log_return_statistics(window_prices)
+
+    values = {
+        'universe': name,
+        'tickers': list(prices.columns),
+        'start_date': start_date,
+        'end_date': end_date,
+        'first_date': first_date,
+        'prices': prices,
+        'benchmark_prices': benchmark_prices,
+        'logreturns': statistics['logreturns'],
+        'meanlog': statistics['meanlog'],
+        'sigma': statistics['sigma'],
+        'betas': calculate_beta(daily_returns, benchmark_returns),
+        'volatility': daily_returns.std(axis=0),
+    }
+    os.makedirs(store_dir, exist_ok=True)
+    return save_snapshot(values, path=_store_path(name, store_dir))
+
+
+def run_precompute(universes=None, end_date=None, store_dir=PRECOMPUTE_DIR):
+    """Build the store of every universe; a failing universe is reported and skipped"""
+    universes = PRECOMPUTE_UNIVERSES if universes is None else universes
+    paths = {}
+    for name, universe in universes.items():
+        start = time.perf_counter()
+        try:
+            paths[name] = build_universe_store(name, load_universe(universe), end_date, store_dir)
+        except Exception as error:
+            print(f"Precompute of {name} failed: {error}")
+            paths[name] = None
+            continue
+        print(f"Precomputed {name} in {time.perf_counter() - start:.1f}s: {paths[name]}")
+    return paths
+
+
+def seconds_until(schedule, now=None):
+    """Seconds from now to the next daily run at schedule ('HH:MM', local time)"""
+    now = now or datetime.now()
+    hour, minute = (int(part) for part in schedule.split(':'))
+    next_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if next_run <= now:
+        next_run += timedelta(days=1)
+    return (next_run - now).total_seconds()
+
+
+def run_scheduled(universes=None, schedule=PRECOMPUTE_SCHEDULE, store_dir=PRECOMPUTE_DIR):
+    """Run the precompute every day at schedule, forever"""
+    while True:
+        time.sleep(seconds_until(schedule))
+        run_precompute(universes, store_dir=store_dir)
+
+
+_open_stores = {}
+_open_stores_lock = threading.Lock()
+
+
+def _stores(store_dir):
+    """Open every store in store_dir lazily (header only), reopening files rewritten since the last call"""
+    if not os.path.isdir(store_dir):
+        return []
+    stores = []
+    with _open_stores_lock:
+        for file_name in sorted(os.listdir(store_dir)):
+            if not file_name.endswith('.rps'):
+                continue
+            path = os.path.join(store_dir, file_name)
+            modified = os.path.getmtime(path)
+            cached = _open_stores.get(path)
+            if cached is None or cached[0] != modified:
+                store = load_snapshot(path)
+                cached = (modified, store, set(store['tickers']))
+                _open_stores[path] = cached
+            stores.append(cached[1:])
+    return stores
+
+
+def get_precomputed(tickers, start_date, end_date, evolution_start_date, store_dir=PRECOMPUTE_DIR):
+    """
+    The slice of a warmed universe covering every ticker, if one was built for the same
+    analysis windows (i.e. today's nightly run), else None. Returns a dict of prices
+    and benchmark prices (both windows), log return statistics, betas and volatility
+    for the tickers, in their order, and the store's 'version' (path and build time).
+    """
+    for store, available in _stores(store_dir):
+        if not set(tickers) <= available:
+            continue
+        if store['start_date'] != start_date or store['end_date'] != end_date or store['first_date'] > evolution_start_date:
+            continue
+        return {
+            'universe': store['universe'],
+            'prices': store['prices'][tickers],
+            'benchmark_prices': store['benchmark_prices'],
+            'statistics': {
+                'logreturns': store['logreturns'][tickers],
+                'meanlog': store['meanlog'][tickers],
+                'sigma': store['sigma'].loc[tickers, tickers],
+            },
+            'betas': store['betas'][tickers],
+            'volatility': store['volatility'][tickers],
+            'version': (store.path, store.created),
+        }
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompute statistics for the configured ticker universes')
+    parser.add_argument('--once', action='store_true', help='run now and exit instead of running every day')
+    parser.add_argument('--at', default=PRECOMPUTE_SCHEDULE, help='daily run time, HH:MM local time')
+    parser.add_argument('--universe', action='append', help='only this universe (repeatable)')
+    parser.add_argument('--store-dir', default=PRECOMPUTE_DIR)
+    args = parser.parse_args()
+
+    universes = PRECOMPUTE_UNIVERSES
+    if args.universe:
+        universes = {name: PRECOMPUTE_UNIVERSES[name] for name in args.universe}
+    if args.once:
+        run_precompute(universes, store_dir=args.store_dir)
+    else:
+        run_scheduled(universes, args.at, args.store_dir)
+
+
+if __name__ == '__main__':
+    main()
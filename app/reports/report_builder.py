@@ -0,0 +1,275 @@
+import os
+import csv
+import html
+import time
+import pickle
+import hashlib
+import argparse
+import pandas as pd
+from datetime import date
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait
+from app.config.config import (
+    REPORT_OUTPUT_DIR, REPORT_FORMAT, REPORT_MAX_WORKERS, REPORT_BATCH_SIZE, REPORT_DPI
+)
+from app.pipeline.analysis_pipeline import run_analysis, evolution_value_name
+from app.visualization import figures
+
+
+def load_clients(path):
+    """
+    Read client portfolios from a CSV with one row per holding
+    (client_id, ticker, weight, amount) and yield one dict per client.
+    """
+    holdings = pd.read_csv(path)
+    for client_id, rows in holdings.groupby('client_id', sort=False):
+        yield {
+            'client_id': str(client_id),
+            'tickers': [ticker.strip().upper() for ticker in rows['ticker']],
+            'weights': [float(weight) for weight in rows['weight']],
+            'amount': float(rows['amount'].iloc[0])
+        }
+
+
+def chart_key(builder, args):
+    """Content hash of a chart, so identical charts across clients are rendered once"""
+    digest = hashlib.sha256(builder.encode())
+    digest.update(pickle.dumps(args, protocol=pickle.HIGHEST_PROTOCOL))
+    return digest.hexdigest()[:20]
+
+
+def _init_worker():
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def render_chart(builder, args, path, dpi=REPORT_DPI):
+    """Build one chart from app.visualization.figures and save it as PNG (worker entry point)"""
+    fig = getattr(figures, builder)(*args)
+    tmp_path = f"{path}.{os.getpid()}.tmp.png"
+    fig.savefig(tmp_path, dpi=dpi)
+    os.replace(tmp_path, path)
+    return path
+
+
+def write_pdf_report(path, title, chart_paths, tables):
+    """Compose a PDF from rendered chart images and (caption, DataFrame) tables (worker entry point)"""
+    import matplotlib.image as mpimg
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    with PdfPages(path) as pdf:
+        for caption, chart_path in chart_paths:
+            fig = Figure(figsize=(11, 8.5))
+            ax = fig.subplots()
+            ax.imshow(mpimg.imread(chart_path))
+            ax.axis('off')
+            fig.suptitle(f"{title}: {caption}")
+            pdf.savefig(fig)
+        for caption, table in tables:
+            fig = Figure(figsize=(11, 8.5))
+            ax = fig.subplots()
+            ax.axis('off')
+            ax.set_title(f"{title}: {caption}")
+            table = table.round(4)
+            ax.table(cellText=table.astype(str).values, rowLabels=[str(i) for i in table.index],
+                     colLabels=[str(c) for c in table.columns], loc='center')
+            pdf.savefig(fig)
+    return path
+
+
+def client_charts(client, values):
+    """(caption, figure builder, args) for every chart of one client's report"""
+    tickers = client['tickers']
+    charts = [('Current allocation', 'pie_chart_figure', (client['weights'], tickers))]
+    if values.get('prices') is not None:
+        charts.append(('Historic prices', 'historical_prices_figure', (values['prices'],)))
+    if 'port_daily_return' in values:
+        charts.append(('Portfolio daily returns', 'portfolio_returns_figure', (values['port_daily_return'],)))
+    if 'sharpe_data' in values and 'markowitz_data' in values:
+        sharpe_data = values['sharpe_data']
+        charts.append(('Efficient frontier', 'efficient_frontier_figure', (
+            sharpe_data['test_volatility'], sharpe_data['test_return'], sharpe_data['sharpratio'],
+            sharpe_data['max_sharpratio'], values['markowitz_data']['optimal_volatility'],
+            values['markowitz_data']['returns']
+        )))
+
+    best_strategy = values.get('best_strategy')
+    if best_strategy in values.get('strategy_weights', {}):
+        evolution = values.get(evolution_value_name(best_strategy))
+        if evolution is not None:
+            charts.append((f'Value evolution ({best_strategy})', 'portfolio_evolution_figure',
+                           (evolution[['Profit Close']], f"Portfolio Value Evolution using {best_strategy}")))
+        charts.append((f'Recommended allocation ({best_strategy})', 'pie_chart_figure',
+                       (list(values['strategy_weights'][best_strategy]), values.get('tickers', tickers))))
+    return charts
+
+
+def client_tables(client, values):
+    """(caption, DataFrame) for the strategy comparison tables of one client's report"""
+    tables = []
+    analyzer = values.get('analyzer')
+    if analyzer is None:
+        return tables
+    tables.append(('Total return by strategy', pd.Series(analyzer.return_values, name='total_return').to_frame()))
+    if values.get('risk_metrics') is not None and not values['risk_metrics'].empty:
+        tables.append(('Risk metrics by strategy', values['risk_metrics']))
+    best_strategy = values.get('best_strategy')
+    if best_strategy in values.get('strategy_weights', {}):
+        tables.append((f'Recommended weights ({best_strategy})', analyzer.create_recommendation_dataframe(
+            best_strategy, values['strategy_weights'][best_strategy]).set_index('Key')))
+    if values.get('discrete_allocation') is not None:
+        tables.append(('Share orders', values['discrete_allocation']['allocation'].set_index('Ticker')))
+    return tables
+
+
+def write_html_report(path, client, best_strategy, charts, tables):
+    """Write one client's HTML report; charts are (caption, path relative to the report)"""
+    title = html.escape(f"Portfolio report: {client['client_id']}")
+    parts = [
+        f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>{title}</title>",
+        "<style>body{font-family:sans-serif;margin:2em}img{max-width:100%}"
+        "table{border-collapse:collapse}td,th{border:1px solid #ccc;padding:4px 8px}</style></head><body>",
+        f"<h1>{title}</h1>",
+        f"<p>Portfolio amount: ${client['amount']:,.2f}. Recommended strategy: {html.escape(str(best_strategy))}.</p>"
+    ]
+    for caption, chart_path in charts:
+        parts.append(f"<h2>{html.escape(caption)}</h2><img src='{html.escape(chart_path)}' alt='{html.escape(caption)}'>")
+    for caption, table in tables:
+        parts.append(f"<h2>{html.escape(caption)}</h2>{table.to_html(float_format=lambda v: f'{v:.4f}')}")
+    parts.append("</body></html>")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(parts))
+    os.replace(tmp_path, path)
+
+
+def build_client_reports(clients, output_dir=REPORT_OUTPUT_DIR, report_format=REPORT_FORMAT,
+                         max_workers=REPORT_MAX_WORKERS, batch_size=REPORT_BATCH_SIZE, end_date=None,
+                         ranking_metric='total_return'):
+    """
+    Analyse every client and write one report per client.
+
+    Clients (any iterable, e.g. load_clients) are analysed batch by batch in this process,
+    while their charts are rendered with the Agg backend in a process pool. Each chart is
+    keyed by a hash of its content and rendered once into output_dir/charts, so charts
+    shared by clients (the same universe's price chart) are reused. A batch's reports are
+    written as soon as its charts are done, while the next batch is analysed, so the
+    batch never holds more than two batches of results in memory. An index.csv lists
+    every report written.
+    """
+    if report_format not in ('html', 'pdf'):
+        raise ValueError(f"Unknown report format '{report_format}', expected 'html' or 'pdf'")
+    start = time.perf_counter()
+    end_date = end_date or date.today()
+    chart_dir = os.path.join(output_dir, 'charts')
+    os.makedirs(chart_dir, exist_ok=True)
+
+    chart_futures = {}
+    pending_batches = deque()
+    summary = {'reports': 0, 'failed': 0, 'charts_referenced': 0, 'charts_rendered': 0, 'charts_failed': 0}
+
+    with open(os.path.join(output_dir, 'index.csv'), 'w', newline='') as index_file, \
+            ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker) as executor:
+        index = csv.writer(index_file)
+        index.writerow(['client_id', 'report', 'best_strategy', 'best_return', 'errors'])
+
+        def flush(batch):
+            """
+            Wait for a batch's charts and write its reports. A chart that failed to render
+            is left out of the report and noted in its errors; a PDF that fails is listed
+            with no report file. Either way the batch goes on.
+            """
+            wait([chart_futures[key] for report in batch for _, key in report['charts']])
+            written = []
+            for report in batch:
+                client = report['client']
+                name = f"{client['client_id']}.{report_format}"
+                path = os.path.join(output_dir, name)
+                errors = list(report['errors'])
+                charts = []
+                for caption, key in report['charts']:
+                    error = chart_futures[key].exception()
+                    if error is not None:
+                        errors.append(f"chart '{caption}': {error}")
+                        summary['charts_failed'] += 1
+                    else:
+                        charts.append((caption, os.path.join('charts', f"{key}.png")))
+                future = None
+                if report_format == 'html':
+                    write_html_report(path, client, report['best_strategy'], charts, report['tables'])
+                else:
+                    chart_paths = [(caption, os.path.join(output_dir, chart)) for caption, chart in charts]
+                    future = executor.submit(write_pdf_report, path, f"Portfolio report: {client['client_id']}",
+                                             chart_paths, report['tables'])
+                written.append((report, name, errors, future))
+            for report, name, errors, future in written:
+                if future is not None and future.exception() is not None:
+                    errors.append(f"report: {future.exception()}")
+                    name = ''
+                    summary['failed'] += 1
+                else:
+                    summary['reports'] += 1
+                index.writerow([report['client']['client_id'], name, report['best_strategy'], report['best_return'],
+                                '; '.join(errors)])
+            index_file.flush()
+
+        batch = []
+        for client in clients:
+            try:
+                result = run_analysis(client['tickers'], client['weights'], len(client['tickers']), client['amount'],
+                                      end_date, ranking_metric, {})
+            except Exception as error:
+                print(f"Report for {client['client_id']} failed: {error}")
+                summary['failed'] += 1
+                continue
+            values = result['values']
+
+            chart_refs = []
+            for caption, builder, args in client_charts(client, values):
+                key = chart_key(builder, args)
+                if key not in chart_futures:
+                    chart_futures[key] = executor.submit(render_chart, builder, args,
+                                                         os.path.join(chart_dir, f"{key}.png"))
+                    summary['charts_rendered'] += 1
+                chart_refs.append((caption, key))
+                summary['charts_referenced'] += 1
+
+            batch.append({
+                'client': client,
+                'charts': chart_refs,
+                'tables': client_tables(client, values),
+                'best_strategy': values.get('best_strategy'),
+                'best_return': values.get('best_return'),
+                'errors': [f"{stage}: {error}" for stage, error in result['errors'].items()]
+            })
+            if len(batch) >= batch_size:
+                pending_batches.append(batch)
+                batch = []
+                # Write the previous batch while this one's charts render
+                while len(pending_batches) > 1:
+                    flush(pending_batches.popleft())
+
+        if batch:
+            pending_batches.append(batch)
+        while pending_batches:
+            flush(pending_batches.popleft())
+
+    summary['elapsed_seconds'] = time.perf_counter() - start
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build one portfolio report per client')
+    parser.add_argument('clients', help='CSV with client_id, ticker, weight, amount (one row per holding)')
+    parser.add_argument('--output', default=REPORT_OUTPUT_DIR)
+    parser.add_argument('--format', choices=['html', 'pdf'], default=REPORT_FORMAT)
+    parser.add_argument('--workers', type=int, default=REPORT_MAX_WORKERS)
+    args = parser.parse_args()
+
+    summary = build_client_reports(load_clients(args.clients), args.output, args.format, args.workers)
+    print(pd.Series(summary).to_string())
+
+
+if __name__ == '__main__':
+    main()
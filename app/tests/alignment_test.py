@@ -0,0 +1,51 @@
+"""
+Check that the pairwise-complete covariance of tickers with staggered listing dates
+is positive semi-definite, so portfolio variances are never negative and volatility
+and Sharpe ratios stay finite.
+
+    python -m app.tests.alignment_test
+"""
+import numpy as np
+import pandas as pd
+from app.data.alignment import pairwise_covariance
+from app.calculations.optimization import log_return_statistics
+
+
+def staggered_prices(num_days=300, seed=0):
+    """
+    Three tickers on one business-day index: OLD delists after day 200, NEW lists on
+    day 100, and the two move opposite to each other while both trade, although each
+    follows MID the rest of the time. Pairwise covariances over those different
+    windows do not fit together into a PSD matrix.
+    """
+    rng = np.random.default_rng(seed)
+    market = rng.normal(0, 0.01, num_days)
+    old, mid, new = (market + rng.normal(0, 0.001, num_days) for _ in range(3))
+    new[100:200] = -old[100:200] + rng.normal(0, 0.001, 100)
+    returns = pd.DataFrame({'OLD': old, 'MID': mid, 'NEW': new},
+                           index=pd.bdate_range('2023-01-02', periods=num_days))
+    prices = 100 * np.exp(returns.cumsum())
+    prices.loc[prices.index[200:], 'OLD'] = np.nan
+    prices.loc[prices.index[:100], 'NEW'] = np.nan
+    return prices
+
+
+def check_staggered_listings(tolerance=1e-12):
+    """Returns the smallest eigenvalue of the raw and the projected covariance"""
+    statistics = log_return_statistics(staggered_prices())
+    logreturns = statistics['logreturns'].to_numpy()
+    raw = np.linalg.eigvalsh(pairwise_covariance(logreturns, psd=False))[0]
+    sigma = statistics['sigma'].to_numpy()
+    projected = np.linalg.eigvalsh(sigma)[0]
+    assert projected >= -tolerance, f"covariance is not PSD: smallest eigenvalue {projected:.3e}"
+
+    weights = np.random.default_rng(1).dirichlet(np.ones(sigma.shape[0]), 1000)
+    weights = np.vstack([weights, [1.0, -1.0, 1.0]])
+    variance = np.einsum('pn,nm,pm->p', weights, sigma, weights)
+    assert np.all(variance >= -tolerance), f"negative portfolio variance: {variance.min():.3e}"
+    return raw, projected
+
+
+if __name__ == '__main__':
+    raw, projected = check_staggered_listings()
+    print(f"smallest eigenvalue: pairwise {raw:.3e}, projected {projected:.3e}")
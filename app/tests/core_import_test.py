@@ -0,0 +1,63 @@
+"""
+Check that the core modules (data loading, calculations, analysis, pipeline) import
+without streamlit or matplotlib, and measure the import time and peak memory of a
+worker that uses only the core against one that also loads the UI stack. Each case
+runs in a fresh interpreter.
+
+    python -m app.tests.core_import_test
+"""
+import sys
+import json
+import subprocess
+
+# Everything a batch job, worker or service may import
+CORE_MODULES = [
+    'app.pipeline.analysis_pipeline',
+    'app.pipeline.precompute',
+    'app.data.price_cache',
+    'app.data.snapshots',
+]
+UI_MODULES = ['app.ui.ui_components', 'app.ui.result_sections', 'app.visualization.visualization']
+FORBIDDEN_PREFIXES = ('streamlit', 'matplotlib')
+
+CHILD = """
+import sys, json, time, resource, importlib
+start = time.perf_counter()
+for module in {modules!r}:
+    importlib.import_module(module)
+import_seconds = time.perf_counter() - start
+
+# A small worker task on the core only
+import numpy as np, pandas as pd
+from app.calculations.optimization import log_return_statistics
+prices = pd.DataFrame(100 * np.exp(np.cumsum(np.random.default_rng(0).normal(0, 0.01, (500, 20)), axis=0)),
+                      index=pd.bdate_range('2020-01-01', periods=500))
+log_return_statistics(prices)
+
+print(json.dumps({{
+    'import_seconds': import_seconds,
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'ui_modules': sorted({{name.split('.')[0] for name in sys.modules if name.startswith({forbidden!r})}}),
+}}))
+"""
+
+
+def measure(modules):
+    """Import time (seconds), peak RSS (MB) and UI packages loaded by a fresh interpreter importing modules"""
+    code = CHILD.format(modules=modules, forbidden=FORBIDDEN_PREFIXES)
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def check_core_imports():
+    """Measure the core alone and the core plus the UI; raises if the core loads a UI package"""
+    report = {'core': measure(CORE_MODULES), 'core + ui': measure(CORE_MODULES + UI_MODULES)}
+    if report['core']['ui_modules']:
+        raise AssertionError(f"Core modules import {', '.join(report['core']['ui_modules'])}")
+    return report
+
+
+if __name__ == '__main__':
+    for case, result in check_core_imports().items():
+        ui = ', '.join(result['ui_modules']) or 'none'
+        print(f"{case}: import {result['import_seconds']:.2f}s, peak RSS {result['max_rss_mb']:.0f} MB, UI packages: {ui}")
@@ -0,0 +1,33 @@
+"""
+Check that whole-share orders never go short: long-only weights give non-negative
+share counts, and weights with a negative entry are rejected instead of being shown
+as buy orders.
+
+    python -m app.tests.discrete_allocation_test
+"""
+import numpy as np
+from app.calculations.discrete_allocation import calculate_discrete_allocation
+
+TICKERS = ['AAA', 'BBB', 'CCC']
+PRICES = np.array([50.0, 120.0, 15.0])
+
+
+def check_long_only(amount=10000.0):
+    """Long-only weights allocate whole, non-negative share counts within the amount"""
+    allocation = calculate_discrete_allocation(TICKERS, [0.5, 0.3, 0.2], PRICES, amount)
+    shares = allocation['shares'].to_numpy()
+    assert np.all(shares >= 0), f"negative share count: {shares}"
+    assert allocation['leftover'] >= 0, f"spent more than the amount: {allocation['leftover']}"
+    return allocation
+
+
+def check_short_weights(amount=10000.0):
+    """Long-short weights (as from the Beta strategy) are rejected"""
+    allocation = calculate_discrete_allocation(TICKERS, [0.8, 0.5, -0.3], PRICES, amount)
+    assert allocation is None, f"short weights gave orders:\n{allocation['allocation']}"
+
+
+if __name__ == '__main__':
+    print(check_long_only()['allocation'].to_string())
+    check_short_weights()
+    print("Short weights rejected")
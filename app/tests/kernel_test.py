@@ -0,0 +1,57 @@
+"""
+Check that every kernel backend gives the same results on random inputs, including
+missing returns. Backends without their dependency (Numba for 'jit') are skipped.
+
+    python -m app.tests.kernel_test
+"""
+import numpy as np
+from app.calculations.kernels import (
+    jit_available, score_portfolios, benchmark_covariances, beta_weights
+)
+
+
+def kernel_cases(seed=0):
+    """(kernel name, function, args) for a set of random inputs"""
+    rng = np.random.default_rng(seed)
+    num_periods, num_tickers = 250, 8
+    returns = rng.normal(0.0005, 0.01, size=(num_periods, num_tickers))
+    returns[rng.random(returns.shape) < 0.05] = np.nan
+    returns[:, -1] = np.nan
+    benchmark = rng.normal(0.0003, 0.01, size=num_periods)
+    benchmark[:3] = np.nan
+
+    weights = rng.random((500, num_tickers))
+    weights /= weights.sum(axis=1, keepdims=True)
+    clean = np.nan_to_num(returns[:, :-1])
+    sigma = np.cov(clean, rowvar=False)
+    return [
+        ('score_portfolios', score_portfolios, (weights[:, :-1], clean.mean(axis=0), sigma)),
+        ('benchmark_covariances', benchmark_covariances, (returns, benchmark)),
+        ('beta_weights', beta_weights, (np.append(rng.uniform(0.5, 1.5, num_tickers), np.nan), 1.0)),
+    ]
+
+
+def check_kernels(rtol=1e-10):
+    """Compare each backend against the NumPy kernels; returns the largest relative difference per kernel"""
+    backends = ['loop'] + (['jit'] if jit_available() else [])
+    report = {}
+    for name, kernel, args in kernel_cases():
+        expected = kernel(*args, backend='numpy')
+        expected = expected if isinstance(expected, tuple) else (expected,)
+        for backend in backends:
+            result = kernel(*args, backend=backend)
+            result = result if isinstance(result, tuple) else (result,)
+            worst = 0.0
+            for a, b in zip(expected, result):
+                np.testing.assert_allclose(b, a, rtol=rtol, equal_nan=True, err_msg=f"{name} ({backend})")
+                finite = np.isfinite(a) & (a != 0)
+                worst = max(worst, float(np.max(np.abs((b - a)[finite] / a[finite]), initial=0.0)))
+            report[f"{name} ({backend})"] = worst
+    return report
+
+
+if __name__ == '__main__':
+    if not jit_available():
+        print("Numba is not installed: checking the uncompiled loop kernels against NumPy only")
+    for case, difference in check_kernels().items():
+        print(f"{case}: max relative difference {difference:.2e}")
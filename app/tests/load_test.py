@@ -0,0 +1,218 @@
+"""
+Load test for the analysis pipeline: simulated concurrent sessions against a local
+fixture price provider, so no network is needed.
+
+    python -m app.tests.load_test --sessions 8 --requests 3
+    python -m app.tests.load_test --soak --sessions 2 --rounds 10
+"""
+import os
+import gc
+import time
+import argparse
+import resource
+import tempfile
+import threading
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from app.config.config import (
+    BENCHMARK_TICKER, MAX_TICKERS, LOAD_TEST_SESSIONS, LOAD_TEST_REQUESTS_PER_SESSION,
+    LOAD_TEST_UNIVERSE_SIZE, SOAK_ROUNDS, SOAK_RSS_GROWTH_THRESHOLD_MB
+)
+from app.data.downloader import FixturePriceSource, set_default_price_source
+from app.pipeline.analysis_pipeline import run_analysis
+from app.ui.result_sections import ResultSections
+from main import add_result_sections
+
+
+def fixture_universe(num_tickers=LOAD_TEST_UNIVERSE_SIZE, end_date=None, years=12, seed=0):
+    """Correlated random-walk prices for a synthetic universe plus the benchmark"""
+    end_date = end_date or date.today()
+    index = pd.bdate_range(end_date - timedelta(days=years * 365), end_date)
+    rng = np.random.default_rng(seed)
+    market = rng.normal(0.0003, 0.01, size=(len(index), 1))
+    betas = rng.uniform(0.5, 1.5, size=num_tickers)
+    asset_returns = market * betas + rng.normal(0.0001, 0.012, size=(len(index), num_tickers))
+    returns = np.hstack([asset_returns, market])
+    columns = [f"FIX{i:03d}" for i in range(num_tickers)] + [BENCHMARK_TICKER]
+    return pd.DataFrame(100 * np.exp(np.cumsum(returns, axis=0)), index=index, columns=columns)
+
+
+def current_rss_mb():
+    """Resident set size of this process in MB"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError):
+        # No procfs: fall back to the lifetime peak (KB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if peak > 2 ** 32 else peak / 2 ** 10
+
+
+class RssSampler:
+    """Background thread recording the peak RSS while a run is in progress"""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak = current_rss_mb()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self.stopped.wait(self.interval):
+            self.peak = max(self.peak, current_rss_mb())
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
+        self.peak = max(self.peak, current_rss_mb())
+
+
+def simulate_session(session_id, tickers_universe, num_requests, render=True, seed=None):
+    """
+    One simulated user: pick a random ticker set and weights, submit, then edit the
+    weights and resubmit num_requests - 1 times. Returns (latencies, errors).
+    """
+    rng = np.random.default_rng(seed)
+    num_tickers = int(rng.integers(2, MAX_TICKERS + 1))
+    tickers = list(rng.choice(tickers_universe, size=num_tickers, replace=False))
+    weights = rng.dirichlet(np.ones(num_tickers))
+
+    latencies = []
+    errors = []
+    for _ in range(num_requests):
+        start = time.perf_counter()
+        try:
+            result = run_analysis(tickers, list(weights), num_tickers, float(rng.integers(1, 100)) * 1000,
+                                  date.today(), 'total_return', {})
+            if render:
+                sections = ResultSections()
+                add_result_sections(sections)
+                sections.update(result['values'])
+            errors.extend(f"session {session_id}: {stage}: {error}" for stage, error in result['errors'].items())
+        except Exception as error:
+            errors.append(f"session {session_id}: {error}")
+        latencies.append(time.perf_counter() - start)
+
+        # Edit the weights the way a user would: nudge them and renormalise
+        weights = np.abs(weights + rng.normal(0, 0.05, size=num_tickers))
+        weights = weights / weights.sum()
+    return latencies, errors
+
+
+def run_load_test(num_sessions=LOAD_TEST_SESSIONS, requests_per_session=LOAD_TEST_REQUESTS_PER_SESSION,
+                  universe=None, render=True, seed=0):
+    """
+    Run num_sessions concurrent sessions and report throughput, latency percentiles,
+    CPU and memory. CPU and RSS are measured for the whole process, as in a Streamlit
+    server where sessions share one process, and divided across sessions.
+    """
+    universe = fixture_universe(seed=seed) if universe is None else universe
+    set_default_price_source(FixturePriceSource(universe))
+    tickers_universe = [ticker for ticker in universe.columns if ticker != BENCHMARK_TICKER]
+    seeds = np.random.SeedSequence(seed).spawn(num_sessions)
+
+    gc.collect()
+    baseline_rss = current_rss_mb()
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    with RssSampler() as sampler, ThreadPoolExecutor(max_workers=num_sessions) as executor:
+        results = list(executor.map(
+            lambda args: simulate_session(args[0], tickers_universe, requests_per_session, render, args[1]),
+            enumerate(seeds)
+        ))
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    latencies = np.array([latency for session, _ in results for latency in session])
+    errors = [error for _, session_errors in results for error in session_errors]
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        'sessions': num_sessions,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'error_messages': errors,
+        'wall_seconds': wall,
+        'throughput_per_second': len(latencies) / wall,
+        'latency_p50': p50,
+        'latency_p95': p95,
+        'latency_p99': p99,
+        'cpu_seconds': cpu,
+        'cpu_seconds_per_request': cpu / len(latencies),
+        'cpu_utilisation': cpu / wall / (os.cpu_count() or 1),
+        'baseline_rss_mb': baseline_rss,
+        'peak_rss_mb': sampler.peak,
+        'peak_rss_per_session_mb': (sampler.peak - baseline_rss) / num_sessions,
+        'open_figures': len(plt.get_fignums())
+    }
+
+
+def run_soak_test(num_sessions=LOAD_TEST_SESSIONS, rounds=SOAK_ROUNDS,
+                  requests_per_session=LOAD_TEST_REQUESTS_PER_SESSION, render=True,
+                  growth_threshold_mb=SOAK_RSS_GROWTH_THRESHOLD_MB, seed=0):
+    """
+    Repeat the load test and watch memory settle. RSS after a full collection is
+    recorded every round; a steady upward slope, or matplotlib figures that stay
+    open between rounds, is reported as a suspected leak.
+    """
+    universe = fixture_universe(seed=seed)
+    rounds_report = []
+    for round_number in range(rounds):
+        report = run_load_test(num_sessions, requests_per_session, universe, render, seed + round_number)
+        gc.collect()
+        rounds_report.append({
+            'round': round_number,
+            'rss_mb': current_rss_mb(),
+            'open_figures': len(plt.get_fignums()),
+            'latency_p50': report['latency_p50'],
+            'errors': report['errors']
+        })
+    rounds_report = pd.DataFrame(rounds_report).set_index('round')
+
+    # Skip the first round, which pays for imports, caches and compilation
+    settled = rounds_report.iloc[1:] if len(rounds_report) > 2 else rounds_report
+    growth = np.polyfit(settled.index, settled['rss_mb'], 1)[0] if len(settled) > 1 else 0.0
+    figures_growing = rounds_report['open_figures'].iloc[-1] > rounds_report['open_figures'].iloc[0]
+    return {
+        'rounds': rounds_report,
+        'rss_growth_mb_per_round': growth,
+        'open_figures': int(rounds_report['open_figures'].iloc[-1]),
+        'leak_suspected': bool(growth > growth_threshold_mb or figures_growing)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the RoboPort analysis pipeline')
+    parser.add_argument('--sessions', type=int, default=LOAD_TEST_SESSIONS)
+    parser.add_argument('--requests', type=int, default=LOAD_TEST_REQUESTS_PER_SESSION, help='requests per session')
+    parser.add_argument('--soak', action='store_true', help='repeat rounds and check for memory growth')
+    parser.add_argument('--rounds', type=int, default=SOAK_ROUNDS)
+    parser.add_argument('--no-render', action='store_true', help='skip drawing the result charts')
+    parser.add_argument('--workdir', default=None, help='directory for the on-disk caches (default: a temporary one)')
+    args = parser.parse_args()
+
+    # Keep the fixture data out of the real price and optimisation caches
+    os.chdir(args.workdir or tempfile.mkdtemp(prefix='roboport_load_test_'))
+
+    if args.soak:
+        report = run_soak_test(args.sessions, args.rounds, args.requests, not args.no_render)
+        print(report['rounds'])
+        print(f"RSS growth: {report['rss_growth_mb_per_round']:.2f} MB/round, "
+              f"open figures: {report['open_figures']}, leak suspected: {report['leak_suspected']}")
+    else:
+        report = run_load_test(args.sessions, args.requests, render=not args.no_render)
+        for message in report.pop('error_messages')[:10]:
+            print(message)
+        print(pd.Series(report).to_string())
+
+
+if __name__ == '__main__':
+    main()
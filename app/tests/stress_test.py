@@ -0,0 +1,46 @@
+"""
+Check that historical stress scenarios report assets without data in a window as
+uncovered (NaN loss) instead of a 0% loss, using fixture prices for tickers that
+listed after some of the windows.
+
+    python -m app.tests.stress_test
+"""
+import numpy as np
+import pandas as pd
+from app.analysis.stress_testing import build_historical_scenarios, run_stress_tests
+
+
+def late_listing_loader(listing_dates, end_date='2024-12-31', seed=0):
+    """Price loader serving random-walk prices for each ticker from its listing date"""
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(min(listing_dates.values()), end_date)
+    prices = pd.DataFrame(100 * np.exp(np.cumsum(rng.normal(0, 0.01, (len(index), len(listing_dates))), axis=0)),
+                          index=index, columns=list(listing_dates))
+    for ticker, listed in listing_dates.items():
+        prices.loc[prices.index < pd.Timestamp(listed), ticker] = np.nan
+
+    def loader(tickers, start, end):
+        return prices.loc[(prices.index >= start) & (prices.index <= end), tickers].dropna(how='all')
+    return loader
+
+
+def check_late_listing():
+    """Both assets listed after 2008 and one after 2020; returns the stress results"""
+    listing_dates = {'OLD': '2015-01-02', 'NEW': '2021-01-04'}
+    scenarios = build_historical_scenarios(list(listing_dates), price_loader=late_listing_loader(listing_dates))
+    results = run_stress_tests({'Equal': [0.5, 0.5]}, scenarios)
+
+    crisis = results.loc[('2008 Financial Crisis', 'Equal')]
+    assert not scenarios['coverage'].loc['2008 Financial Crisis'].any(), "2008 window has no data for either asset"
+    assert crisis['covered_weight'] == 0.0 and np.isnan(crisis['loss']), f"2008 reported as covered: {crisis.to_dict()}"
+
+    covid = results.loc[('COVID-19 Crash (Mar 2020)', 'Equal')]
+    assert covid['covered_weight'] == 0.5 and np.isfinite(covid['loss']), f"2020 coverage wrong: {covid.to_dict()}"
+
+    rates = results.loc[('2022 Rate Shock', 'Equal')]
+    assert rates['covered_weight'] == 1.0 and np.isfinite(rates['loss']), f"2022 coverage wrong: {rates.to_dict()}"
+    return results
+
+
+if __name__ == '__main__':
+    print(check_late_listing().to_string())
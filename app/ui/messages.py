@@ -0,0 +1,25 @@
+import logging
+import streamlit as st
+
+
+class StreamlitMessageHandler(logging.Handler):
+    """Show warnings and errors logged by the core modules (app.*) on the page"""
+
+    def emit(self, record):
+        message = self.format(record)
+        if record.levelno >= logging.ERROR:
+            st.error(message)
+        else:
+            st.warning(message)
+
+
+def show_core_messages(logger_name='app'):
+    """
+    Route the core modules' log warnings to the page. Safe to call on every rerun; the
+    handler is added once. Worker threads need the script context (see main.py) for
+    their messages to appear.
+    """
+    logger = logging.getLogger(logger_name)
+    if not any(isinstance(handler, StreamlitMessageHandler) for handler in logger.handlers):
+        handler = StreamlitMessageHandler(level=logging.WARNING)
+        logger.addHandler(handler)
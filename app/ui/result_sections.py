@@ -0,0 +1,41 @@
+import time
+import streamlit as st
+
+
+class ResultSections:
+    """
+    Ordered page sections, each with a placeholder reserved up front and drawn as soon as
+    the values it needs are available. Lets results appear as their pipeline stages
+    finish while keeping the page in a fixed order.
+    """
+
+    def __init__(self):
+        self.sections = []
+        self.placeholders = {}
+        self.rendered = {}
+        self.start = time.perf_counter()
+
+    def add(self, name, requires, render):
+        """Reserve a placeholder for a section drawn by render(values) once every required value exists"""
+        self.sections.append((name, list(requires), render))
+        self.placeholders[name] = st.empty()
+
+    def placeholder(self, name):
+        return self.placeholders[name]
+
+    def update(self, values):
+        """Draw every section whose values are now available"""
+        for name, requires, render in self.sections:
+            if name in self.rendered or not all(value in values for value in requires):
+                continue
+            with self.placeholders[name].container():
+                render(values)
+            self.rendered[name] = time.perf_counter() - self.start
+
+    def time_to_first_result(self):
+        """Seconds from creation until the first section was drawn (None if nothing was drawn)"""
+        return min(self.rendered.values()) if self.rendered else None
+
+    def render_times(self):
+        """Seconds from creation until each drawn section appeared"""
+        return dict(self.rendered)
@@ -1,5 +1,11 @@
+import re
 import streamlit as st
-from app.config.config import MIN_TICKERS, MAX_TICKERS, DEFAULT_TICKERS
+from app.config.config import (
+    MIN_TICKERS, MAX_TICKERS, DEFAULT_TICKERS, DEFAULT_RANKING_METRIC, ROLLING_WINDOW, ROLLING_WINDOWS,
+    INTRADAY_FREQUENCY, INTRADAY_FREQUENCIES, INTRADAY_LOOKBACK_DAYS, TRADING_DAYS_PER_YEAR, PROFILE_QUERY_PARAM
+)
+import numpy as np
+from app.analysis.risk_metrics import METRIC_HIGHER_IS_BETTER
 from app.utils.utils import is_valid_ticker
 
 
@@ -42,6 +48,112 @@ def get_ticker_inputs():
     return ticker_percentage, num_tickers, invalid_tickers
 
 
+def get_ranking_metric():
+    """Get the metric used to rank strategies from user"""
+    metrics = list(METRIC_HIGHER_IS_BETTER)
+    return st.selectbox('Rank strategies by:', metrics, index=metrics.index(DEFAULT_RANKING_METRIC))
+
+
+def get_rolling_window():
+    """Get the rolling analytics window (trading days) from user"""
+    labels = list(ROLLING_WINDOWS)
+    default = list(ROLLING_WINDOWS.values()).index(ROLLING_WINDOW) if ROLLING_WINDOW in ROLLING_WINDOWS.values() else 0
+    return ROLLING_WINDOWS[st.selectbox('Rolling analytics window:', labels, index=default)]
+
+
+def get_intraday_inputs():
+    """Get the intraday mode switch, bar frequency and lookback from user"""
+    with st.expander('Intraday mode'):
+        enabled = st.checkbox('Analyse intraday bars instead of daily prices', value=False)
+        frequency = st.selectbox('Bar frequency:', INTRADAY_FREQUENCIES, index=INTRADAY_FREQUENCIES.index(INTRADAY_FREQUENCY))
+        lookback_days = st.number_input('Lookback (days):', min_value=1, max_value=3650, value=INTRADAY_LOOKBACK_DAYS, step=1)
+    return enabled, frequency, int(lookback_days)
+
+
+def get_constraint_inputs():
+    """Get optional Markowitz constraints (position bounds, group caps, turnover) from user"""
+    with st.expander('Optimization constraints'):
+        min_weight = st.number_input('Minimum weight per ticker (%):', min_value=0.0, max_value=100.0, value=0.0)
+        max_weight = st.number_input('Maximum weight per ticker (%):', min_value=0.0, max_value=100.0, value=100.0)
+        max_turnover = st.number_input('Maximum turnover from current weights (%, 0 for no limit):', min_value=0.0, max_value=200.0, value=0.0)
+        max_assets = st.number_input('Maximum number of tickers (0 for no limit):', min_value=0, max_value=MAX_TICKERS, value=0, step=1)
+        group_text = st.text_area('Group caps, one per line (e.g. "Tech: AAPL, MSFT <= 40"):')
+
+    group_caps = {}
+    for line in group_text.splitlines():
+        if ':' not in line or '<=' not in line:
+            continue
+        name, rest = line.split(':', 1)
+        members, cap = rest.split('<=', 1)
+        try:
+            cap = float(cap.strip().rstrip('%')) / 100
+        except ValueError:
+            st.warning(f"Ignoring group cap '{line.strip()}': the cap must be a percentage.")
+            continue
+        group_caps[name.strip()] = ([m.strip().upper() for m in members.split(',') if m.strip()], cap)
+
+    return {
+        'min_weights': min_weight / 100,
+        'max_weights': max_weight / 100,
+        'group_caps': group_caps,
+        'max_turnover': max_turnover / 100 if max_turnover > 0 else None,
+        'max_assets': int(max_assets) if max_assets > 0 else None
+    }
+
+
+def get_black_litterman_views():
+    """Get Black-Litterman views (annual returns in %, optional confidence in %) from user"""
+    with st.expander('Black-Litterman views'):
+        view_text = st.text_area('Views, one per line (e.g. "AAPL > MSFT 2" for AAPL outperforms MSFT by 2% a year, '
+                                 '"AAPL 8" for AAPL returns 8% a year, add "@ 70" for 70% confidence):')
+
+    pattern = re.compile(r'^\s*([\w.^=-]+)\s*(?:>\s*([\w.^=-]+)\s+)?(-?[\d.]+)\s*%?\s*(?:@\s*([\d.]+)\s*%?)?\s*$')
+    views = []
+    for line in view_text.splitlines():
+        match = pattern.match(line)
+        if not match:
+            continue
+        outperformer, underperformer, view_return, confidence = match.groups()
+        assets = {outperformer.upper(): 1.0}
+        if underperformer:
+            assets[underperformer.upper()] = -1.0
+        view = {'assets': assets, 'return': float(view_return)}
+        if confidence:
+            view['confidence'] = float(confidence) / 100
+        views.append(view)
+    return views
+
+
+def get_frontier_target(frontier):
+    """
+    Get a target annual volatility or return (in %) on the efficient frontier from user.
+    Returns which axis was picked ('volatility' or 'returns') and the per-day target.
+    """
+    by = st.radio('Target:', ['Volatility', 'Return'], horizontal=True)
+    if by == 'Volatility':
+        scale, axis = 100 * np.sqrt(TRADING_DAYS_PER_YEAR), 'volatility'
+    else:
+        scale, axis = 100 * TRADING_DAYS_PER_YEAR, 'returns'
+    low, high = float(frontier[axis][0] * scale), float(frontier[axis][-1] * scale)
+    if high - low < 0.01:
+        return axis, frontier[axis][0]
+    target = st.slider(f"Target annual {by.lower()} (%)", min_value=round(low, 2), max_value=round(high, 2),
+                       value=round((low + high) / 2, 2), step=0.01)
+    return axis, target / scale
+
+
+def get_profiling_toggle():
+    """Debug switch that profiles the following requests (read by profiling_requested on the next run)"""
+    with st.expander('Debug'):
+        st.checkbox('Profile this request', key='profile_request',
+                    help=f"Or open the app with ?{PROFILE_QUERY_PARAM}=1. Profiles are saved as flame graphs.")
+
+
+def profiling_requested():
+    """Whether this run should be profiled: ?profile=1 in the URL or the debug switch"""
+    return st.query_params.get(PROFILE_QUERY_PARAM) in ('1', 'true') or st.session_state.get('profile_request', False)
+
+
 def display_ticker_weights(ticker_percentage):
     """Display entered ticker weights"""
     for ticker, percentage in ticker_percentage.items():
@@ -0,0 +1,185 @@
+"""
+Sampling profiler for single requests: a background thread records the Python stack
+of the request's thread (and of the pipeline workers that register with it) every
+PROFILE_INTERVAL_SECONDS. Samples are aggregated into collapsed stacks ("a;b;c count",
+as read by flamegraph.pl and speedscope) and a self-contained HTML flame graph, kept
+in PROFILE_DIR as a ring buffer of the last PROFILE_MAX_PROFILES profiles.
+
+Nothing runs unless a profiler is started, so requests without profiling pay nothing.
+"""
+import os
+import sys
+import html
+import zlib
+import threading
+import concurrent.futures.thread
+from collections import Counter
+from datetime import datetime
+from app.config.config import PROFILE_INTERVAL_SECONDS, PROFILE_DIR, PROFILE_MAX_PROFILES, PROFILE_MIN_FRACTION
+
+FRAME_HEIGHT = 17
+
+# A pool worker whose innermost frame is its loop is waiting for work, not working
+IDLE_CODE = {concurrent.futures.thread._worker.__code__}
+
+
+class SamplingProfiler:
+    """Samples the stacks of the thread that starts it and of every thread that calls add_current_thread()"""
+
+    def __init__(self, interval=PROFILE_INTERVAL_SECONDS, profile_dir=PROFILE_DIR, max_profiles=PROFILE_MAX_PROFILES):
+        self.interval = interval
+        self.profile_dir = profile_dir
+        self.max_profiles = max_profiles
+        self.stacks = Counter()
+        self.tags = {}
+        self.num_samples = 0
+        self.threads = {}
+        self.labels = {}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.sampler = None
+        self.started = None
+        self.duration = 0.0
+
+    def add_current_thread(self, role='worker'):
+        """Sample the calling thread too (e.g. from a pipeline worker initializer), under the given root name"""
+        with self.lock:
+            self.threads[threading.get_ident()] = role
+
+    def tag(self, **tags):
+        """Attach request details (ticker count, window length, ...) to the profile"""
+        self.tags.update(tags)
+
+    def start(self):
+        self.add_current_thread('main')
+        self.started = datetime.now()
+        self.sampler = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self.sampler.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.sampler.join()
+        self.duration = (datetime.now() - self.started).total_seconds()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+        return False
+
+    def _label(self, code):
+        """Frame name as 'function (file:line)', cached per code object"""
+        label = self.labels.get(code)
+        if label is None:
+            path = code.co_filename.replace(os.sep, '/').split('/')
+            label = f"{code.co_name} ({'/'.join(path[-2:])}:{code.co_firstlineno})".replace(';', ':')
+            self.labels[code] = label
+        return label
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            frames = sys._current_frames()
+            with self.lock:
+                threads = list(self.threads.items())
+            for ident, role in threads:
+                frame = frames.get(ident)
+                if frame is None or frame.f_code in IDLE_CODE:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(role)
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.num_samples += 1
+
+    def collapsed(self):
+        """Samples in collapsed-stack format, one 'frame;frame;frame count' line per distinct stack"""
+        return ''.join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+    def save(self):
+        """Write the collapsed stacks and the flame graph, drop the oldest profiles beyond max_profiles; returns the HTML path"""
+        os.makedirs(self.profile_dir, exist_ok=True)
+        name = self.started.strftime('%Y%m%d-%H%M%S-%f')
+        name += ''.join(f"_{value}{key}" for key, value in self.tags.items())
+        stem = os.path.join(self.profile_dir, name)
+        with open(f"{stem}.collapsed", 'w') as f:
+            f.write(self.collapsed())
+        title = f"Profile {self.started:%Y-%m-%d %H:%M:%S}: " + ', '.join(f"{key} {value}" for key, value in self.tags.items())
+        with open(f"{stem}.html", 'w') as f:
+            f.write(flame_graph_html(self.stacks, title, f"{self.num_samples} samples every {self.interval * 1000:.0f}ms "
+                                                         f"over {self.duration:.2f}s"))
+        prune_profiles(self.profile_dir, self.max_profiles)
+        return f"{stem}.html"
+
+
+def prune_profiles(profile_dir=PROFILE_DIR, max_profiles=PROFILE_MAX_PROFILES):
+    """Delete the oldest profiles so at most max_profiles remain"""
+    stems = sorted(file_name[:-len('.collapsed')] for file_name in os.listdir(profile_dir) if file_name.endswith('.collapsed'))
+    for stem in stems[:max(len(stems) - max_profiles, 0)]:
+        for extension in ('.collapsed', '.html'):
+            try:
+                os.remove(os.path.join(profile_dir, stem + extension))
+            except FileNotFoundError:
+                pass  # removed by a concurrent request
+
+
+def _frame_tree(stacks):
+    """Merge collapsed stacks into a tree of {name: [count, children]}"""
+    root = [0, {}]
+    for stack, count in stacks.items():
+        root[0] += count
+        node = root
+        for name in stack.split(';'):
+            node = node[1].setdefault(name, [0, {}])
+            node[0] += count
+    return root
+
+
+def _frame_colour(name):
+    """Stable warm colour per function"""
+    value = zlib.crc32(name.encode())
+    return f"rgb({205 + value % 50},{(value >> 8) % 180 + 50},{(value >> 16) % 55})"
+
+
+def flame_graph_html(stacks, title, subtitle='', min_fraction=PROFILE_MIN_FRACTION):
+    """
+    Self-contained HTML flame graph of collapsed stacks (roots at the bottom, width in
+    proportion to samples). Frames below min_fraction of the samples are left out;
+    hovering a frame shows its name, sample count and share.
+    """
+    root = _frame_tree(stacks)
+    total = max(root[0], 1)
+    rects = []
+    depth_reached = 0
+
+    def visit(children, depth, offset):
+        nonlocal depth_reached
+        for name, (count, grandchildren) in sorted(children.items()):
+            if count / total >= min_fraction:
+                depth_reached = max(depth_reached, depth)
+                rects.append((depth, offset / total, count / total, name, count))
+                visit(grandchildren, depth + 1, offset)
+            offset += count
+
+    visit(root[1], 0, 0)
+    height = (depth_reached + 1) * FRAME_HEIGHT
+    body = []
+    for depth, x, width, name, count in rects:
+        y = height - (depth + 1) * FRAME_HEIGHT
+        label = html.escape(name)
+        body.append(
+            f'<svg x="{x * 100:.4f}%" y="{y}" width="{width * 100:.4f}%" height="{FRAME_HEIGHT - 1}">'
+            f'<title>{label} ({count} samples, {width:.1%})</title>'
+            f'<rect width="100%" height="100%" fill="{_frame_colour(name)}"/>'
+            f'<text x="3" y="12">{label}</text></svg>'
+        )
+    return (
+        '<!DOCTYPE html>\n<html><head><meta charset="utf-8">'
+        f'<title>{html.escape(title)}</title>'
+        '<style>body{font-family:sans-serif;margin:12px}svg text{font-size:11px;font-family:monospace}</style>'
+        f'</head><body><h3>{html.escape(title)}</h3><p>{html.escape(subtitle)}</p>'
+        f'<svg width="100%" height="{height}">{"".join(body)}</svg></body></html>\n'
+    )
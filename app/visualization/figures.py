@@ -0,0 +1,160 @@
+from matplotlib.figure import Figure
+
+from app.config.config import (
+    PLOT_FIGURE_SIZE, PLOT_FONT_SIZE, STANDARD_FIGURE_SIZE, ROLLING_PLOT_MAX_POINTS
+)
+
+# Series with more lines than this are drawn without a legend
+MAX_LEGEND_ENTRIES = 12
+
+
+# Figures are built with the object-oriented API rather than pyplot, so they are not
+# registered with pyplot (nothing to close), can be built from several threads at
+# once and render with the non-interactive Agg backend in worker processes.
+
+
+def pie_chart_figure(weights, labels, threshold=1e-2):
+    """Pie chart of portfolio weights, leaving out weights below threshold to avoid label overlap"""
+    filtered_weights = []
+    filtered_labels = []
+
+    for w, la in zip(weights, labels):
+        if w >= threshold:
+            filtered_weights.append(w)
+            filtered_labels.append(la)
+
+    fig = Figure()
+    ax = fig.subplots()
+    ax.pie(filtered_weights, labels=filtered_labels, autopct='%1.1f%%', startangle=90)
+    ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
+    return fig
+
+
+def historical_prices_figure(prices):
+    """Historical prices of every ticker"""
+    fig = Figure(figsize=STANDARD_FIGURE_SIZE)
+    ax = fig.subplots()
+    for column in prices.columns:
+        ax.plot(prices.index, prices[column], label=column)
+    ax.set_xlabel('Date')
+    ax.set_ylabel('Price')
+    ax.set_title('Historic Prices for the past year')
+    ax.legend()
+    return fig
+
+
+def daily_returns_figure(daily_returns):
+    """Daily returns of every ticker"""
+    fig = Figure(figsize=STANDARD_FIGURE_SIZE)
+    ax = fig.subplots()
+    for column in daily_returns.columns:
+        ax.plot(daily_returns.index, daily_returns[column], label=column)
+    ax.set_xlabel('Date')
+    ax.set_ylabel('Percentage Change')
+    ax.set_title('Percentage Change of Daily Returns')
+    ax.legend()
+    return fig
+
+
+def portfolio_returns_figure(port_daily_return):
+    """Portfolio daily returns"""
+    fig = Figure(figsize=STANDARD_FIGURE_SIZE)
+    ax = fig.subplots()
+    ax.plot(port_daily_return.index, port_daily_return, label='Portfolio Returns')
+    ax.set_xlabel('Date')
+    ax.set_ylabel('Portfolio Returns')
+    ax.set_title('Portfolio Returns Over Time')
+    ax.legend()
+    return fig
+
+
+def portfolio_evolution_figure(portfolio_value, title):
+    """Portfolio value evolution"""
+    fig = Figure(figsize=PLOT_FIGURE_SIZE)
+    ax = fig.subplots()
+    ax.set_title(title, fontsize=PLOT_FONT_SIZE)
+    ax.plot(portfolio_value["Profit Close"], color='blue')
+    ax.set_xlabel('Date', fontsize=PLOT_FONT_SIZE)
+    ax.set_ylabel('Value in $', fontsize=PLOT_FONT_SIZE)
+    return fig
+
+
+def sharpe_ratio_scatter_figure(test_volatility, test_return, sharpratio, max_sharpratio):
+    """Random portfolios coloured by Sharpe ratio, with the best one in black"""
+    fig = Figure(figsize=PLOT_FIGURE_SIZE)
+    ax = fig.subplots()
+    points = ax.scatter(test_volatility, test_return, c=sharpratio)
+    ax.set_xlabel('Volatility')
+    ax.set_ylabel('Return')
+    fig.colorbar(points, ax=ax, label='Sharpe Ratio')
+    ax.scatter(test_volatility[max_sharpratio], test_return[max_sharpratio], c='black')
+    return fig
+
+
+def efficient_frontier_figure(test_volatility, test_return, sharpratio, max_sharpratio, optimal_volatility, returns):
+    """Efficient frontier over the random portfolios"""
+    fig = Figure(figsize=PLOT_FIGURE_SIZE)
+    ax = fig.subplots()
+    points = ax.scatter(test_volatility, test_return, c=sharpratio)
+    ax.set_xlabel('volatility', fontsize=PLOT_FONT_SIZE)
+    ax.set_ylabel('return', fontsize=PLOT_FONT_SIZE)
+    fig.colorbar(points, ax=ax, label='Sharpe Ratio')
+    ax.scatter(test_volatility[max_sharpratio], test_return[max_sharpratio], c='black')
+    ax.plot(optimal_volatility, returns, '--')
+    return fig
+
+
+def resampled_frontier_figure(markowitz_volatility, markowitz_returns, resampled_data):
+    """Resampled frontier with its dispersion bands against the single-sample frontier"""
+    fig = Figure(figsize=PLOT_FIGURE_SIZE)
+    ax = fig.subplots()
+    ax.plot(markowitz_volatility, markowitz_returns, '--', label='Efficient Frontier')
+    ax.plot(resampled_data['volatility'], resampled_data['returns'], color='blue', label='Resampled Frontier')
+    ax.fill_between(resampled_data['volatility'], resampled_data['returns_lower'], resampled_data['returns_upper'],
+                    color='blue', alpha=0.2, label='Resample Return Band')
+    ax.fill_betweenx(resampled_data['returns'], resampled_data['volatility_lower'], resampled_data['volatility_upper'],
+                     color='orange', alpha=0.2, label='Resample Volatility Band')
+    ax.scatter(resampled_data['volatility'][resampled_data['max_sharpratio']],
+               resampled_data['returns'][resampled_data['max_sharpratio']], c='black', label='Max Sharpe Ratio')
+    ax.set_xlabel('Volatility', fontsize=PLOT_FONT_SIZE)
+    ax.set_ylabel('Return', fontsize=PLOT_FONT_SIZE)
+    ax.legend()
+    ax.set_title("Resampled Efficient Frontier")
+    return fig
+
+
+def downsample(frame, max_points=ROLLING_PLOT_MAX_POINTS):
+    """Every k-th row of a long Series or DataFrame (always keeping the last) so at most max_points are drawn"""
+    if max_points is None or len(frame) <= max_points:
+        return frame
+    stride = -(-len(frame) // max_points)
+    positions = list(range(0, len(frame) - 1, stride)) + [len(frame) - 1]
+    return frame.iloc[positions]
+
+
+def rolling_metric_figure(frame, title, ylabel, max_points=ROLLING_PLOT_MAX_POINTS):
+    """One line per column of a rolling metric, downsampled to at most max_points per line"""
+    frame = downsample(frame, max_points)
+    fig = Figure(figsize=STANDARD_FIGURE_SIZE)
+    ax = fig.subplots()
+    for column in frame.columns:
+        ax.plot(frame.index, frame[column], label=column, linewidth=1)
+    ax.set_xlabel('Date')
+    ax.set_ylabel(ylabel)
+    ax.set_title(title)
+    if 0 < len(frame.columns) <= MAX_LEGEND_ENTRIES:
+        ax.legend()
+    return fig
+
+
+def correlation_heatmap_figure(correlation, labels, title):
+    """Heatmap of one correlation matrix"""
+    fig = Figure(figsize=STANDARD_FIGURE_SIZE)
+    ax = fig.subplots()
+    image = ax.imshow(correlation, cmap='RdBu_r', vmin=-1, vmax=1)
+    if len(labels) <= MAX_LEGEND_ENTRIES * 2:
+        ax.set_xticks(range(len(labels)), labels=labels, rotation=90)
+        ax.set_yticks(range(len(labels)), labels=labels)
+    fig.colorbar(image, ax=ax, label='Correlation')
+    ax.set_title(title)
+    return fig
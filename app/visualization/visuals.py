@@ -96,3 +96,22 @@ def plot_efficient_frontier(test_volatility, test_return, sharpratio, max_sharpr
     plt.legend()
     plt.title("Efficient Frontier")
     plt.show()
+
+
+
+def plot_resampled_frontier(markowitz_volatility, markowitz_returns, resampled_data):
+    """Plot the resampled frontier with its dispersion bands against the single-sample frontier"""
+    plt.figure(figsize=PLOT_FIGURE_SIZE)
+    plt.plot(markowitz_volatility, markowitz_returns, '--', label='Efficient Frontier')
+    plt.plot(resampled_data['volatility'], resampled_data['returns'], color='blue', label='Resampled Frontier')
+    plt.fill_between(resampled_data['volatility'], resampled_data['returns_lower'], resampled_data['returns_upper'],
+                     color='blue', alpha=0.2, label='Resample Return Band')
+    plt.fill_betweenx(resampled_data['returns'], resampled_data['volatility_lower'], resampled_data['volatility_upper'],
+                      color='orange', alpha=0.2, label='Resample Volatility Band')
+    plt.scatter(resampled_data['volatility'][resampled_data['max_sharpratio']],
+                resampled_data['returns'][resampled_data['max_sharpratio']], c='black', label='Max Sharpe Ratio')
+    plt.xlabel('Volatility', fontsize=PLOT_FONT_SIZE)
+    plt.ylabel('Return', fontsize=PLOT_FONT_SIZE)
+    plt.legend()
+    plt.title("Resampled Efficient Frontier")
+    plt.show()
\ No newline at end of file
@@ -1,38 +1,376 @@
+import os
+import time
+import logging
+import queue
+import threading
 import streamlit as st
-from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 # Import custom modules
-from app.config.config import HISTORICAL_PERIOD_DAYS, BENCHMARK_TICKER, PORTFOLIO_EVOLUTION_YEARS
+from app.config.config import (
+    BENCHMARK_TICKER, TRADING_DAYS_PER_YEAR, HISTORICAL_PERIOD_DAYS, CVAR_CONFIDENCE, PROGRESSIVE_RESULTS, PROGRESSIVE_POLL_SECONDS, ADAPTIVE_COMPUTE_BUDGET,
+    SNAPSHOT_AUTOSAVE
+)
 from app.ui.ui_components import (
-    display_header, get_portfolio_amount, get_ticker_inputs, 
+    display_header, get_portfolio_amount, get_ticker_inputs,
     display_ticker_weights, display_section_header, display_dataframe,
-    display_percentage_return, display_recommendation
-)
-from app.data.data_loader import get_historical_prices, get_daily_returns, get_benchmark_data
-from app.calculations.portfolio_calculations import (
-    get_portfolio_returns, calculate_risk_parity_weights, 
-    calculate_beta, calculate_beta_weights
+    display_percentage_return, display_recommendation, get_ranking_metric, display_metric,
+    get_constraint_inputs, get_rolling_window, get_intraday_inputs, get_black_litterman_views, get_frontier_target,
+    get_profiling_toggle, profiling_requested
 )
-from app.calculations.optimization import calculate_sharpe_ratio_optimization, calculate_markowitz_optimization
+from app.ui.result_sections import ResultSections
+from app.ui.messages import show_core_messages
 from app.visualization.visualization import (
     create_pie_chart, plot_historical_prices, plot_daily_returns,
     plot_portfolio_returns, plot_portfolio_evolution, plot_sharpe_ratio_scatter,
-    plot_efficient_frontier
+    plot_efficient_frontier, plot_resampled_frontier, plot_rolling_metric, plot_correlation_heatmap
 )
-from app.analysis.portfolio_analyzer import PortfolioAnalyzer
+from app.pipeline.analysis_pipeline import run_analysis, evolution_value_name, run_intraday_analysis
+from app.calculations.compute_budget import get_compute_budget
+from app.calculations.optimization import frontier_portfolio
+from app.data.snapshots import save_analysis, load_snapshot, list_snapshots, diff_snapshots
+from app.utils.profiler import SamplingProfiler
+
+logger = logging.getLogger(__name__)
+
+
+def display_evolution(portfolio_value, title, return_label, header=None):
+    """Plot a strategy's value evolution and its total return"""
+    if portfolio_value is None:
+        logger.warning(f"No value evolution to display for {title}")
+        return
+    if header:
+        display_section_header(header)
+    plot_portfolio_evolution(portfolio_value, title)
+    profit_close = portfolio_value['Profit Close']
+    display_percentage_return(return_label, (profit_close.iloc[-1] / profit_close.iloc[0]) - 1)
+
+
+def add_evolution_section(sections, strategy_name, title, return_label, header=None):
+    """Reserve the value evolution section of one strategy"""
+    evolution = evolution_value_name(strategy_name)
+    sections.add(evolution, [evolution],
+                 lambda values: display_evolution(values[evolution], title, return_label, header))
+
+
+def add_result_sections(sections):
+    """Reserve every result section of the page, in display order (for the analysed tickers, see run_analysis)"""
+
+    def render_prices(values):
+        prices = values['prices']
+        display_dataframe(prices, "Historic Prices for the past year")
+        if prices is not None:
+            plot_historical_prices(prices)
+        else:
+            st.write("Historical prices not available.")
+
+    def render_daily_returns(values):
+        display_dataframe(values['daily_returns'], "Daily Returns (pct_change)")
+        plot_daily_returns(values['daily_returns'])
+
+    def render_portfolio_returns(values):
+        display_dataframe(values['port_daily_return'], "Portfolio Daily Returns")
+        plot_portfolio_returns(values['port_daily_return'])
+
+    def render_betas(values):
+        display_dataframe(values['betas'], f"Beta Coefficient By Tickers benchmarked with {BENCHMARK_TICKER}")
+        display_dataframe(values['beta_weight'], "Beta weight")
+
+    def render_risk_parity(values):
+        display_dataframe(values['risk_parity_weights'], "Risk Parity Weights")
+        create_pie_chart(values['risk_parity_weights'], values['tickers'], 'Risk Parity (Equally weighted portfolio)')
+
+    def render_sharpe(values):
+        sharpe_data = values['sharpe_data']
+        display_section_header('Sharp Ratio')
+        display_section_header(f"Sharpe ratio of {len(sharpe_data['test_return'])} random weights")
+        plot_sharpe_ratio_scatter(
+            sharpe_data['test_volatility'],
+            sharpe_data['test_return'],
+            sharpe_data['sharpratio'],
+            sharpe_data['max_sharpratio']
+        )
+
+    def render_markowitz(values):
+        sharpe_data = values['sharpe_data']
+        markowitz_data = values['markowitz_data']
+        if values['markowitz_warning']:
+            st.error(values['markowitz_warning'])
+        display_dataframe(pd.Series(values['optimization_cache_metrics'], name='Value'), "Optimization cache")
+        plot_efficient_frontier(
+            sharpe_data['test_volatility'],
+            sharpe_data['test_return'],
+            sharpe_data['sharpratio'],
+            sharpe_data['max_sharpratio'],
+            markowitz_data['optimal_volatility'],
+            markowitz_data['returns']
+        )
+
+    def render_resampled(values):
+        resampled_data = values['resampled_data']
+        if resampled_data is None:
+            return
+        display_section_header(f"Resampled frontier ({resampled_data['num_resamples']} bootstrap resamples)")
+        plot_resampled_frontier(values['markowitz_data']['optimal_volatility'], values['markowitz_data']['returns'],
+                                resampled_data)
+
+    def render_cvar(values):
+        if values['cvar_data'] is None:
+            return
+        display_evolution(values['evolution_cvar'], "Portfolio Value Evolution (10 years) using minimum CVaR",
+                          "Total portfolio return using minimum CVaR", f'Minimum CVaR ({CVAR_CONFIDENCE:.0%}) portfolio')
+        display_dataframe(values['analyzer'].get_strategy_reports(), "Solver report")
+
+    def render_black_litterman(values):
+        black_litterman_data = values['black_litterman_data']
+        if black_litterman_data is None:
+            return
+        display_section_header(f"Black-Litterman portfolio ({black_litterman_data['num_views']} views)")
+        display_dataframe(pd.DataFrame({
+            'Implied annual return': black_litterman_data['implied_returns'] * TRADING_DAYS_PER_YEAR,
+            'Posterior annual return': black_litterman_data['posterior_meanlog'] * TRADING_DAYS_PER_YEAR,
+            'Weight': black_litterman_data['optimal_weight']
+        }), "Implied and posterior returns")
+        low, high = np.percentile(black_litterman_data['scenario_returns'], [5, 95])
+        display_metric(f"Expected annual return over {black_litterman_data['num_scenarios']} view scenarios (5%-95%)",
+                       f"{low:.2%} to {high:.2%}")
+        display_evolution(values['evolution_black_litterman'], "Portfolio Value Evolution (10 years) using Black-Litterman",
+                          "Total portfolio return using Black-Litterman")
+
+    def render_index_tracking(values):
+        index_tracking_data = values['index_tracking_data']
+        if index_tracking_data is None:
+            return
+        tickers = values['tickers']
+        display_section_header(f"Index tracking basket ({index_tracking_data['num_assets']} of {len(tickers)} tickers "
+                               f"replicating {index_tracking_data['index']})")
+        weights = pd.Series(index_tracking_data['optimal_weight'], index=tickers, name='Weight')
+        display_dataframe(weights[weights > 0].sort_values(ascending=False), "Basket weights")
+        display_metric("Tracking error (annualised, estimation window)", f"{index_tracking_data['tracking_error']:.2%}")
+        display_metric("Solve time", f"{index_tracking_data['solve_time'] * 1000:.1f} ms "
+                                     f"({index_tracking_data['iterations']} iterations)")
+        display_evolution(values['evolution_index_tracking'], "Portfolio Value Evolution (10 years) using index tracking",
+                          "Total portfolio return using index tracking")
+
+    def render_factor_exposures(values):
+        exposures = values['factor_exposures']
+        if exposures is None:
+            return
+        display_section_header(f"Factor exposures ({', '.join(exposures['betas'].columns)})")
+        summary = exposures['betas'].join([exposures['alpha'], exposures['r_squared'], exposures['residual_volatility']])
+        display_dataframe(summary, "Betas, annualised alpha, R squared and residual volatility")
+        display_dataframe(exposures['t_stats'], "t-statistics")
+        rolling = exposures['rolling']
+        if len(rolling['index']):
+            plot_rolling_metric(rolling['r_squared'], f"Rolling R squared ({values['rolling_window']}-day window)", 'R squared')
+
+    def render_stress_tests(values):
+        display_dataframe(values['stress_results'], "Stress tests by scenario and strategy")
+        coverage = values.get('stress_coverage')
+        if coverage is None:
+            return
+        for scenario, covered in coverage.iterrows():
+            if not covered.all():
+                st.caption(f"{scenario}: no data for {', '.join(covered.index[~covered.to_numpy(dtype=bool)])}, "
+                           f"held flat; covered_weight is the share of each portfolio with data "
+                           f"(results are blank when it is 0)")
+
+    def render_rolling(values):
+        window = values['rolling_window']
+        for label, analytics in (('tickers', values['rolling_tickers']), ('strategies', values['rolling_strategies'])):
+            if analytics is None:
+                continue
+            display_section_header(f"Rolling analytics of {label} ({window}-day window)")
+            plot_rolling_metric(analytics['volatility'], f"Rolling annualised volatility of {label}", 'Volatility')
+            plot_rolling_metric(analytics['sharpe'], f"Rolling Sharpe ratio of {label}", 'Sharpe ratio')
+            if 'beta' in analytics:
+                plot_rolling_metric(analytics['beta'], f"Rolling beta of {label} to {BENCHMARK_TICKER}", 'Beta')
+            correlation = analytics['correlation']
+            if len(correlation['index']):
+                plot_correlation_heatmap(correlation['correlation'][-1], correlation['tickers'],
+                                         f"Correlation of {label} over the {window} days to {correlation['index'][-1]:%Y-%m-%d}")
+
+    def render_recommendation(values):
+        analyzer = values['analyzer']
+        display_dataframe(values['risk_metrics'], "Risk metrics by strategy")
+
+        best_strategy = values['best_strategy']
+        display_recommendation(best_strategy)
+
+        # Display corresponding weights based on best strategy
+        strategy_weights = values['strategy_weights']
+        if best_strategy in strategy_weights:
+            best_weights = strategy_weights[best_strategy]
+            create_pie_chart(best_weights, values['tickers'])
+            if best_strategy == 'User':
+                st.write("Do not make changes to your allocation")
+            df = analyzer.create_recommendation_dataframe(best_strategy, best_weights)
+            st.write(df)
+
+            # Whole-share orders for the portfolio amount, starting from the user's allocation
+            discrete_allocation = values['discrete_allocation']
+            if discrete_allocation is not None:
+                display_dataframe(discrete_allocation['allocation'], "Share orders")
+                display_metric("Leftover cash", "${:,.2f}".format(discrete_allocation['leftover']))
+                display_metric("Tracking error to target weights", f"{discrete_allocation['tracking_error']:.4f}")
+            else:
+                st.write("Enter a portfolio amount to see share orders.")
+
+    sections.add('prices', ['prices'], render_prices)
+    sections.add('daily_returns', ['daily_returns'], render_daily_returns)
+    sections.add('portfolio_returns', ['port_daily_return'], render_portfolio_returns)
+    sections.add('betas', ['betas', 'beta_weight'], render_betas)
+    sections.add('factor_exposures', ['factor_exposures', 'rolling_window'], render_factor_exposures)
+    sections.add('risk_parity', ['tickers', 'risk_parity_weights'], render_risk_parity)
+    add_evolution_section(sections, 'User', "Portfolio Value Evolution (10 years) using user allocation",
+                          "Total portfolio return on user allocation", 'Total return on initial allocation')
+    add_evolution_section(sections, 'Risk Parity', "Portfolio Value Evolution (10 years) using Risk parity",
+                          "Total portfolio return on risk parity allocation", 'Total return on risk parity allocation')
+    add_evolution_section(sections, 'Beta', "Portfolio Value Evolution (10 years) using Beta Weights",
+                          "Total portfolio return beta allocation", 'Total return on Beta Weight allocation')
+    sections.add('sharpe', ['sharpe_data'], render_sharpe)
+    add_evolution_section(sections, 'Sharp Ratio', "Portfolio Value Evolution (10 years) using Sharp Ratio",
+                          "Total portfolio return with Sharp ratio")
+    sections.add('markowitz', ['sharpe_data', 'markowitz_data'], render_markowitz)
+    add_evolution_section(sections, 'Markowitz', "Portfolio Value Evolution (10 years) using Markowitz",
+                          "Total portfolio return using markovic", 'Markowitz portfolio solver')
+    sections.add('resampled', ['markowitz_data', 'resampled_data'], render_resampled)
+    add_evolution_section(sections, 'Resampled Markowitz', "Portfolio Value Evolution (10 years) using resampled Markowitz",
+                          "Total portfolio return using resampled Markowitz")
+    sections.add('cvar', ['cvar_data', 'evolution_cvar', 'analyzer'], render_cvar)
+    sections.add('black_litterman', ['black_litterman_data', 'evolution_black_litterman'], render_black_litterman)
+    sections.add('index_tracking', ['tickers', 'index_tracking_data', 'evolution_index_tracking'], render_index_tracking)
+    sections.add('stress_tests', ['stress_results'], render_stress_tests)
+    sections.add('rolling', ['rolling_window', 'rolling_tickers', 'rolling_strategies'], render_rolling)
+    sections.add('recommendation', ['tickers', 'analyzer', 'risk_metrics', 'best_strategy', 'strategy_weights',
+                                    'discrete_allocation'], render_recommendation)
+
+
+def display_intraday_analysis(tickers, frequency, lookback_days):
+    """Intraday mode: resampled bars, annualised statistics, correlation and random-portfolio Sharpe ratios"""
+    with st.spinner('Streaming intraday bars...'):
+        result = run_intraday_analysis(tickers, datetime.today().date(), frequency, lookback_days)
+    intraday = result['intraday']
+    if intraday['num_bars'] == 0:
+        st.error("No intraday bars were returned for these tickers.")
+        return
+
+    st.caption(f"{intraday['num_raw_bars']:,} raw bars resampled to {intraday['num_bars']:,} {frequency} bars "
+               f"(about {intraday['periods_per_year']:,.0f} per year)")
+    display_dataframe(intraday['prices'], f"{frequency} closing prices")
+    plot_rolling_metric(intraday['prices'], f"{frequency} closing prices", 'Price')
+    display_dataframe(result['statistics'], "Annualised statistics")
+    plot_correlation_heatmap(result['correlation'], tickers, f"Correlation of {frequency} log returns")
+
+    sharpe_data = result['sharpe_data']
+    if sharpe_data is not None:
+        display_section_header(f"Sharpe ratio of {len(sharpe_data['test_return'])} random weights ({frequency} bars)")
+        plot_sharpe_ratio_scatter(sharpe_data['test_volatility'], sharpe_data['test_return'],
+                                  sharpe_data['sharpratio'], sharpe_data['max_sharpratio'])
+        create_pie_chart(sharpe_data['sharpratio_weight'], tickers, 'Maximum Sharpe ratio weights')
+
+
+def display_frontier_slider():
+    """
+    Portfolio at a chosen target volatility or return, interpolated from the frontier
+    table of the last analysis (kept in the session, so moving the slider reruns
+    nothing but this lookup)
+    """
+    tickers, frontier = st.session_state.get('frontier_table') or (None, None)
+    if frontier is None:
+        return
+    display_section_header("Portfolio at a target risk or return")
+    by, target = get_frontier_target(frontier)
+    start = time.perf_counter()
+    portfolio = frontier_portfolio(frontier, target, by)
+    lookup_time = time.perf_counter() - start
+    display_metric("Expected annual log return", f"{portfolio['return'] * TRADING_DAYS_PER_YEAR:.2%}")
+    display_metric("Annual volatility", f"{portfolio['volatility'] * np.sqrt(TRADING_DAYS_PER_YEAR):.2%}")
+    weights = pd.Series(portfolio['weights'], index=tickers, name='Weight')
+    display_dataframe(weights[weights > 1e-4].sort_values(ascending=False), "Weights")
+    st.caption(f"Answered in {lookup_time * 1e6:.0f} µs from {len(frontier['returns'])} precomputed frontier portfolios "
+               f"(frontier table: {frontier.get('cache_status', 'restored')}, built in {frontier['solve_time']:.2f}s)")
+
 
+def display_saved_analyses():
+    """Restore a saved analysis without recomputing it, or compare two saved analyses"""
+    snapshots = list_snapshots()
+    if not snapshots:
+        return
+    with st.expander('Saved analyses'):
+        names = [os.path.basename(path) for path in snapshots]
+        selected = st.selectbox('Saved analysis', names)
+        compare_with = st.selectbox('Compare with', ['(none)'] + names)
+        restore = st.button('Restore')
+        snapshot = load_snapshot(snapshots[names.index(selected)])
+
+        if compare_with != '(none)':
+            diff = diff_snapshots(load_snapshot(snapshots[names.index(compare_with)]), snapshot)
+            for name, (before, after) in diff['inputs'].items():
+                st.write(f"{name}: {before} -> {after}")
+            recommendation = diff['recommendation']
+            display_metric("Recommendation", f"{recommendation['before'][0]} -> {recommendation['after'][0]}")
+            display_dataframe(diff['strategy_returns'], "Total return by strategy")
+            display_dataframe(diff['recommended_weights'], "Recommended weights")
+            if 'risk_metrics' in diff:
+                display_dataframe(diff['risk_metrics'], "Risk metrics")
+
+    if restore:
+        st.caption(f"Restored analysis saved {snapshot.created}")
+        if snapshot.get('frontier_table') is not None:
+            st.session_state['frontier_table'] = (snapshot['tickers'], snapshot['frontier_table'])
+        else:
+            st.session_state.pop('frontier_table', None)
+        sections = ResultSections()
+        add_result_sections(sections)
+        sections.update(snapshot)
+
+
+def main(profiler=None):
+    """Main application function; profiler samples this run when profiling was requested"""
+    # Calibrate the compute budget cost models (runs once per process)
+    if ADAPTIVE_COMPUTE_BUDGET:
+        get_compute_budget().calibrate()
+
+    # Warnings from the data loader and other core modules are shown on the page
+    show_core_messages()
 
-def main():
-    """Main application function"""
     # Display header
     display_header()
-    
+
     # Get portfolio amount
-    amount = get_portfolio_amount()  # noqa: F841
-    
+    amount = get_portfolio_amount()
+
     # Get ticker inputs
     ticker_percentage, num_tickers, invalid_tickers = get_ticker_inputs()
-    
+
+    # Get the metric used to pick the best strategy
+    ranking_metric = get_ranking_metric()
+
+    # Get the rolling analytics window
+    rolling_window = get_rolling_window()
+
+    # Intraday mode analyses resampled minute bars instead of daily prices
+    intraday_enabled, intraday_frequency, intraday_lookback = get_intraday_inputs()
+
+    # Get optional optimization constraints
+    constraint_inputs = get_constraint_inputs()
+
+    # Get optional Black-Litterman views
+    bl_views = get_black_litterman_views()
+
+    # Draw results as their stages finish, or all at once when the run is done
+    progressive = st.checkbox('Show results as they are computed', value=PROGRESSIVE_RESULTS)
+
+    # Opt-in sampling profiler for the next requests
+    get_profiling_toggle()
+
+    # Previously saved analyses can be redrawn or compared without running the pipeline
+    display_saved_analyses()
+
     # Button to display entered data
     if st.button('Submit'):
         if invalid_tickers:
@@ -43,157 +381,117 @@ def main():
             st.error("Please enter at least one valid ticker.")
         else:
             display_ticker_weights(ticker_percentage)
-            
+
             # Extract tickers and weights
             tickers = list(ticker_percentage.keys())
             weights = list(ticker_percentage.values())
-            
+            if profiler is not None:
+                profiler.tag(tickers=len(tickers), days=HISTORICAL_PERIOD_DAYS, rolling=rolling_window)
+
             # Create pie chart of portfolio weights
             create_pie_chart(weights, tickers, 'Pie Chart of Portfolio Weights')
-            
-            # Get date range
-            end_date = datetime.today().date()
-            start_date = end_date - timedelta(days=HISTORICAL_PERIOD_DAYS)
-            
-            # Get historical prices
-            prices = get_historical_prices(tickers, start_date, end_date)
-            display_dataframe(prices, "Historic Prices for the past year")
-            
-            # Plot historical prices
-            if prices is not None:
-                plot_historical_prices(prices)
-            else:
-                st.write("Historical prices not available.")
-            
-            # Calculate and display daily returns
-            daily_returns = get_daily_returns(prices)
-            display_dataframe(daily_returns, "Daily Returns (pct_change)")
-            plot_daily_returns(daily_returns)
-            
-            # Calculate and display portfolio daily returns
-            port_daily_return = get_portfolio_returns(weights, daily_returns)
-            display_dataframe(port_daily_return, "Portfolio Daily Returns")
-            plot_portfolio_returns(port_daily_return)
-            
-            # Calculate Beta
-            benchmark_daily_returns = get_benchmark_data(start_date, end_date)
-            betas = calculate_beta(daily_returns, benchmark_daily_returns)
-            display_dataframe(betas, f"Beta Coefficient By Tickers benchmarked with {BENCHMARK_TICKER}")
-            
-            # Calculate beta weights
-            beta_weight = calculate_beta_weights(betas)
-            display_dataframe(beta_weight, "Beta weight")
-            
-            # Calculate risk parity weights
-            risk_parity_weights = calculate_risk_parity_weights(daily_returns)
-            display_dataframe(risk_parity_weights, "Risk Parity Weights")
-            create_pie_chart(risk_parity_weights, tickers, 'Risk Parity (Equally weighted portfolio)')
-
-            # Initialize portfolio analyzer
-            analyzer = PortfolioAnalyzer(tickers)
-            
-            # Analyze original portfolio
-            original_portfolio_value, total_return_original = analyzer.analyze_strategy('User', weights, PORTFOLIO_EVOLUTION_YEARS)
-            if original_portfolio_value is not None:
-                display_section_header('Total return on initial allocation')
-                plot_portfolio_evolution(original_portfolio_value, "Portfolio Value Evolution (10 years) using user allocation")
-                display_percentage_return("Total portfolio return on user allocation", total_return_original)
-            else:
-                print(f"following data from original in case of none {original_portfolio_value}, {total_return_original}")
-            
-            # Analyze risk parity portfolio
-            rp_portfolio_value, total_return_rp = analyzer.analyze_strategy('Risk Parity', risk_parity_weights, PORTFOLIO_EVOLUTION_YEARS)
-            if rp_portfolio_value is not None:
-                display_section_header('Total return on risk parity allocation')
-                plot_portfolio_evolution(rp_portfolio_value, "Portfolio Value Evolution (10 years) using Risk parity")
-                display_percentage_return("Total portfolio return on risk parity allocation", total_return_rp)
-            else:
-                print(f"following data from rp in case of none {rp_portfolio_value}, {total_return_rp}")
-            
-            # Analyze beta portfolio
-            beta_portfolio_value, total_return_beta = analyzer.analyze_strategy('Beta', beta_weight, PORTFOLIO_EVOLUTION_YEARS)
-            if beta_portfolio_value is not None:
-                display_section_header('Total return on Beta Weight allocation')
-                plot_portfolio_evolution(beta_portfolio_value, "Portfolio Value Evolution (10 years) using Beta Weights")
-                display_percentage_return("Total portfolio return beta allocation", total_return_beta)
-            else:
-                print(f"following data from bet in case of none {beta_portfolio_value}, {total_return_beta}")
-            
-            # Sharpe Ratio Analysis
-            display_section_header('Sharp Ratio')
-            sharpe_data = calculate_sharpe_ratio_optimization(prices, num_tickers)
-            
-            display_section_header('Sharpe ratio of 10000 random weights')
-            plot_sharpe_ratio_scatter(
-                sharpe_data['test_volatility'], 
-                sharpe_data['test_return'], 
-                sharpe_data['sharpratio'], 
-                sharpe_data['max_sharpratio']
-            )
-            
-            # Analyze Sharpe ratio portfolio
-            sr_portfolio_value, total_return_sr = analyzer.analyze_strategy('Sharp Ratio', sharpe_data['sharpratio_weight'], PORTFOLIO_EVOLUTION_YEARS)
-            if sr_portfolio_value is not None:
-                plot_portfolio_evolution(sr_portfolio_value, "Portfolio Value Evolution (10 years) using Sharp Ratio")
-                display_percentage_return("Total portfolio return with Sharp ratio", total_return_sr)
-            else:
-                print(f"following data from sharpe in case of none {sr_portfolio_value}, {total_return_sr}")
-            
-            # Markowitz Analysis
-            markowitz_data = calculate_markowitz_optimization(
-                sharpe_data['meanlog'], 
-                sharpe_data['sigma'], 
-                num_tickers, 
-                sharpe_data['test_return']
-            )
-            
-            # Plot efficient frontier
-            plot_efficient_frontier(
-                sharpe_data['test_volatility'],
-                sharpe_data['test_return'],
-                sharpe_data['sharpratio'],
-                sharpe_data['max_sharpratio'],
-                markowitz_data['optimal_volatility'],
-                markowitz_data['returns']
-            )
-            
-            # Analyze Markowitz portfolio
-            marcovic_portfolio_value, total_return_markowitz = analyzer.analyze_strategy('Markowitz', markowitz_data['optimal_weight'].x, PORTFOLIO_EVOLUTION_YEARS)
-            if marcovic_portfolio_value is not None:
-                display_section_header('Markowitz portfolio solver')
-                plot_portfolio_evolution(marcovic_portfolio_value, "Portfolio Value Evolution (10 years) using Markowitz")
-                display_percentage_return("Total portfolio return using markovic", total_return_markowitz)
+
+            if intraday_enabled:
+                display_intraday_analysis(tickers, intraday_frequency, intraday_lookback)
+                return
+
+            # Reserve a placeholder for every result, in page order
+            sections = ResultSections()
+            add_result_sections(sections)
+            status = st.empty()
+            values = {}
+            frontier_points = queue.Queue()
+            partial_volatility, partial_returns = [], []
+
+            def on_stage_complete(stage, outputs):
+                values.update(outputs)
+                if progressive:
+                    sections.update(values)
+                    status.write(f"Finished {stage}...")
+
+            def draw_partial_frontier():
+                # Points arrive from the Markowitz worker; redraw with whatever is solved so far
+                new_points = not frontier_points.empty()
+                while not frontier_points.empty():
+                    target_return, volatility = frontier_points.get()
+                    partial_returns.append(target_return)
+                    partial_volatility.append(volatility)
+                if new_points and 'sharpe_data' in values and 'markowitz' not in sections.rendered:
+                    sharpe_data = values['sharpe_data']
+                    with sections.placeholder('markowitz').container():
+                        display_section_header(f"Efficient frontier ({len(partial_returns)} points solved)")
+                        plot_efficient_frontier(
+                            sharpe_data['test_volatility'], sharpe_data['test_return'],
+                            sharpe_data['sharpratio'], sharpe_data['max_sharpratio'],
+                            partial_volatility, partial_returns
+                        )
+
+            # Run the analysis graph; independent stages run concurrently. Worker threads
+            # get this session's script context so core log warnings reach the page,
+            # and join the profiler when this request is profiled.
+            # Failures (e.g. no price data) come back in result['errors'] as exceptions.
+            script_context = get_script_run_ctx()
+
+            def initialize_worker():
+                add_script_run_ctx(threading.current_thread(), script_context)
+                if profiler is not None:
+                    profiler.add_current_thread()
+
+            with st.spinner('Running analysis...'):
+                result = run_analysis(
+                    tickers, weights, num_tickers, amount, datetime.today().date(), ranking_metric, constraint_inputs,
+                    initializer=initialize_worker,
+                    on_stage_complete=on_stage_complete,
+                    on_frontier_point=lambda target_return, volatility: frontier_points.put((target_return, volatility)),
+                    on_idle=draw_partial_frontier if progressive else None,
+                    poll_interval=PROGRESSIVE_POLL_SECONDS,
+                    rolling_window=rolling_window, bl_views=bl_views
+                )
+            sections.update(result['values'])
+            status.empty()
+            # Keep the slider only for a table of this analysis; a failed or skipped stage clears it
+            if result['values'].get('frontier_table') is not None:
+                st.session_state['frontier_table'] = (result['values']['tickers'], result['values']['frontier_table'])
             else:
-                print(f"following data from markowitz in case of none {marcovic_portfolio_value}, {total_return_markowitz}")
-            
-            # Get best strategy and display recommendation
-            best_strategy, best_return = analyzer.get_best_strategy()
-            display_recommendation(best_strategy)
-            
-            # Display corresponding weights based on best strategy
-            if best_strategy == 'Risk Parity':
-                create_pie_chart(risk_parity_weights, tickers)
-                df = analyzer.create_recommendation_dataframe(best_strategy, risk_parity_weights)
-                st.write(df)
-            elif best_strategy == 'Markowitz':
-                create_pie_chart(markowitz_data['optimal_weight'].x, tickers)
-                df = analyzer.create_recommendation_dataframe(best_strategy, markowitz_data['optimal_weight'].x)
-                st.write(df)
-            elif best_strategy == 'User':
-                create_pie_chart(weights, tickers)
-                st.write("Do not make changes to your allocation")
-                df = analyzer.create_recommendation_dataframe(best_strategy, weights)
-                st.write(df)
-            elif best_strategy == 'Beta':
-                create_pie_chart(beta_weight, tickers)
-                df = analyzer.create_recommendation_dataframe(best_strategy, beta_weight)
-                st.write(df)
-            elif best_strategy == 'Sharp Ratio':
-                create_pie_chart(sharpe_data['sharpratio_weight'], tickers)
-                df = analyzer.create_recommendation_dataframe(best_strategy, sharpe_data['sharpratio_weight'])
-                st.write(df)
-            
-            
+                st.session_state.pop('frontier_table', None)
+            for stage, error in result['errors'].items():
+                st.error(f"Stage '{stage}' failed: {error}")
+
+            if SNAPSHOT_AUTOSAVE:
+                st.caption(f"Analysis saved to {save_analysis(result)}")
+
+            # Which compute budget level was applied, so sample counts and resolution are interpretable
+            budget = result['values']['compute_budget']
+            st.caption(f"Compute budget: {budget['level']} ({budget['settings']['num_portfolios']} random portfolios, "
+                       f"{budget['settings']['frontier_points']} frontier points, "
+                       f"{budget['settings']['frontier_table_points']} frontier table points, "
+                       f"{budget['settings']['num_resamples']} resamples)")
+
+            # Stage timings: end-to-end latency against the critical path, and time to first result
+            with st.expander('Pipeline timings'):
+                display_metric("Total time", f"{result['total_time']:.2f}s")
+                if 'estimated_seconds' in budget:
+                    display_metric("Compute budget estimate", f"{budget['estimated_seconds']:.2f}s for a "
+                                   f"{budget['target_seconds']:.1f}s target with {budget['queue_depth']} other analyses running")
+                if sections.time_to_first_result() is not None:
+                    display_metric("Time to first result", f"{sections.time_to_first_result():.2f}s")
+                display_metric("Critical path", f"{result['critical_path']['duration']:.2f}s ({' -> '.join(result['critical_path']['stages'])})")
+                display_dataframe(pd.DataFrame(result['timings']).T.sort_values('start'), "Stage timings (seconds from start)")
+                display_dataframe(pd.Series(sections.render_times(), name='Seconds'), "Time until each result was shown")
+
+    # Target risk/return slider over the last analysis' frontier; outside the Submit
+    # branch so it keeps working when the slider reruns the script
+    display_frontier_slider()
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if profiling_requested():
+        with SamplingProfiler() as profiler:
+            main(profiler)
+        profile_path = profiler.save()
+        st.caption(f"Profile saved to {profile_path} ({profiler.num_samples} samples)")
+        with open(profile_path) as profile:
+            st.download_button('Download flame graph', profile.read(), file_name=os.path.basename(profile_path),
+                               mime='text/html')
+    else:
+        main()